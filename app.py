@@ -1,11 +1,67 @@
 import base64
+import hmac
+import math
+import os
 import re
-import sqlite3
+import time
 from datetime import datetime
 from pathlib import Path
 
-import pandas as pd
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+import geo
+import perf
+import pii
+import ratelimit
+import searches
+import sessions
+import sqltrace
+from browse import PAGE_SIZE, browse_page, card_html, facet_counts, viewer_location
+from storage import (
+    INBOX_PAGE,
+    MESSAGE_SEARCH_PAGE,
+    REVIEW_PAGE,
+    SLOW_QUERY_MS,
+    SQL_TRACE,
+    THUMB_PX,
+    UPLOAD_DIR,
+    VERIFICATION_REJECTED,
+    VERIFIED,
+    _csv_join,
+    _csv_split,
+    count_sessions,
+    count_unseen_notifications,
+    delete_search,
+    get_profile_by_id,
+    init_db,
+    insert_message,
+    mark_notifications_seen,
+    pending_verifications,
+    read_inbox,
+    read_notifications,
+    read_pii_flags,
+    read_profile_cards_versioned,
+    read_rollups,
+    read_saved_searches,
+    result_cache,
+    review_profiles,
+    save_upload,
+    search_messages,
+    update_profile,
+    upload_thumbnail,
+    upsert_profile,
+    verification_stats,
+)
+from vocab import (
+    AGENCY_SERVICES,
+    COMMISSION_BANDS,
+    CONTENT_TYPES,
+    EARNINGS_BANDS,
+    FEE_BANDS,
+    PAYMENT_MODELS,
+    PERSONALITY_TYPES,
+)
 
 # =========================
 # CONFIG
@@ -18,12 +74,12 @@ st.set_page_config(
 )
 
 APP_NAME = "Creator Network"
-DATA_DIR = Path("data")
-DB_PATH = DATA_DIR / "app.db"
-UPLOAD_DIR = DATA_DIR / "uploads"
 
-DATA_DIR.mkdir(parents=True, exist_ok=True)
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+# Shared secret that unlocks admin tooling for a signed-in session (empty = no admins).
+# Display names are chosen by users at onboarding and never grant anything.
+ADMIN_KEY = os.environ.get("CN_ADMIN_KEY", "")
+# Optional JSON-lines file that receives one timing record per rerun
+PERF_LOG_PATH = os.environ.get("CN_PERF_LOG", "")
 
 # =========================
 # STYLES (premium, light, energetic, trust)
@@ -181,179 +237,49 @@ header {visibility: hidden;}
 
 /* Small helper text */
 .cn-help{ font-size: 12px; color: rgba(15,23,42,.60); }
+
+/* Session cookie writer (hidden frame; its script still runs) */
+.st-key-cn-session-cookie { display: none; }
 </style>
 """, unsafe_allow_html=True)
 
 # =========================
 # DATABASE
 # =========================
-def db():
-    conn = sqlite3.connect(str(DB_PATH), check_same_thread=False)
-    conn.execute("PRAGMA journal_mode=WAL;")
-    return conn
-
-def init_db():
-    conn = db()
-    c = conn.cursor()
-
-    # Single table that supports both roles (creator + agency)
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS profiles (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        account_type TEXT NOT NULL,              -- Creator / Agency
-
-        display_name TEXT NOT NULL,              -- visible name
-        created TEXT NOT NULL,
-
-        -- Shared / marketplace
-        niche TEXT,
-        location_current TEXT,
-        location_hometown TEXT,
-        bio TEXT,
-        verified INTEGER DEFAULT 0,              -- platform-verified (manual review placeholder)
-        selfie_uploaded INTEGER DEFAULT 0,
-
-        -- Creator fields
-        creator_personality TEXT,
-        creator_platform_handle TEXT,            -- e.g. handle on external subscription platform
-        creator_platform_url TEXT,               -- link to profile
-        creator_autofill INTEGER DEFAULT 0,       -- user chose "autofill" option
-        creator_earnings_band TEXT,               -- stated band
-        creator_content_types TEXT,               -- csv
-        creator_photos TEXT,                      -- csv of local saved filenames
-
-        -- Agency fields
-        agency_name TEXT,
-        agency_website TEXT,
-        agency_success_story TEXT,
-        agency_services TEXT,                     -- csv
-        agency_content_specialties TEXT,          -- csv
-
-        agency_payment_model TEXT,                -- fee / commission / other
-        agency_fee_band TEXT,                     -- band
-        agency_commission_band TEXT,              -- band
-        agency_payment_other TEXT                 -- free text
-    )
-    """)
-
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS messages (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        sender_id INTEGER NOT NULL,
-        receiver_id INTEGER NOT NULL,
-        body TEXT NOT NULL,
-        created TEXT NOT NULL
-    )
-    """)
-
-    conn.commit()
-    conn.close()
-
-def _csv_join(x):
-    if not x:
-        return ""
-    if isinstance(x, str):
-        return x
-    return ",".join([str(i) for i in x])
-
-def _csv_split(x):
-    if not x:
-        return []
-    return [i.strip() for i in str(x).split(",") if i.strip()]
-
-def read_profiles():
-    conn = db()
-    df = pd.read_sql_query("SELECT * FROM profiles ORDER BY created DESC", conn)
-    conn.close()
-    return df
-
-def get_profile_by_display_name(display_name, account_type):
-    conn = db()
-    df = pd.read_sql_query("""
-        SELECT * FROM profiles
-        WHERE display_name = ? AND account_type = ?
-        ORDER BY created DESC
-        LIMIT 1
-    """, conn, params=(display_name, account_type))
-    conn.close()
-    return df
-
-def upsert_profile(payload: dict):
-    conn = db()
-    c = conn.cursor()
-
-    # "identity" = display_name + type
-    existing = c.execute(
-        "SELECT id FROM profiles WHERE display_name = ? AND account_type = ?",
-        (payload["display_name"], payload["account_type"])
-    ).fetchone()
-
-    cols = list(payload.keys())
-    vals = [payload[k] for k in cols]
-
-    if existing:
-        sets = ", ".join([f"{k}=?" for k in cols if k not in ("account_type", "display_name")])
-        vals2 = [payload[k] for k in cols if k not in ("account_type", "display_name")]
-        vals2.append(existing[0])
-        q = f"UPDATE profiles SET {sets} WHERE id=?"
-        c.execute(q, vals2)
-        pid = existing[0]
-    else:
-        placeholders = ",".join(["?"] * len(cols))
-        q = f"INSERT INTO profiles ({','.join(cols)}) VALUES ({placeholders})"
-        c.execute(q, vals)
-        pid = c.lastrowid
-
-    conn.commit()
-    conn.close()
-    return pid
-
-def insert_message(sender_id, receiver_id, body):
-    conn = db()
-    conn.execute("""
-    INSERT INTO messages (sender_id, receiver_id, body, created)
-    VALUES (?, ?, ?, ?)
-    """, (sender_id, receiver_id, body, datetime.now().isoformat(timespec="seconds")))
-    conn.commit()
-    conn.close()
-
-def read_inbox(profile_id):
-    conn = db()
-    df = pd.read_sql_query("""
-        SELECT * FROM messages
-        WHERE sender_id = ? OR receiver_id = ?
-        ORDER BY created DESC
-    """, conn, params=(profile_id, profile_id))
-    conn.close()
-    return df
-
-def get_profile_id(display_name, account_type):
-    conn = db()
-    row = conn.execute("""
-        SELECT id FROM profiles
-        WHERE display_name = ? AND account_type = ?
-        ORDER BY created DESC
-        LIMIT 1
-    """, (display_name, account_type)).fetchone()
-    conn.close()
-    return row[0] if row else None
-
-def get_profile_by_id(pid):
-    conn = db()
-    df = pd.read_sql_query("SELECT * FROM profiles WHERE id = ?", conn, params=(pid,))
-    conn.close()
-    return df
-
 init_db()
 
 # =========================
 # VALIDATION HELPERS
 # =========================
-PHONE_RE = re.compile(r"(\+?\d[\d\s().-]{6,}\d)")
-def contains_phone(text: str) -> bool:
-    if not text:
-        return False
-    return bool(PHONE_RE.search(text))
+# Contact details in free text: "flag" saves the text and storage records it
+# in pii_flags for moderators (admin panel); "block" also refuses the write
+PII_POLICY = os.environ.get("CN_PII_POLICY", "flag").strip().lower()
+CONTACT_ERROR = "Remove contact details (phone numbers, emails, social handles, links)."
+CONTACT_NOTE = "Contact details (phone numbers, emails, social handles, links) are flagged for our moderators."
+def contains_contact_details(text: str) -> bool:
+    # one pass for every kind, see pii.py; storage also flags whatever is written
+    return pii.contains(text)
+
+def blocks_contact_details(*texts) -> bool:
+    return PII_POLICY == "block" and any(contains_contact_details(t or "") for t in texts)
+
+def contact_notice(text, suffix=""):
+    # inline feedback under a free-text field
+    if contains_contact_details(text):
+        if PII_POLICY == "block":
+            st.error(f"{CONTACT_ERROR}{suffix}")
+        else:
+            st.warning(CONTACT_NOTE)
+
+def throttled(wait, action):
+    # ratelimit.* returned how long until the next token; tell the user instead of writing
+    if wait:
+        st.warning(f"You're {action} too quickly. Please wait {math.ceil(wait)} s and try again.")
+    return wait > 0
+
+def session_key():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else "local"
 
 URL_RE = re.compile(r"^https?://", re.I)
 def looks_like_url(x: str) -> bool:
@@ -361,21 +287,43 @@ def looks_like_url(x: str) -> bool:
         return False
     return bool(URL_RE.search(x.strip()))
 
-def save_uploaded_files(files, prefix):
+# which payment models quote a fee / a commission band
+FEE_MODELS = ("Monthly fee", "Yearly fee", "Hybrid")
+COMMISSION_MODELS = ("Commission-based", "Hybrid")
+def payment_terms(model, fee_band, commission_band, other):
+    # bands and note that don't apply to the model get their neutral value, as in onboarding
+    return {
+        "agency_fee_band": fee_band if model in FEE_MODELS else "Prefer not to say",
+        "agency_commission_band": commission_band if model in COMMISSION_MODELS else "Other / depends",
+        "agency_payment_other": other if model == "Other" else "",
+    }
+
+def profile_errors(p):
+    # onboarding's rules, checked against a whole profile (e.g. after an edit)
+    errors = []
+    if p.get("account_type") == "Agency":
+        website = (p.get("agency_website") or "").strip()
+        if not website:
+            errors.append("Website is required (no phone numbers).")
+        elif not looks_like_url(website):
+            errors.append("Website should start with http:// or https://")
+        if not (p.get("agency_success_story") or "").strip():
+            errors.append("Success story is required.")
+        if p.get("agency_payment_model") not in PAYMENT_MODELS:
+            errors.append("Pick a payment model.")
+    elif p.get("creator_platform_url") and not looks_like_url(p["creator_platform_url"]):
+        errors.append("Platform URL should start with http:// or https://")
+    if blocks_contact_details(p.get("bio"), p.get("agency_success_story"), p.get("agency_payment_other")):
+        errors.append(CONTACT_ERROR)
+    return errors
+
+@perf.timed()
+def save_uploaded_files(files, kind):
+    # kind = "creator" / "selfie"; names are content hashes (see storage.save_upload)
     saved = []
-    if not files:
-        return saved
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    for i, f in enumerate(files):
-        # Keep extension if present
-        name = f.name
-        ext = ""
-        if "." in name:
-            ext = "." + name.split(".")[-1].lower()
-        safe = re.sub(r"[^a-zA-Z0-9_-]", "_", prefix)[:24]
-        out = UPLOAD_DIR / f"{safe}_{ts}_{i}{ext}"
-        out.write_bytes(f.getbuffer())
-        saved.append(out.name)  # store only filename
+    for f in files or []:
+        ext = f.name.rsplit(".", 1)[-1] if "." in f.name else ""
+        saved.append(save_upload(bytes(f.getbuffer()), kind, ext))  # store only filename
     return saved
 
 # =========================
@@ -386,6 +334,10 @@ def shell_open():
 
 def shell_close():
     st.markdown('</div>', unsafe_allow_html=True)
+    # Every screen (including onboarding steps before st.stop) ends here
+    run = perf.end_run()
+    if PERF_LOG_PATH:
+        perf.append_jsonl(PERF_LOG_PATH, run)
 
 def hero(title, subtitle, badges=None):
     badges = badges or []
@@ -425,6 +377,47 @@ def right_mark():
     logo_html = f'<img src="{logo_data}" alt="OnlyFans emblem" />' if logo_data else "OF"
 
 
+def session_cookie(token):
+    # Streamlit can read cookies but not set them: a same-origin frame writes
+    # it. The markup is identical across reruns, so the frame loads once.
+    # token "" clears the cookie (after sign-out)
+    max_age = int(sessions.SESSION_TTL_HOURS * 3600) if token else 0
+    with st.container(key="cn-session-cookie"):
+        st.iframe(f"""<script>
+const secure = window.parent.location.protocol === "https:" ? "; Secure" : "";
+window.parent.document.cookie = "{sessions.COOKIE}={token}; Max-Age={max_age}; Path=/; SameSite=Strict" + secure;
+</script>""", height=1)
+
+def inbox_messages(profile_id):
+    # -> (messages newest first, more to load). The newest page is read on
+    # every rerun; "Older messages" appends keyset pages below the oldest one
+    # shown (load_older_messages), kept in session state so paging back
+    # never re-reads what is already on screen.
+    head = read_inbox(profile_id).to_dict("records")
+    older = st.session_state.inbox_older
+    if not older or older["profile_id"] != profile_id:
+        return head, len(head) >= INBOX_PAGE
+    # new mail pushes rows out of the newest page: read down to where the
+    # older pages start so nothing falls between the two
+    floor = older["floor"]
+    while head and head[-1]["id"] > floor:
+        page = read_inbox(profile_id, before_id=head[-1]["id"]).to_dict("records")
+        head += [m for m in page if m["id"] >= floor]
+        if len(page) < INBOX_PAGE or page[-1]["id"] < floor:
+            break
+    return head + older["rows"], older["more"]
+
+def load_older_messages(profile_id, shown):
+    older = st.session_state.inbox_older
+    if not older or older["profile_id"] != profile_id:
+        older = st.session_state.inbox_older = {"profile_id": profile_id, "floor": shown[-1]["id"], "rows": [], "more": True}
+    page = read_inbox(profile_id, before_id=shown[-1]["id"]).to_dict("records")
+    older["rows"] += page
+    older["more"] = len(page) >= INBOX_PAGE
+
+def admin_key_ok(key):
+    return bool(ADMIN_KEY) and hmac.compare_digest(key.encode("utf-8"), ADMIN_KEY.encode("utf-8"))
+
 def goto(screen):
     st.session_state.screen = screen
     st.rerun()
@@ -443,6 +436,28 @@ if "display_name" not in st.session_state:
 
 if "profile_id" not in st.session_state:
     st.session_state.profile_id = None
+    st.session_state.session_token = None
+    st.session_state.is_admin = False
+    # New Streamlit session (reload, server restart): resume from the cookie,
+    # or once from a token in the URL, which is rotated and stripped
+    token = st.context.cookies.get(sessions.COOKIE)
+    me = sessions.resolve(token)
+    url_token = st.query_params.get(sessions.QUERY_PARAM)
+    if url_token is not None:
+        del st.query_params[sessions.QUERY_PARAM]
+        if not me:
+            me, token = sessions.rotate(url_token)
+    if me:
+        st.session_state.profile_id = me["profile_id"]
+        st.session_state.display_name = me["display_name"]
+        st.session_state.role = me["role"]
+        st.session_state.is_admin = bool(ADMIN_KEY) and me.get("admin", False)
+        st.session_state.auth_step = "app"
+        st.session_state.session_token = token
+
+# keep the browser's cookie in step with this session (None: nothing to write)
+if st.session_state.session_token is not None:
+    session_cookie(st.session_state.session_token)
 
 if "screen" not in st.session_state:
     st.session_state.screen = "home"  # home/browse/messages/profile
@@ -450,6 +465,20 @@ if "screen" not in st.session_state:
 if "compose_to_id" not in st.session_state:
     st.session_state.compose_to_id = None
 
+if "inbox_older" not in st.session_state:
+    st.session_state.inbox_older = None  # pages loaded with "Older messages", see inbox_messages()
+
+if "msg_search_query" not in st.session_state:
+    st.session_state.msg_search_query = ""
+    st.session_state.msg_search_page = 0
+
+if "review_after" not in st.session_state:
+    st.session_state.review_after = ("", 0)  # keyset position in the verification queue
+    st.session_state.review_log = []          # (time, profiles decided) this session
+
+if "editing_profile" not in st.session_state:
+    st.session_state.editing_profile = False
+
 # Creator onboarding draft
 if "c_photos" not in st.session_state:
     st.session_state.c_photos = []
@@ -502,33 +531,12 @@ if "a_niche" not in st.session_state:
 if "a_bio" not in st.session_state:
     st.session_state.a_bio = ""
 
+perf.begin_run(st.session_state.screen if st.session_state.auth_step == "app" else f"onboarding.{st.session_state.auth_step}")
+
 # =========================
 # CONSTANTS / OPTIONS
 # =========================
-PERSONALITY_TYPES = [
-    "Direct (short messages, clear asks)",
-    "Friendly (warm tone, supportive)",
-    "Professional (formal, structured)",
-    "Low-contact (minimal check-ins)",
-    "High-touch (frequent updates)",
-    "Prefer to discuss later"
-]
-
-CONTENT_TYPES = [
-    "Lifestyle", "Fitness", "Beauty", "Fashion", "Education", "Cosplay",
-    "Gaming", "ASMR", "Couples", "Comedy", "Travel", "Other"
-]
-
-AGENCY_SERVICES = [
-    "Account strategy", "Content planning", "Editing/post-production",
-    "Chatting/DM management", "Promotion/marketing", "Brand deals",
-    "Analytics/reporting", "Photoshoot support", "Operations/admin", "Other"
-]
-
-PAYMENT_MODELS = ["Commission-based", "Monthly fee", "Yearly fee", "Hybrid", "Other"]
-FEE_BANDS = ["Prefer not to say", "$0–$500", "$500–$2k", "$2k–$5k", "$5k+"]
-COMMISSION_BANDS = ["10–15%", "15–20%", "20–25%", "25%+", "Other / depends"]
-EARNINGS_BANDS = ["Prefer not to say", "$0–$5k", "$5k–$20k", "$20k–$50k", "$50k+"]
+LOCATION_FILTERS = ["Anywhere", "Same city", "Same country", "Within distance"]
 
 # =========================
 # ONBOARDING (Tinder-like flow)
@@ -687,6 +695,7 @@ if st.session_state.auth_step != "app":
             st.session_state.c_content_types = st.multiselect("Content type(s)", options=CONTENT_TYPES, default=st.session_state.c_content_types)
             st.session_state.c_earnings_band = st.selectbox("Estimated monthly earnings (optional)", EARNINGS_BANDS, index=EARNINGS_BANDS.index(st.session_state.c_earnings_band))
             st.session_state.c_bio = st.text_area("Short bio", value=st.session_state.c_bio, height=120, placeholder="Goals + what you want from an agency. Keep it short.")
+            contact_notice(st.session_state.c_bio)
 
             st.write("")
             b1, b2 = st.columns([1, 1])
@@ -699,7 +708,7 @@ if st.session_state.auth_step != "app":
                 nxt = st.button("Next", use_container_width=True)
                 st.markdown('</div>', unsafe_allow_html=True)
 
-            if nxt:
+            if nxt and not blocks_contact_details(st.session_state.c_bio):
                 st.session_state.auth_step = "creator_2"
                 st.rerun()
 
@@ -834,10 +843,10 @@ if st.session_state.auth_step != "app":
             if finish:
                 if not consent:
                     st.error("Please confirm consent to continue.")
-                else:
+                elif not throttled(ratelimit.signup_wait(session_key()), "creating profiles"):
                     # Save uploads
-                    photos_saved = save_uploaded_files(st.session_state.c_photos, f"creator_{st.session_state.display_name}")
-                    selfie_saved = save_uploaded_files([selfie], f"selfie_{st.session_state.display_name}") if selfie else []
+                    photos_saved = save_uploaded_files(st.session_state.c_photos, "creator")
+                    selfie_saved = save_uploaded_files([selfie], "selfie") if selfie else []
 
                     payload = {
                         "account_type": "Creator",
@@ -850,6 +859,7 @@ if st.session_state.auth_step != "app":
                         "bio": st.session_state.c_bio.strip(),
                         "verified": 0,
                         "selfie_uploaded": 1 if selfie_saved else 0,
+                        "selfie_photo": selfie_saved[0] if selfie_saved else None,
 
                         "creator_personality": st.session_state.c_personality,
                         "creator_platform_handle": st.session_state.c_platform_handle.strip(),
@@ -872,6 +882,7 @@ if st.session_state.auth_step != "app":
 
                     pid = upsert_profile(payload)
                     st.session_state.profile_id = pid
+                    st.session_state.session_token = sessions.create(pid, st.session_state.display_name, st.session_state.role)
                     st.session_state.auth_step = "app"
                     st.session_state.screen = "home"
                     st.rerun()
@@ -938,8 +949,7 @@ if st.session_state.auth_step != "app":
                 placeholder="Example: Took a creator from $X to $Y/month in 90 days via content strategy + messaging + ads..."
             )
 
-            if contains_phone(st.session_state.a_success):
-                st.error("Remove phone number(s). Website only.")
+            contact_notice(st.session_state.a_success, " Website only.")
 
             st.session_state.a_bio = st.text_area(
                 "Agency bio (short)",
@@ -948,8 +958,7 @@ if st.session_state.auth_step != "app":
                 placeholder="What you offer, how you work, what your standards are."
             )
 
-            if contains_phone(st.session_state.a_bio):
-                st.error("Remove phone number(s). Website only.")
+            contact_notice(st.session_state.a_bio, " Website only.")
 
             st.write("")
             b1, b2 = st.columns([1, 1])
@@ -965,8 +974,8 @@ if st.session_state.auth_step != "app":
             if nxt:
                 if not st.session_state.a_success.strip():
                     st.error("Success story is required.")
-                elif contains_phone(st.session_state.a_success) or contains_phone(st.session_state.a_bio):
-                    st.error("Remove phone number(s).")
+                elif blocks_contact_details(st.session_state.a_success, st.session_state.a_bio):
+                    st.error(CONTACT_ERROR)
                 else:
                     st.session_state.auth_step = "agency_2"
                     st.rerun()
@@ -1011,20 +1020,19 @@ if st.session_state.auth_step != "app":
 
             st.session_state.a_payment_model = st.selectbox("Payment model", PAYMENT_MODELS, index=PAYMENT_MODELS.index(st.session_state.a_payment_model))
 
-            if st.session_state.a_payment_model in ("Monthly fee", "Yearly fee", "Hybrid"):
+            if st.session_state.a_payment_model in FEE_MODELS:
                 st.session_state.a_fee_band = st.selectbox("Fee expectation", FEE_BANDS, index=FEE_BANDS.index(st.session_state.a_fee_band))
             else:
                 st.session_state.a_fee_band = "Prefer not to say"
 
-            if st.session_state.a_payment_model in ("Commission-based", "Hybrid"):
+            if st.session_state.a_payment_model in COMMISSION_MODELS:
                 st.session_state.a_commission_band = st.selectbox("Commission expectation", COMMISSION_BANDS, index=COMMISSION_BANDS.index(st.session_state.a_commission_band))
             else:
                 st.session_state.a_commission_band = "Other / depends"
 
             if st.session_state.a_payment_model == "Other":
                 st.session_state.a_payment_other = st.text_area("Describe your payment structure", value=st.session_state.a_payment_other, height=120, placeholder="No phone numbers. Website only.")
-                if contains_phone(st.session_state.a_payment_other):
-                    st.error("Remove phone number(s). Website only.")
+                contact_notice(st.session_state.a_payment_other, " Website only.")
             else:
                 st.session_state.a_payment_other = ""
 
@@ -1040,9 +1048,9 @@ if st.session_state.auth_step != "app":
                 st.markdown('</div>', unsafe_allow_html=True)
 
             if finish:
-                if contains_phone(st.session_state.a_payment_other):
-                    st.error("Remove phone number(s).")
-                else:
+                if blocks_contact_details(st.session_state.a_payment_other):
+                    st.error(CONTACT_ERROR)
+                elif not throttled(ratelimit.signup_wait(session_key()), "creating profiles"):
                     payload = {
                         "account_type": "Agency",
                         "display_name": st.session_state.display_name,
@@ -1077,6 +1085,7 @@ if st.session_state.auth_step != "app":
 
                     pid = upsert_profile(payload)
                     st.session_state.profile_id = pid
+                    st.session_state.session_token = sessions.create(pid, st.session_state.display_name, st.session_state.role)
                     st.session_state.auth_step = "app"
                     st.session_state.screen = "home"
                     st.rerun()
@@ -1088,23 +1097,24 @@ if st.session_state.auth_step != "app":
 # =========================
 # MAIN APP
 # =========================
-profiles = read_profiles()
+# the frame and the version it was built for come together: Browse caches
+# results under that version, so a write landing mid-run can't mislabel them
+cards_version, profiles = read_profile_cards_versioned()
 
 role = st.session_state.role
 display_name = st.session_state.display_name
 profile_id = st.session_state.profile_id
+is_admin = st.session_state.is_admin
 
-# Safety fallback: if state lost, recover profile_id from DB
-if profile_id is None and display_name and role:
-    pid = get_profile_id(display_name, role)
-    st.session_state.profile_id = pid
-    profile_id = pid
+# Saved searches: match profiles changed since the last check (any session's)
+searches.process_pending_from_app()
+unseen = count_unseen_notifications(profile_id) if profile_id else 0
 
 # Header / hero
 hero(
     f"Welcome, {display_name}",
     f"You are signed in as a {role}.",
-    ["Marketplace", "Messaging", "Trust-first"]
+    ["Marketplace", "Messaging", "Trust-first"] + ([f"{unseen} new match(es)"] if unseen else [])
 )
 
 st.write("")
@@ -1120,6 +1130,12 @@ with b:
 with c:
     if st.button("My Profile", use_container_width=True):
         goto("profile")
+if is_admin:
+    an, vq = st.columns(2)
+    if an.button("Analytics (admin)", use_container_width=True):
+        goto("analytics")
+    if vq.button("Verification queue (admin)", use_container_width=True):
+        goto("verification")
 
 # =========================
 # HOME
@@ -1140,10 +1156,40 @@ if st.session_state.screen == "home":
 
     card_close()
 
+    if profile_id:
+        st.write("")
+        card_open()
+        st.markdown("### Notifications")
+        notes = read_notifications(profile_id)
+        if notes.empty:
+            st.caption("Save a search on Browse to hear about new matching profiles.")
+        else:
+            for n in notes.to_dict("records"):
+                st.write(("**New** • " if not n["seen"] else "") + n["body"])
+                st.caption(n["created"])
+            if unseen and st.button("Mark all as read", use_container_width=True):
+                mark_notifications_seen(profile_id)
+                st.rerun()
+
+        saved = read_saved_searches(profile_id)
+        if not saved.empty:
+            st.markdown("#### Saved searches")
+            for s in saved.to_dict("records"):
+                left, right = st.columns([3, 1])
+                with left:
+                    st.write(f"{s['label']} ({s['target_type']}s)")
+                with right:
+                    if st.button("Delete", key=f"del_search_{s['id']}", use_container_width=True):
+                        delete_search(profile_id, int(s["id"]))
+                        st.rerun()
+        card_close()
+
 # =========================
 # BROWSE
 # =========================
 elif st.session_state.screen == "browse":
+    import pandas as pd  # deferred: onboarding pages never load it
+
     st.write("")
     card_open()
 
@@ -1151,109 +1197,129 @@ elif st.session_state.screen == "browse":
     st.markdown(f"### Browse {target_type}s")
 
     q = st.text_input("Search (name, niche, location)", placeholder="e.g., beauty, London, fitness…")
+
+    # Viewer's normalized location drives the location filters
+    version = cards_version
+    my_loc = viewer_location(version, profile_id)
+
+    # Facet counts need this run's filter state before the widgets render;
+    # keyed widgets already hold it in session_state
+    facet_names = ["services", "payment_models"] if role == "Creator" else ["personalities", "content_types"]
+    loc_filter = st.session_state.get("browse_location", LOCATION_FILTERS[0])
+    radius_km = st.session_state.get("browse_radius", 100) if loc_filter == "Within distance" else 100
+    facets = facet_counts(
+        profiles, version, target_type, q,
+        st.session_state.get("browse_verified", False),
+        loc=(loc_filter, my_loc, radius_km),
+        **{k: st.session_state.get(f"browse_{k}", []) for k in facet_names}
+    )
+
+    def with_count(facet):
+        return lambda o: f"{o} ({facets[facet].get(o, 0)})"
+
     adv = st.expander("Filters")
     with adv:
-        only_verified = st.checkbox("Verified only", value=False)
+        only_verified = st.checkbox("Verified only", value=False, key="browse_verified")
+        filters = {}
         if role == "Creator":
-            service_filter = st.multiselect("Agency services", AGENCY_SERVICES, default=[])
-            pay_filter = st.multiselect("Payment model", PAYMENT_MODELS, default=[])
+            filters["services"] = st.multiselect("Agency services", AGENCY_SERVICES, default=[], key="browse_services", format_func=with_count("services"))
+            filters["payment_models"] = st.multiselect("Payment model", PAYMENT_MODELS, default=[], key="browse_payment_models", format_func=with_count("payment_models"))
         else:
-            personality_filter = st.multiselect("Creator personality style", PERSONALITY_TYPES, default=[])
-            content_filter = st.multiselect("Content types", CONTENT_TYPES, default=[])
-
-    df = profiles.copy()
-    df = df[df["account_type"] == target_type] if not df.empty else df
-
-    if only_verified and not df.empty:
-        df = df[df["verified"] == 1]
-
-    if q.strip() and not df.empty:
-        q2 = q.strip().lower()
-        df = df[
-            df["display_name"].str.lower().str.contains(q2, na=False) |
-            df["niche"].str.lower().str.contains(q2, na=False) |
-            df["location_current"].str.lower().str.contains(q2, na=False)
-        ]
-
-    # Role-specific filters
-    if not df.empty and role == "Creator":
-        if service_filter:
-            df = df[df["agency_services"].fillna("").apply(lambda x: any(s in _csv_split(x) for s in service_filter))]
-        if pay_filter:
-            df = df[df["agency_payment_model"].fillna("").isin(pay_filter)]
-
-    if not df.empty and role == "Agency":
-        if personality_filter:
-            df = df[df["creator_personality"].fillna("").isin(personality_filter)]
-        if content_filter:
-            df = df[df["creator_content_types"].fillna("").apply(lambda x: any(s in _csv_split(x) for s in content_filter))]
+            filters["personalities"] = st.multiselect("Creator personality style", PERSONALITY_TYPES, default=[], key="browse_personalities", format_func=with_count("personalities"))
+            filters["content_types"] = st.multiselect("Content types", CONTENT_TYPES, default=[], key="browse_content_types", format_func=with_count("content_types"))
+        loc_filter = st.selectbox("Location", LOCATION_FILTERS, index=0, key="browse_location")
+        if loc_filter == "Within distance":
+            radius_km = st.slider("Distance (km)", min_value=10, max_value=1000, value=100, step=10, key="browse_radius")
+
+        if profile_id:
+            # New or edited profiles matching these filters show up as notifications
+            label_col, save_col = st.columns([3, 1])
+            with label_col:
+                search_label = st.text_input("Save this search as", placeholder="e.g., London fitness creators", key="browse_search_label")
+            with save_col:
+                if st.button("Save search", use_container_width=True) and not throttled(ratelimit.profile_writes.acquire(profile_id), "saving searches"):
+                    searches.create_search(profile_id, search_label, target_type, q, only_verified,
+                                           loc=(loc_filter, my_loc, radius_km), **filters)
+                    st.success("Saved. Matches will appear under Notifications on Home.")
+
+    # A different query starts again from its first page
+    query_sig = (target_type, q, only_verified, repr(sorted(filters.items())), loc_filter, radius_km)
+    if st.session_state.get("browse_query") != query_sig:
+        st.session_state.browse_query = query_sig
+        st.session_state.browse_page = 0
+    page = st.session_state.get("browse_page", 0)
+
+    with perf.span("browse.filter"):
+        total, df, loc_warning = browse_page(
+            profiles, version, target_type, q, only_verified,
+            loc=(loc_filter, my_loc, radius_km), page=page, **filters
+        )
+        if df.empty and page > 0:
+            # the result set shrank under us (new data): back to the first page
+            st.session_state.browse_page = page = 0
+            total, df, loc_warning = browse_page(
+                profiles, version, target_type, q, only_verified,
+                loc=(loc_filter, my_loc, radius_km), page=page, **filters
+            )
+    if loc_warning:
+        st.warning(loc_warning)
 
     if df.empty:
         st.info(f"No {target_type.lower()} profiles found yet.")
     else:
         # Render cards
-        for _, p in df.iterrows():
-            # Card wrapper
-            st.markdown('<div class="cn-card" style="margin-bottom:12px;">', unsafe_allow_html=True)
-            top = st.columns([3, 1])
-
-            # Left
-            with top[0]:
-                badges = []
-                if int(p.get("verified", 0) or 0) == 1:
-                    badges.append('<span class="cn-badge cn-badge-verify">Verified</span>')
-                if target_type == "Creator" and int(p.get("selfie_uploaded", 0) or 0) == 1:
-                    badges.append('<span class="cn-badge">Selfie uploaded</span>')
-                badges.append(f'<span class="cn-badge">{p["account_type"]}</span>')
-                st.markdown("".join(badges), unsafe_allow_html=True)
-
-                title = p.get("agency_name") if target_type == "Agency" else p.get("display_name")
-                st.markdown(f"**{title or p.get('display_name','')}**")
-
-                meta = []
-                if p.get("niche"):
-                    meta.append(str(p.get("niche")))
-                if p.get("location_current"):
-                    meta.append(str(p.get("location_current")))
-                st.caption(" • ".join(meta) if meta else "")
-
-                if target_type == "Creator":
-                    # Show creator signals
-                    ct = _csv_split(p.get("creator_content_types", ""))
-                    if ct:
-                        st.write(f"**Content:** {', '.join(ct[:6])}")
-                    if p.get("creator_personality"):
-                        st.write(f"**Style:** {p.get('creator_personality')}")
-                    if p.get("creator_earnings_band"):
-                        st.write(f"**Earnings (band):** {p.get('creator_earnings_band')}")
-                else:
-                    # Show agency signals
-                    sv = _csv_split(p.get("agency_services", ""))
-                    if sv:
-                        st.write(f"**Services:** {', '.join(sv[:6])}")
-                    if p.get("agency_payment_model"):
-                        st.write(f"**Payment:** {p.get('agency_payment_model')}")
-                    if p.get("agency_commission_band") and p.get("agency_payment_model") in ("Commission-based", "Hybrid"):
-                        st.write(f"**Commission:** {p.get('agency_commission_band')}")
-                    if p.get("agency_fee_band") and p.get("agency_payment_model") in ("Monthly fee", "Yearly fee", "Hybrid"):
-                        st.write(f"**Fee:** {p.get('agency_fee_band')}")
-                    if p.get("agency_website"):
-                        st.write(f"**Website:** {p.get('agency_website')}")
-
-                bio = (p.get("bio") or "").strip()
-                if bio:
-                    st.write(bio[:240] + ("..." if len(bio) > 240 else ""))
-
-            # Right actions
-            with top[1]:
-                st.markdown('<div class="cn-primary">', unsafe_allow_html=True)
-                msg = st.button("Message", key=f"msg_{p['id']}", use_container_width=True)
+        with perf.span("browse.render"):
+            for p in df.to_dict("records"):
+                # Card wrapper
+                st.markdown('<div class="cn-card" style="margin-bottom:12px;">', unsafe_allow_html=True)
+                top = st.columns([3, 1])
+
+                # Left
+                with top[0]:
+                    # Static part: one memoized HTML fragment per profile version
+                    st.markdown(card_html(p), unsafe_allow_html=True)
+                    if pd.notna(p.get("_distance")):
+                        st.caption(f"{p['_distance']:.0f} km away")
+
+                    # Full text is only fetched for cards the viewer opens
+                    if st.toggle("Details", key=f"details_{p['id']}"):
+                        detail = get_profile_by_id(int(p["id"]))
+                        if not detail.empty:
+                            d = detail.iloc[0].to_dict()
+                            if d.get("bio"):
+                                st.write(d["bio"])
+                            if d.get("location_hometown"):
+                                st.write(f"**Hometown:** {d['location_hometown']}")
+                            if target_type == "Agency":
+                                if d.get("agency_content_specialties"):
+                                    st.write(f"**Specialties:** {', '.join(_csv_split(d['agency_content_specialties']))}")
+                                if d.get("agency_success_story"):
+                                    st.write(f"**Success story:** {d['agency_success_story']}")
+                                if d.get("agency_payment_other"):
+                                    st.write(f"**Payment notes:** {d['agency_payment_other']}")
+
+                # Right actions
+                with top[1]:
+                    st.markdown('<div class="cn-primary">', unsafe_allow_html=True)
+                    msg = st.button("Message", key=f"msg_{p['id']}", use_container_width=True)
+                    st.markdown('</div>', unsafe_allow_html=True)
+                    if msg:
+                        st.session_state.compose_to_id = int(p["id"])
+                        goto("messages")
+
                 st.markdown('</div>', unsafe_allow_html=True)
-                if msg:
-                    st.session_state.compose_to_id = int(p["id"])
-                    goto("messages")
 
-            st.markdown('</div>', unsafe_allow_html=True)
+        pages = (total + PAGE_SIZE - 1) // PAGE_SIZE
+        if pages > 1:
+            prev_col, info_col, next_col = st.columns([1, 2, 1])
+            with prev_col:
+                st.button("Previous", use_container_width=True, disabled=page == 0,
+                          on_click=lambda: st.session_state.update(browse_page=page - 1))
+            with info_col:
+                st.caption(f"Page {page + 1} of {pages} • {total} profiles")
+            with next_col:
+                st.button("Next page", use_container_width=True, disabled=page >= pages - 1,
+                          on_click=lambda: st.session_state.update(browse_page=page + 1))
 
     st.write("")
     if st.button("Back to home", use_container_width=True):
@@ -1272,7 +1338,7 @@ elif st.session_state.screen == "messages":
         st.error("Profile not found. Please sign out and sign in again.")
         card_close()
     else:
-        inbox = read_inbox(profile_id)
+        inbox, more_inbox = inbox_messages(profile_id)
 
         left, right = st.columns([1, 1])
 
@@ -1309,9 +1375,12 @@ elif st.session_state.screen == "messages":
             st.markdown('</div>', unsafe_allow_html=True)
 
             if send:
+                found = pii.kinds(body) if PII_POLICY == "block" else None
                 if not to_id or not body.strip():
                     st.error("Pick a receiver and write a message.")
-                else:
+                elif found:
+                    st.error(f"Keep contact details in the app for now: remove {pii.describe(found)}.")
+                elif not throttled(ratelimit.messages.acquire(profile_id), "sending messages"):
                     insert_message(profile_id, to_id, body.strip())
                     st.session_state.compose_to_id = None
                     st.success("Sent.")
@@ -1322,22 +1391,52 @@ elif st.session_state.screen == "messages":
                 goto("home")
 
         with right:
-            st.markdown("### Inbox (latest)")
-            if inbox.empty:
-                st.caption("No messages yet.")
+            # Build map id->name
+            id_to_name = {int(r["id"]): f'{r["display_name"]} ({r["account_type"]})' for _, r in profiles.iterrows()}
+
+            def message_header(m):
+                sender = id_to_name.get(int(m["sender_id"]), f"User {m['sender_id']}")
+                receiver = id_to_name.get(int(m["receiver_id"]), f"User {m['receiver_id']}")
+                direction = "To" if int(m["sender_id"]) == int(profile_id) else "From"
+                other = receiver if direction == "To" else sender
+                st.markdown(f"**{direction}: {other}**")
+
+            query = st.text_input("Search your messages", placeholder="e.g. commission, contract, trial month")
+            if query != st.session_state.msg_search_query:
+                st.session_state.msg_search_query = query
+                st.session_state.msg_search_page = 0
+
+            if query.strip():
+                st.markdown("### Search results")
+                page = st.session_state.msg_search_page
+                hits = search_messages(profile_id, query, page=page)
+                if hits.empty:
+                    st.caption("No matching messages." if page == 0 else "No more matches.")
+                for _, m in hits.iterrows():
+                    message_header(m)
+                    st.markdown(m["snippet"])
+                    st.caption(m["created"])
+                    st.markdown("---")
+                prev_col, next_col = st.columns(2)
+                if page > 0 and prev_col.button("Better matches", use_container_width=True):
+                    st.session_state.msg_search_page -= 1
+                    st.rerun()
+                if len(hits) >= MESSAGE_SEARCH_PAGE and next_col.button("More matches", use_container_width=True):
+                    st.session_state.msg_search_page += 1
+                    st.rerun()
             else:
-                # Build map id->name
-                id_to_name = {int(r["id"]): f'{r["display_name"]} ({r["account_type"]})' for _, r in profiles.iterrows()}
-                for _, m in inbox.head(12).iterrows():
-                    sender = id_to_name.get(int(m["sender_id"]), f"User {m['sender_id']}")
-                    receiver = id_to_name.get(int(m["receiver_id"]), f"User {m['receiver_id']}")
-                    direction = "To" if int(m["sender_id"]) == int(profile_id) else "From"
-                    other = receiver if direction == "To" else sender
-
-                    st.markdown(f"**{direction}: {other}**")
+                st.markdown("### Inbox (latest)")
+                if not inbox:
+                    st.caption("No messages yet.")
+                for m in inbox:
+                    message_header(m)
                     st.write(m["body"])
                     st.caption(m["created"])
                     st.markdown("---")
+                # older pages come from the archive once the hot table runs out
+                if more_inbox and st.button("Older messages", use_container_width=True):
+                    load_older_messages(profile_id, inbox)
+                    st.rerun()
 
     card_close()
 
@@ -1370,6 +1469,12 @@ elif st.session_state.screen == "profile":
             st.write(f"**Location:** {p.get('location_current','')}")
             if p.get("location_hometown"):
                 st.write(f"**Hometown:** {p.get('location_hometown','')}")
+            if p.get("loc_city_id"):
+                st.caption(f"Location filters match you to {geo.city_name(p.get('loc_city_id'))}, {geo.country_name(p.get('loc_country'))}.")
+            elif p.get("loc_country"):
+                st.caption(f"Location filters match you to {geo.country_name(p.get('loc_country'))} (city not recognised).")
+            elif p.get("location_current"):
+                st.caption("Location not recognised for location filters. Use \"City, Country\".")
 
             if p.get("account_type") == "Creator":
                 if p.get("creator_personality"):
@@ -1414,22 +1519,82 @@ elif st.session_state.screen == "profile":
                 st.markdown("**Bio**")
                 st.write(p.get("bio"))
 
+            flash = st.session_state.pop("profile_flash", None)
+            if flash:
+                st.success(flash)
+
+            # Edit in place: prefilled form, only changed fields are written
+            if st.session_state.editing_profile:
+                st.write("")
+                st.markdown("### Edit profile")
+                is_creator = p.get("account_type") == "Creator"
+
+                def pick(options, value):
+                    return options.index(value) if value in options else 0
+
+                new_photos = []
+                with st.form("edit_profile"):
+                    changes = {
+                        "niche": st.text_input("Niche", value=p.get("niche") or ""),
+                        "location_current": st.text_input("Current location", value=p.get("location_current") or "", placeholder="City, Country"),
+                    }
+                    if is_creator:
+                        changes["location_hometown"] = st.text_input("Hometown", value=p.get("location_hometown") or "")
+                        changes["creator_personality"] = st.selectbox("Personality / communication style", PERSONALITY_TYPES, index=pick(PERSONALITY_TYPES, p.get("creator_personality")))
+                        changes["creator_content_types"] = _csv_join(st.multiselect("Content type(s)", CONTENT_TYPES, default=[t for t in _csv_split(p.get("creator_content_types")) if t in CONTENT_TYPES]))
+                        changes["creator_earnings_band"] = st.selectbox("Estimated monthly earnings (optional)", EARNINGS_BANDS, index=pick(EARNINGS_BANDS, p.get("creator_earnings_band")))
+                        changes["creator_platform_handle"] = st.text_input("Platform handle", value=p.get("creator_platform_handle") or "")
+                        changes["creator_platform_url"] = st.text_input("Platform URL", value=p.get("creator_platform_url") or "")
+                        new_photos = st.file_uploader("Replace photos (optional — leave empty to keep current photos)", type=["png", "jpg", "jpeg", "webp"], accept_multiple_files=True)
+                    else:
+                        changes["agency_name"] = st.text_input("Agency name", value=p.get("agency_name") or "")
+                        changes["agency_website"] = st.text_input("Website", value=p.get("agency_website") or "")
+                        changes["agency_services"] = _csv_join(st.multiselect("Services you offer", AGENCY_SERVICES, default=[t for t in _csv_split(p.get("agency_services")) if t in AGENCY_SERVICES]))
+                        changes["agency_content_specialties"] = _csv_join(st.multiselect("Best content categories you manage", CONTENT_TYPES, default=[t for t in _csv_split(p.get("agency_content_specialties")) if t in CONTENT_TYPES]))
+                        changes["agency_payment_model"] = st.selectbox("Payment model", PAYMENT_MODELS, index=pick(PAYMENT_MODELS, p.get("agency_payment_model")))
+                        changes["agency_fee_band"] = st.selectbox("Fee expectation", FEE_BANDS, index=pick(FEE_BANDS, p.get("agency_fee_band")))
+                        changes["agency_commission_band"] = st.selectbox("Commission expectation", COMMISSION_BANDS, index=pick(COMMISSION_BANDS, p.get("agency_commission_band")))
+                        st.caption("Fees apply to monthly, yearly and hybrid models, commission to commission-based and hybrid, notes to Other.")
+                        changes["agency_payment_other"] = st.text_input("Payment notes", value=p.get("agency_payment_other") or "")
+                        changes["agency_success_story"] = st.text_area("Success story", value=p.get("agency_success_story") or "", height=120)
+                    changes["bio"] = st.text_area("Bio", value=p.get("bio") or "", height=140)
+                    save = st.form_submit_button("Save changes", use_container_width=True)
+
+                if save:
+                    changes = {k: v.strip() if isinstance(v, str) else v for k, v in changes.items()}
+                    if not is_creator:
+                        changes.update(payment_terms(changes["agency_payment_model"], changes["agency_fee_band"],
+                                                     changes["agency_commission_band"], changes["agency_payment_other"]))
+                    errors = profile_errors({**p, **changes})
+                    if errors:
+                        st.error(" ".join(errors))
+                    elif not throttled(ratelimit.profile_writes.acquire(profile_id), "saving changes"):
+                        if new_photos:
+                            changes["creator_photos"] = _csv_join(save_uploaded_files(new_photos, "creator"))
+                        changed = update_profile(profile_id, changes)
+                        st.session_state.editing_profile = False
+                        st.session_state.profile_flash = f"Saved {len(changed)} change(s)." if changed else "No changes."
+                        st.rerun()
+
             st.write("")
             c1, c2 = st.columns(2)
             with c1:
-                # Edit = restart onboarding for that role
-                if st.button("Edit profile", use_container_width=True):
-                    st.session_state.auth_step = "creator_0" if role == "Creator" else "agency_0"
+                if st.button("Cancel editing" if st.session_state.editing_profile else "Edit profile", use_container_width=True):
+                    st.session_state.editing_profile = not st.session_state.editing_profile
                     st.rerun()
             with c2:
                 if st.button("Sign out", use_container_width=True):
                     # reset session
+                    sessions.revoke(st.session_state.session_token)
+                    st.session_state.session_token = ""
+                    st.session_state.is_admin = False
                     st.session_state.auth_step = "role"
                     st.session_state.role = ""
                     st.session_state.display_name = ""
                     st.session_state.profile_id = None
                     st.session_state.screen = "home"
                     st.session_state.compose_to_id = None
+                    st.session_state.editing_profile = False
 
                     # clear drafts
                     st.session_state.c_photos = []
@@ -1460,6 +1625,238 @@ elif st.session_state.screen == "profile":
 
                     st.rerun()
 
+            # Admin tools: unlocked by the operator's key, never by a name
+            if ADMIN_KEY and not is_admin:
+                with st.expander("Admin access"):
+                    key = st.text_input("Admin key", type="password")
+                    if st.button("Unlock admin tools", use_container_width=True) and not throttled(ratelimit.admin_keys.acquire(profile_id), "trying admin keys"):
+                        if not admin_key_ok(key):
+                            st.error("That key is not valid.")
+                        else:
+                            # a fresh token carries the grant, so a reload keeps it
+                            old = st.session_state.session_token
+                            st.session_state.session_token = sessions.create(profile_id, display_name, role, admin=True)
+                            sessions.revoke(old)
+                            st.session_state.is_admin = True
+                            st.rerun()
+
     card_close()
 
+# =========================
+# ANALYTICS (admin only; reads the rollup tables, never raw profiles/messages)
+# =========================
+elif st.session_state.screen == "analytics" and is_admin:
+    import plotly.express as px  # only admins pay for the import
+
+    st.write("")
+    card_open()
+    st.markdown("### Marketplace health")
+    days = st.selectbox("Period", [30, 90, 365], index=1, format_func=lambda d: f"Last {d} days")
+    with perf.span("analytics.read"):
+        daily, totals = read_rollups(days)
+
+    def rollup_total(metric):
+        t = totals[totals["metric"] == metric]
+        return dict(zip(t["key"].replace("", "Not set"), t["value"]))
+
+    def rollup_daily(metric):
+        return daily[daily["metric"] == metric]
+
+    by_type = rollup_total("profiles")
+    verification = rollup_total("verification")
+    started = int(rollup_daily("conversations")["value"].sum())
+    replied = int(rollup_daily("replied")["value"].sum())
+
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Creators", by_type.get("Creator", 0))
+    m2.metric("Agencies", by_type.get("Agency", 0))
+    m3.metric("Reply rate", f"{replied / started:.0%}" if started else "–", help="Conversations started in the period that got a reply")
+    m4.metric("Verification backlog", verification.get("pending", 0), help="Creators with a selfie awaiting review")
+
+    signups = rollup_daily("signups")
+    if not signups.empty:
+        st.plotly_chart(px.bar(signups, x="day", y="value", color="key", title="Signups per day",
+                               labels={"day": "", "value": "Signups", "key": "Account type"}), use_container_width=True)
+
+    messages = rollup_daily("messages")
+    if not messages.empty:
+        st.plotly_chart(px.bar(messages, x="day", y="value", title="Messages per day",
+                               labels={"day": "", "value": "Messages"}), use_container_width=True)
+
+    if started:
+        conv = daily[daily["metric"].isin(["conversations", "replied"])].pivot_table(index="day", columns="metric", values="value", aggfunc="sum", fill_value=0)
+        conv["reply_rate"] = conv.get("replied", 0) / conv["conversations"].where(conv["conversations"] > 0)
+        st.plotly_chart(px.line(conv.reset_index(), x="day", y="reply_rate", markers=True, title="Reply rate by conversation start day",
+                                labels={"day": "", "reply_rate": "Reply rate"}).update_yaxes(tickformat=".0%"), use_container_width=True)
+
+    d1, d2 = st.columns(2)
+    with d1:
+        bands = rollup_total("earnings_band")
+        if bands:
+            st.plotly_chart(px.bar(x=list(bands), y=list(bands.values()), title="Creator earnings bands",
+                                   labels={"x": "", "y": "Creators"}), use_container_width=True)
+    with d2:
+        models = rollup_total("payment_model")
+        if models:
+            st.plotly_chart(px.bar(x=list(models), y=list(models.values()), title="Agency payment models",
+                                   labels={"x": "", "y": "Agencies"}), use_container_width=True)
+    if verification:
+        st.plotly_chart(px.pie(names=list(verification), values=list(verification.values()), title="Creator verification"), use_container_width=True)
+
+    card_close()
+
+# =========================
+# VERIFICATION QUEUE (admin only; pending set read through idx_profiles_review)
+# =========================
+elif st.session_state.screen == "verification" and is_admin:
+    st.write("")
+    card_open()
+    st.markdown("### Verification queue")
+
+    stats, reviews = verification_stats(24)
+    session_reviews = st.session_state.review_log
+    session_count = sum(n for _, n in session_reviews)
+    session_minutes = (time.time() - session_reviews[0][0]) / 60 if session_reviews else 0
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Pending", stats["pending"])
+    oldest = stats["oldest_pending"]
+    m2.metric("Oldest waiting", f"{(datetime.now() - datetime.fromisoformat(oldest)).days} d" if oldest else "–")
+    m3.metric("Reviewed (24h)", int(reviews["reviews"].sum()) if not reviews.empty else 0)
+    m4.metric("You, this session", session_count,
+              help=f"{session_count / session_minutes:.1f} per minute" if session_minutes >= 1 else None)
+
+    page = pending_verifications(st.session_state.review_after, REVIEW_PAGE)
+    if page.empty:
+        st.success("Nothing pending." if st.session_state.review_after == ("", 0) else "No more pending profiles after this page.")
+    else:
+        def select_page(ids=tuple(page["id"])):
+            for pid in ids:
+                st.session_state[f"review_{pid}"] = st.session_state.review_select_all
+
+        st.checkbox("Select all on this page", key="review_select_all", on_change=select_page)
+        # a form: ticking boxes doesn't rerun the script, only the decision does
+        with st.form("review_form"):
+            for _, p in page.iterrows():
+                c_selfie, c_info, c_pick = st.columns([1, 3, 1])
+                selfie = upload_thumbnail(p["selfie_photo"]) if p["selfie_photo"] else None
+                if selfie:
+                    c_selfie.image(str(selfie), width=THUMB_PX, caption="Selfie")
+                else:
+                    c_selfie.caption("Selfie file missing")
+                c_info.markdown(f"**{p['display_name']}** · {p['niche'] or ''} · {p['location_current'] or ''}")
+                c_info.caption(f"Signed up {p['created'][:10]}")
+                photos = [t for t in (upload_thumbnail(fn) for fn in _csv_split(p["creator_photos"])[:4]) if t]
+                if photos:
+                    c_info.image([str(t) for t in photos], width=THUMB_PX // 2)
+                c_pick.checkbox("Select", key=f"review_{p['id']}")
+                st.markdown("---")
+            approve_col, reject_col = st.columns(2)
+            approve = approve_col.form_submit_button("Approve selected", use_container_width=True)
+            reject = reject_col.form_submit_button("Reject selected", use_container_width=True)
+
+        if approve or reject:
+            picked = [int(pid) for pid in page["id"] if st.session_state.get(f"review_{pid}")]
+            if not picked:
+                st.warning("Select at least one profile.")
+            else:
+                done = review_profiles(picked, VERIFIED if approve else VERIFICATION_REJECTED, display_name)
+                st.session_state.review_log.append((time.time(), len(done)))
+                for pid in picked:
+                    st.session_state.pop(f"review_{pid}", None)
+                st.session_state.pop("review_select_all", None)
+                st.rerun()
+
+        skip_col, reset_col = st.columns(2)
+        if skip_col.button("Skip this page", use_container_width=True):
+            last = page.iloc[-1]
+            st.session_state.review_after = (last["created"], int(last["id"]))
+            st.rerun()
+    if st.session_state.review_after != ("", 0) and st.button("Back to oldest", use_container_width=True):
+        st.session_state.review_after = ("", 0)
+        st.rerun()
+
+    if not reviews.empty:
+        st.markdown("**Last 24 hours**")
+        table = reviews.assign(decision=reviews["decision"].map({VERIFIED: "approved", VERIFICATION_REJECTED: "rejected"}),
+                               avg_wait_days=(reviews["avg_wait_seconds"] / 86400).round(1))
+        st.dataframe(table[["reviewer", "decision", "reviews", "first", "last", "avg_wait_days"]],
+                     use_container_width=True, hide_index=True)
+
+    card_close()
+
+# =========================
+# PERFORMANCE PANEL (admin only)
+# =========================
+if is_admin:
+    import pandas as pd
+
+    st.write("")
+    with st.expander("Performance (admin)"):
+        spans = perf.current_spans()
+        st.markdown("**This rerun so far**")
+        if spans:
+            st.dataframe(
+                pd.DataFrame([{"span": ("· " * s["depth"]) + s["name"], "ms": s["ms"]} for s in spans]),
+                use_container_width=True,
+                hide_index=True
+            )
+
+        snap = perf.snapshot()
+        screens = [h for h in snap["histograms"] if h["name"] == "cn_screen_ms"]
+        if screens:
+            st.markdown("**Screen latency (ms)**")
+            st.dataframe(
+                pd.DataFrame([{"screen": h["labels"]["screen"], "reruns": h["count"], "p50": h["p50_ms"], "p95": h["p95_ms"], "p99": h["p99_ms"]} for h in screens]),
+                use_container_width=True,
+                hide_index=True
+            )
+
+        helpers = [h for h in snap["histograms"] if h["name"] == "cn_span_ms"]
+        if helpers:
+            st.markdown("**Helpers & sections (ms)**")
+            st.dataframe(
+                pd.DataFrame([{"span": h["labels"]["span"], "calls": h["count"], "p50": h["p50_ms"], "p95": h["p95_ms"], "p99": h["p99_ms"]} for h in helpers]).sort_values("p95", ascending=False),
+                use_container_width=True,
+                hide_index=True
+            )
+
+        if snap["counters"]:
+            st.markdown("**Counters**")
+            st.dataframe(
+                pd.DataFrame([{"counter": c["name"], "labels": ", ".join(f"{k}={v}" for k, v in c["labels"].items()), "value": c["value"]} for c in snap["counters"]]),
+                use_container_width=True,
+                hide_index=True
+            )
+
+        st.markdown("**Rate limits (this worker)**")
+        st.dataframe(pd.DataFrame(ratelimit.stats()), use_container_width=True, hide_index=True)
+
+        st.markdown("**Result cache (this worker)**")
+        st.dataframe(pd.DataFrame([result_cache.stats()]), use_container_width=True, hide_index=True)
+
+        st.markdown("**Sign-in sessions**")
+        st.dataframe(pd.DataFrame([{**sessions.stats(), "stored": count_sessions()}]), use_container_width=True, hide_index=True)
+
+        if SQL_TRACE:
+            st.markdown(f"**SQL statements (rolling, slow ≥ {SLOW_QUERY_MS:.0f} ms)**")
+            sql_stats = sqltrace.stats()
+            if sql_stats:
+                st.dataframe(pd.DataFrame(sql_stats), use_container_width=True, hide_index=True)
+        else:
+            st.caption("SQL tracing is off. Set CN_SQL_TRACE=1 to collect per-statement latency.")
+
+        d1, d2 = st.columns(2)
+        with d1:
+            st.download_button("Export Prometheus text", perf.prometheus_text(), file_name="metrics.prom", mime="text/plain", use_container_width=True)
+        with d2:
+            st.download_button("Export JSON lines", perf.jsonl(), file_name="metrics.jsonl", mime="application/x-ndjson", use_container_width=True)
+
+    with st.expander("Contact-detail flags (admin)"):
+        flags = read_pii_flags()
+        if flags.empty:
+            st.caption("No contact details found in profile text or messages.")
+        else:
+            st.dataframe(flags, use_container_width=True, hide_index=True)
+        st.caption(f"Written inline on every save (policy: {PII_POLICY}, CN_PII_POLICY). Back-scan older rows with: python maintenance.py pii")
+
 shell_close()
@@ -0,0 +1,361 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+log = logging.getLogger("creator_network.backup")
+
+# storage is imported lazily: CN_DATA_DIR must be set before it loads
+
+# =========================
+# CONFIG
+# =========================
+BACKUP_DIR = os.environ.get("CN_BACKUP_DIR", "")  # default <CN_DATA_DIR>/backups
+# database pages copied per backup step, and the pause between steps that
+# lets writers in; one step holds the source lock for well under a millisecond
+PAGES_PER_STEP = int(os.environ.get("CN_BACKUP_PAGES_PER_STEP", "256"))
+STEP_SLEEP_MS = float(os.environ.get("CN_BACKUP_STEP_SLEEP_MS", "5"))
+# upload bytes copied per second into the object store (0 = unthrottled)
+UPLOAD_MBPS = float(os.environ.get("CN_BACKUP_UPLOAD_MBPS", "40"))
+KEEP = int(os.environ.get("CN_BACKUP_KEEP", "14"))
+NICE = int(os.environ.get("CN_BACKUP_NICE", "10"))
+
+# microseconds so back-to-back runs never share a directory name;
+# snapshots from before that carry whole seconds and still parse
+STAMP_FORMAT = "%Y%m%dT%H%M%S.%fZ"
+OLD_STAMP_FORMAT = "%Y%m%dT%H%M%SZ"
+
+# =========================
+# LAYOUT
+# =========================
+# <root>/objects/ab/<sha256>      upload contents, shared by every snapshot
+# <root>/<stamp>/app.db           self-contained copy (rollback journal, no WAL)
+# <root>/<stamp>/uploads/<name>   hardlinks into objects/
+# <root>/<stamp>/manifest.json    change-log seq, db sha256, upload name -> sha256
+# A snapshot is built under .<stamp>.partial and renamed when complete, so a
+# listed snapshot is always whole. Each snapshot directory is a restorable
+# data dir on its own; only new upload contents take space.
+def _root(root=None):
+    import storage
+
+    return Path(root or BACKUP_DIR or storage.DATA_DIR / "backups")
+
+def _object_path(root, sha):
+    return root / "objects" / sha[:2] / sha
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _stamp_time(stamp):
+    for fmt in (STAMP_FORMAT, OLD_STAMP_FORMAT):
+        try:
+            return datetime.strptime(stamp, fmt)
+        except ValueError:
+            pass
+    return None
+
+def _new_stamp(root):
+    # bumped past any name already taken (coarse clocks, a clock stepped back)
+    now = datetime.now(timezone.utc)
+    while True:
+        stamp = now.strftime(STAMP_FORMAT)
+        if not (root / stamp).exists() and not (root / f".{stamp}.partial").exists():
+            return stamp
+        now += timedelta(microseconds=1)
+
+def snapshots(root=None):
+    # -> [(stamp, manifest)] oldest first, complete snapshots only
+    root = _root(root)
+    out = []
+    dirs = [d for d in root.glob("[0-9]*T*Z") if _stamp_time(d.name)]
+    for d in sorted(dirs, key=lambda d: _stamp_time(d.name)):
+        try:
+            out.append((d.name, json.loads((d / "manifest.json").read_text())))
+        except (FileNotFoundError, ValueError):
+            continue
+    return out
+
+class _Throttle:
+    def __init__(self, mbps):
+        self.rate = mbps * 1024 * 1024
+        self.t0 = time.monotonic()
+        self.done = 0
+
+    def spend(self, nbytes):
+        if self.rate <= 0:
+            return
+        self.done += nbytes
+        ahead = self.done / self.rate - (time.monotonic() - self.t0)
+        if ahead > 0:
+            time.sleep(ahead)
+
+# =========================
+# DATABASE (SQLite online backup API)
+# =========================
+def backup_db(dest, pages=PAGES_PER_STEP, sleep_ms=STEP_SLEEP_MS):
+    import storage
+
+    report = {}
+    src = sqlite3.connect(str(storage.DB_PATH), isolation_level=None, timeout=30)
+    dst = sqlite3.connect(str(dest), isolation_level=None)
+    try:
+        # PASSIVE never waits for readers or writers; it only folds what it
+        # can of the WAL into the main file so the copy reads fewer frames
+        busy, wal_frames, moved = src.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        report["wal_frames"], report["wal_checkpointed"] = wal_frames, moved
+
+        # One read transaction across every step pins the snapshot. Without
+        # it a commit from any other connection restarts the copy from page
+        # one, and a busy database never finishes. A WAL reader does not
+        # block writers; it only keeps checkpoints from passing its snapshot.
+        src.execute("BEGIN")
+        has_changes = src.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'changes'").fetchone()
+        report["seq"] = src.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0] if has_changes else 0
+        steps = 0
+
+        def progress(status, remaining, total):
+            nonlocal steps
+            steps += 1
+            report["pages"] = total
+            if sleep_ms > 0:
+                time.sleep(sleep_ms / 1000)
+
+        t0 = time.perf_counter()
+        src.backup(dst, pages=pages, progress=progress)
+        src.execute("COMMIT")
+        report["steps"] = steps
+        report["copy_seconds"] = round(time.perf_counter() - t0, 3)
+
+        # the copy inherits WAL mode from the header; a single file is easier to ship
+        dst.execute("PRAGMA journal_mode=DELETE")
+        # full check on the copy, so the cost lands on the backup, not on users
+        # (quick_check also misreports NOT NULL columns of WITHOUT ROWID tables
+        # on some SQLite 3.40 builds)
+        t0 = time.perf_counter()
+        report["integrity"] = _integrity(dst)
+        report["check_seconds"] = round(time.perf_counter() - t0, 3)
+    finally:
+        src.close()
+        dst.close()
+    report["bytes"] = os.path.getsize(dest)
+    report["sha256"] = _sha256(dest)
+    return report
+
+def _integrity(conn):
+    rows = conn.execute("PRAGMA integrity_check").fetchall()
+    return "ok" if rows == [("ok",)] else "; ".join(r[0] for r in rows[:20])
+
+# =========================
+# UPLOADS (incremental, content-addressed)
+# =========================
+def backup_uploads(root, dest, previous=None, mbps=UPLOAD_MBPS):
+    # previous: the last snapshot's upload map; a file whose size and mtime
+    # match is not read again
+    import storage
+
+    previous = previous or {}
+    dest.mkdir(parents=True, exist_ok=True)
+    throttle = _Throttle(mbps)
+    files = {}
+    report = {"files": 0, "bytes": 0, "hashed": 0, "new_objects": 0, "new_bytes": 0}
+    for path in sorted(storage.UPLOAD_DIR.iterdir()):
+        if not path.is_file() or path.name.startswith("."):
+            continue
+        try:
+            st = path.stat()
+            prev = previous.get(path.name)
+            if prev and prev[1] == st.st_size and prev[2] == st.st_mtime_ns and _object_path(root, prev[0]).exists():
+                sha = prev[0]
+            else:
+                sha = _store_object(root, path, throttle, report)
+        except FileNotFoundError:
+            continue  # removed by upload GC while we walked the directory
+        os.link(_object_path(root, sha), dest / path.name)
+        files[path.name] = [sha, st.st_size, st.st_mtime_ns]
+        report["files"] += 1
+        report["bytes"] += st.st_size
+    return files, report
+
+def _store_object(root, path, throttle, report):
+    # copy and hash in one read; identical contents land on one object
+    tmp = root / "objects" / f".{os.getpid()}.tmp"
+    tmp.parent.mkdir(parents=True, exist_ok=True)
+    h = hashlib.sha256()
+    with open(path, "rb") as f, open(tmp, "wb") as out:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+            out.write(chunk)
+            throttle.spend(len(chunk))
+    sha = h.hexdigest()
+    report["hashed"] += 1
+    obj = _object_path(root, sha)
+    if obj.exists():
+        tmp.unlink()
+    else:
+        obj.parent.mkdir(exist_ok=True)
+        os.replace(tmp, obj)
+        report["new_objects"] += 1
+        report["new_bytes"] += obj.stat().st_size
+    return sha
+
+# =========================
+# SNAPSHOT / VERIFY / PRUNE / RESTORE
+# =========================
+def run_backup(root=None, keep=KEEP):
+    import storage
+
+    root = _root(root)
+    root.mkdir(parents=True, exist_ok=True)
+    stamp = _new_stamp(root)
+    work = root / f".{stamp}.partial"
+    work.mkdir()
+    t0 = time.perf_counter()
+
+    manifest = {"created": stamp}
+    if storage.DATABASE_URL:
+        manifest["database"] = {"skipped": "PostgreSQL backend: back it up with pg_dump / pg_basebackup"}
+    else:
+        manifest["database"] = backup_db(work / "app.db")
+        if manifest["database"]["integrity"] != "ok":
+            raise SystemExit(f"backup failed integrity check, kept at {work}: {manifest['database']['integrity']}")
+    # after the database: uploads are written before the row that names them
+    # and referenced files are never collected, so everything it names is here
+    done = snapshots(root)
+    previous = done[-1][1].get("uploads", {}) if done else {}
+    manifest["uploads"], manifest["upload_stats"] = backup_uploads(root, work / "uploads", previous)
+    manifest["seconds"] = round(time.perf_counter() - t0, 3)
+    (work / "manifest.json").write_text(json.dumps(manifest, indent=1))
+    work.rename(root / stamp)
+
+    report = {"snapshot": stamp, "database": manifest["database"], "uploads": manifest["upload_stats"],
+              "seconds": manifest["seconds"]}
+    if keep:
+        report["pruned"] = prune(root, keep)
+    log.warning("backup: %s", report)
+    return report
+
+def verify(root=None, stamp=None):
+    # re-hash a snapshot against its manifest and integrity-check its database
+    root = _root(root)
+    done = dict(snapshots(root))
+    stamp = stamp or (list(done)[-1] if done else None)
+    if stamp not in done:
+        raise SystemExit(f"no snapshot {stamp!r} in {root}")
+    manifest = done[stamp]
+    report = {"snapshot": stamp, "problems": []}
+    db = root / stamp / "app.db"
+    if "sha256" in manifest["database"]:
+        if _sha256(db) != manifest["database"]["sha256"]:
+            report["problems"].append("app.db: checksum mismatch")
+        conn = sqlite3.connect(f"file:{db}?mode=ro", uri=True)
+        try:
+            integrity = _integrity(conn)
+        finally:
+            conn.close()
+        if integrity != "ok":
+            report["problems"].append(f"app.db: {integrity}")
+    for name, (sha, size, _) in manifest["uploads"].items():
+        path = root / stamp / "uploads" / name
+        if not path.exists():
+            report["problems"].append(f"uploads/{name}: missing")
+        elif _sha256(path) != sha:
+            report["problems"].append(f"uploads/{name}: checksum mismatch")
+    report["uploads_checked"] = len(manifest["uploads"])
+    report["ok"] = not report["problems"]
+    return report
+
+def prune(root=None, keep=KEEP):
+    # drop all but the newest `keep` snapshots, then objects none of them use
+    root = _root(root)
+    done = snapshots(root)
+    dropped = [stamp for stamp, _ in done[:-keep]] if keep > 0 else []
+    for stamp in dropped:
+        shutil.rmtree(root / stamp)
+    live = {sha for _, m in done[len(dropped):] for sha, _, _ in m.get("uploads", {}).values()}
+    objects = 0
+    for obj in (root / "objects").glob("??/*"):
+        if obj.name not in live:
+            obj.unlink()
+            objects += 1
+    return {"snapshots": dropped, "objects": objects}
+
+def restore(to, root=None, stamp=None, at=None):
+    # copy a snapshot into a fresh data dir (point it at the app with CN_DATA_DIR);
+    # at= picks the newest snapshot taken at or before that time (naive = UTC;
+    # an offset like +02:00 is converted, since stamps are UTC)
+    root = _root(root)
+    done = snapshots(root)
+    if at:
+        cutoff = datetime.fromisoformat(at)
+        if cutoff.tzinfo:
+            cutoff = cutoff.astimezone(timezone.utc).replace(tzinfo=None)
+        done = [s for s in done if _stamp_time(s[0]) <= cutoff]
+    elif stamp:
+        done = [s for s in done if s[0] == stamp]
+    if not done:
+        raise SystemExit(f"no matching snapshot in {root}")
+    stamp, manifest = done[-1]
+    to = Path(to)
+    if (to / "app.db").exists() or (to / "uploads").exists():
+        raise SystemExit(f"{to} already holds a data dir; restore into an empty directory")
+    (to / "uploads").mkdir(parents=True)
+    if (root / stamp / "app.db").exists():
+        shutil.copy2(root / stamp / "app.db", to / "app.db")
+    for name in manifest["uploads"]:
+        shutil.copy2(root / stamp / "uploads" / name, to / "uploads" / name)
+    return {"snapshot": stamp, "seq": manifest["database"].get("seq"), "to": str(to), "uploads": len(manifest["uploads"])}
+
+def _schedule(a):
+    # lower CPU priority so request threads win any contention with the copy
+    if NICE and hasattr(os, "nice"):
+        os.nice(NICE)
+    while True:
+        report = run_backup(a.root, a.keep)
+        if not a.every:
+            return report
+        time.sleep(a.every * 3600)
+
+def main():
+    ap = argparse.ArgumentParser(description="Creator Network online backup (database + uploads)")
+    ap.add_argument("--root", default=None, help="backup directory (default CN_BACKUP_DIR or <data dir>/backups)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    r = sub.add_parser("run", help="Take a snapshot without blocking the running app")
+    r.add_argument("--keep", type=int, default=KEEP, help="snapshots to keep (0 = keep all)")
+    r.add_argument("--every", type=float, default=0.0, help="keep running, one snapshot every N hours")
+    r.set_defaults(fn=lambda a: _schedule(a))
+
+    v = sub.add_parser("verify", help="Re-hash a snapshot and integrity-check its database")
+    v.add_argument("--snapshot", default=None, help="default: newest")
+    v.set_defaults(fn=lambda a: verify(a.root, a.snapshot))
+
+    ls = sub.add_parser("list", help="List complete snapshots")
+    ls.set_defaults(fn=lambda a: [{"snapshot": s, "seq": m["database"].get("seq"), "uploads": len(m["uploads"]),
+                                   "db_bytes": m["database"].get("bytes")} for s, m in snapshots(a.root)])
+
+    p = sub.add_parser("prune", help="Keep the newest N snapshots and drop unused upload objects")
+    p.add_argument("--keep", type=int, default=KEEP)
+    p.set_defaults(fn=lambda a: prune(a.root, a.keep))
+
+    x = sub.add_parser("restore", help="Copy a snapshot into an empty data directory")
+    x.add_argument("--to", required=True)
+    x.add_argument("--snapshot", default=None, help="default: newest")
+    x.add_argument("--at", default=None, help="newest snapshot at or before this time, UTC unless it has an offset (e.g. 2026-10-01T12:00, 2026-10-01T14:00+02:00)")
+    x.set_defaults(fn=lambda a: restore(a.to, a.root, a.snapshot, a.at))
+
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    print(json.dumps(args.fn(args), indent=2))
+
+if __name__ == "__main__":
+    main()
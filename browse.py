@@ -0,0 +1,257 @@
+import html
+import threading
+from collections import OrderedDict
+
+import geo
+import perf
+from storage import (
+    BIO_EXCERPT,
+    get_profile_by_id,
+    mask_tags,
+    profile_ids_in_city,
+    profile_ids_in_country,
+    profiles_within_km,
+    result_cache,
+    tag_mask,
+)
+from vocab import AGENCY_SERVICES, CONTENT_TYPES, PAYMENT_MODELS, PERSONALITY_TYPES
+
+# filter name -> (card column, vocabulary, is bitmask)
+FACETS = {
+    "services": ("agency_services_mask", AGENCY_SERVICES, True),
+    "payment_models": ("agency_payment_model", PAYMENT_MODELS, False),
+    "personalities": ("creator_personality", PERSONALITY_TYPES, False),
+    "content_types": ("creator_content_mask", CONTENT_TYPES, True),
+}
+PAGE_SIZE = 20
+CARD_HTML_CACHE_SIZE = 4096
+
+_card_html = OrderedDict()  # (profile id, updated_at) -> html
+_card_lock = threading.Lock()
+
+# =========================
+# BROWSE FILTERS (vectorized over the compact card frame, shared by app.py and loadtest.py)
+# =========================
+def filter_profiles(profiles, target_type, q="", only_verified=False, services=(), payment_models=(), personalities=(), content_types=()):
+    df = profiles
+    df = df[df["account_type"] == target_type] if not df.empty else df
+
+    if only_verified and not df.empty:
+        df = df[df["verified"] == 1]
+
+    if q.strip() and not df.empty:
+        q2 = q.strip().lower()
+        df = df[
+            df["display_name"].str.lower().str.contains(q2, na=False, regex=False) |
+            df["niche"].str.lower().str.contains(q2, na=False, regex=False) |
+            df["location_current"].str.lower().str.contains(q2, na=False, regex=False)
+        ]
+
+    # Agency-side filters (any-of tag match = mask overlap)
+    if not df.empty and services:
+        df = df[(df["agency_services_mask"] & tag_mask(services, AGENCY_SERVICES)) != 0]
+    if not df.empty and payment_models:
+        df = df[df["agency_payment_model"].isin(payment_models)]
+
+    # Creator-side filters
+    if not df.empty and personalities:
+        df = df[df["creator_personality"].isin(personalities)]
+    if not df.empty and content_types:
+        df = df[(df["creator_content_mask"] & tag_mask(content_types, CONTENT_TYPES)) != 0]
+
+    return df
+
+# =========================
+# LOCATION FILTERS (indexed lookups, no text scan)
+# =========================
+def location_matches(loc_filter, my_loc, target_type, radius_km=100):
+    # -> (allowed ids or None for "anywhere", {id: km}, warning or None)
+    if loc_filter == "Same city":
+        if my_loc.city_id:
+            return profile_ids_in_city(my_loc.city_id, target_type), {}, None
+        return None, {}, "Add a recognised city to your profile (e.g. \"London, UK\") to use this filter."
+    if loc_filter == "Same country":
+        if my_loc.country_code:
+            return profile_ids_in_country(my_loc.country_code, target_type), {}, None
+        return None, {}, "Add a recognised city or country to your profile to use this filter."
+    if loc_filter == "Within distance":
+        if my_loc.lat is not None:
+            distances = profiles_within_km(my_loc.lat, my_loc.lon, radius_km, target_type)
+            return set(distances), distances, None
+        return None, {}, "Add a recognised city to your profile (e.g. \"London, UK\") to use this filter."
+    return None, {}, None
+
+def _loc_key(loc_filter, my_loc, target_type, radius_km):
+    # only the parts of the viewer's location the chosen filter reads
+    if loc_filter == "Same city":
+        return (loc_filter, target_type, my_loc.city_id)
+    if loc_filter == "Same country":
+        return (loc_filter, target_type, my_loc.country_code)
+    if loc_filter == "Within distance":
+        return (loc_filter, target_type, my_loc.lat, my_loc.lon, radius_km)
+    return (None,)
+
+def cached_location_matches(version, loc_filter, my_loc, target_type, radius_km=100):
+    return result_cache.get(
+        version, ("location", *_loc_key(loc_filter, my_loc, target_type, radius_km)),
+        lambda: location_matches(loc_filter, my_loc, target_type, radius_km)
+    )
+
+def viewer_location(version, profile_id):
+    def load():
+        import pandas as pd
+
+        mine = get_profile_by_id(profile_id)
+        if mine.empty:
+            return geo.EMPTY_LOCATION
+        m = mine.iloc[0]
+        return geo.Location(
+            m["loc_city_id"],
+            m["loc_country"],
+            float(m["loc_lat"]) if pd.notna(m["loc_lat"]) else None,
+            float(m["loc_lon"]) if pd.notna(m["loc_lon"]) else None
+        )
+    if not profile_id:
+        return geo.EMPTY_LOCATION
+    return result_cache.get(version, ("viewer", int(profile_id)), load)
+
+def _filters_key(filters):
+    return tuple(sorted((k, tuple(sorted(v))) for k, v in filters.items() if v))
+
+# =========================
+# BROWSE PAGES (shared across users)
+# =========================
+def browse_page(profiles, version, target_type, q="", only_verified=False, loc=(None, geo.EMPTY_LOCATION, 100), page=0, page_size=PAGE_SIZE, **filters):
+    # -> (total matches, page frame, location warning). Identical queries from
+    # any session are served from result_cache until the profiles version moves.
+    loc_filter, my_loc, radius_km = loc
+    key = ("page", target_type, q.strip().lower(), bool(only_verified), _filters_key(filters),
+           _loc_key(loc_filter, my_loc, target_type, radius_km), int(page), int(page_size))
+
+    def compute():
+        ids, distances, warning = cached_location_matches(version, loc_filter, my_loc, target_type, radius_km)
+        df = filter_profiles(profiles, target_type, q, only_verified, **filters)
+        if not warning and ids is not None and not df.empty:
+            df = df[df["id"].isin(ids)]
+            if distances:
+                df = df.assign(_distance=df["id"].map(distances)).sort_values("_distance")
+        start = int(page) * page_size
+        # copy: a page must not pin the whole snapshot in the cache
+        return len(df), df.iloc[start:start + page_size].copy(), warning
+
+    return result_cache.get(version, key, compute)
+
+# =========================
+# FACET COUNTS
+# =========================
+def _count_options(df, facet):
+    col, vocab, is_mask = FACETS[facet]
+    if df.empty:
+        return {o: 0 for o in vocab}
+    if is_mask:
+        bits = df[col].to_numpy()
+        return {o: int(((bits >> i) & 1).sum()) for i, o in enumerate(vocab)}
+    counts = df[col].value_counts()
+    return {o: int(counts.get(o, 0)) for o in vocab}
+
+def facet_counts(profiles, version, target_type, q="", only_verified=False, loc=(None, geo.EMPTY_LOCATION, 100), **filters):
+    # Per option: how many results the current query would have with that
+    # option added. Each facet is counted against every *other* active filter
+    # (options within one facet are OR-ed), so counts never lead to dead ends.
+    loc_filter, my_loc, radius_km = loc
+    key = ("facets", target_type, q.strip().lower(), bool(only_verified), tuple(sorted(filters)),
+           _filters_key(filters), _loc_key(loc_filter, my_loc, target_type, radius_km))
+
+    def compute():
+        ids, _, warning = cached_location_matches(version, loc_filter, my_loc, target_type, radius_km)
+        if warning:
+            ids = None
+        with perf.span("browse.facets"):
+            bases = {}
+            out = {}
+            for facet in filters:
+                others = {k: v for k, v in filters.items() if k != facet and v}
+                base_key = tuple(sorted(others))
+                if base_key not in bases:
+                    df = filter_profiles(profiles, target_type, q, only_verified, **others)
+                    if ids is not None and not df.empty:
+                        df = df[df["id"].isin(ids)]
+                    bases[base_key] = df
+                out[facet] = _count_options(bases[base_key], facet)
+        return out
+
+    return result_cache.get(version, key, compute)
+
+# =========================
+# CARD HTML (memoized per profile version)
+# =========================
+# A card's static part depends only on the profile row, so it is rendered
+# once per (id, updated_at) and reused by every rerun and session; an upsert
+# stamps a new updated_at, which is a new key. Viewer-specific bits
+# (distance, buttons) stay outside.
+def _line(label, value):
+    return f'<div style="margin-top:4px;"><b>{label}:</b> {html.escape(str(value))}</div>'
+
+def _render_card(p):
+    is_agency = p["account_type"] == "Agency"
+    badges = []
+    if int(p.get("verified", 0) or 0) == 1:
+        badges.append('<span class="cn-badge cn-badge-verify">Verified</span>')
+    if not is_agency and int(p.get("selfie_uploaded", 0) or 0) == 1:
+        badges.append('<span class="cn-badge">Selfie uploaded</span>')
+    badges.append(f'<span class="cn-badge">{html.escape(str(p["account_type"]))}</span>')
+
+    title = (p.get("agency_name") if is_agency else p.get("display_name")) or p.get("display_name", "")
+    meta = [str(p.get(k)) for k in ("niche", "location_current") if p.get(k)]
+
+    lines = []
+    if not is_agency:
+        ct = mask_tags(p["creator_content_mask"], CONTENT_TYPES)
+        if ct:
+            lines.append(_line("Content", ", ".join(ct[:6])))
+        if p.get("creator_personality"):
+            lines.append(_line("Style", p.get("creator_personality")))
+        if p.get("creator_earnings_band"):
+            lines.append(_line("Earnings (band)", p.get("creator_earnings_band")))
+    else:
+        sv = mask_tags(p["agency_services_mask"], AGENCY_SERVICES)
+        if sv:
+            lines.append(_line("Services", ", ".join(sv[:6])))
+        if p.get("agency_payment_model"):
+            lines.append(_line("Payment", p.get("agency_payment_model")))
+        if p.get("agency_commission_band") and p.get("agency_payment_model") in ("Commission-based", "Hybrid"):
+            lines.append(_line("Commission", p.get("agency_commission_band")))
+        if p.get("agency_fee_band") and p.get("agency_payment_model") in ("Monthly fee", "Yearly fee", "Hybrid"):
+            lines.append(_line("Fee", p.get("agency_fee_band")))
+        if p.get("agency_website"):
+            lines.append(_line("Website", p.get("agency_website")))
+
+    bio = p.get("bio_excerpt") or ""
+    if bio:
+        bio = bio[:BIO_EXCERPT] + ("..." if len(bio) > BIO_EXCERPT else "")
+        lines.append(f'<div style="margin-top:8px;">{html.escape(bio)}</div>')
+
+    return (
+        f'<div class="cn-badges" style="margin-top:0;">{"".join(badges)}</div>'
+        f'<div class="cn-title" style="margin-top:8px;">{html.escape(str(title))}</div>'
+        f'<div class="cn-subtitle">{html.escape(" • ".join(meta))}</div>'
+        + "".join(lines)
+    )
+
+def card_html(p):
+    key = (int(p["id"]), p.get("updated_at") or "")
+    with _card_lock:
+        cached = _card_html.get(key)
+        if cached is not None:
+            _card_html.move_to_end(key)
+    if cached is not None:
+        perf.incr("cn_card_html_total", result="hit")
+        return cached
+
+    perf.incr("cn_card_html_total", result="miss")
+    out = _render_card(p)
+    with _card_lock:
+        _card_html[key] = out
+        while len(_card_html) > CARD_HTML_CACHE_SIZE:
+            _card_html.popitem(last=False)
+    return out
@@ -0,0 +1,253 @@
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+import perf
+
+try:
+    import fcntl
+except ImportError:  # Windows: publishes are serialised per process only
+    fcntl = None
+
+# pandas / pyarrow are imported on first load: a worker that has only served
+# onboarding pages never needs them
+
+# =========================
+# SHARED SNAPSHOT (on-disk, shared by every worker process)
+# =========================
+class SnapshotCache:
+    # A versioned pickle of an expensive read (e.g. the profiles frame).
+    # Writers bump the version file after commit; readers keep the frame in
+    # memory until the version moves, then load the snapshot another process
+    # already built, and only fall back to the loader (SQLite) when missing.
+    keep = 2
+    suffix = "pkl"
+    reload_after_dump = False
+
+    def __init__(self, directory, name):
+        self.directory = Path(directory)
+        self.name = name
+        self.version_path = self.directory / f"{name}.version"
+        self.lock_path = self.directory / f"{name}.lock"
+        self.build_lock_path = self.directory / f"{name}.build.lock"
+        self._lock = threading.Lock()
+        self._build_mutex = threading.Lock()
+        self._version = None
+        self._value = None
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def version(self):
+        try:
+            return int(self.version_path.read_text() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    @contextmanager
+    def _publish_lock(self):
+        # the compare-and-write must hold across processes (writers in every
+        # worker), not just threads: an older version must never overwrite a newer one
+        with self._lock, open(self.lock_path, "a") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    @contextmanager
+    def _build_lock(self):
+        # one rebuild per version across threads and processes; the rest wait
+        # and load the file it wrote. Separate from the publish lock so writers
+        # never wait on a rebuild.
+        with self._build_mutex, open(self.build_lock_path, "a") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def publish_version(self, version, force=False):
+        with self._publish_lock():
+            if not force and version <= self.version() and self.version_path.exists():
+                return
+            if force:
+                # snapshots of a previous version history must never be reused
+                for p in self.directory.glob(f"{self.name}-*.{self.suffix}"):
+                    try:
+                        p.unlink()
+                    except OSError:
+                        pass
+                self._version = None
+                self._value = None
+            _atomic_write(self.version_path, str(version).encode("ascii"))
+
+    def _path(self, version):
+        return self.directory / f"{self.name}-{version}.{self.suffix}"
+
+    def _load(self, path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def _dump(self, path, value):
+        _atomic_write(path, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def get(self, loader):
+        return self.get_versioned(loader)[1]
+
+    def get_versioned(self, loader):
+        # -> (version, value) read together: key anything derived from the
+        # value on this version, not on a later version() call
+        version = self.version()
+        with self._lock:
+            if self._version == version and self._value is not None:
+                return version, self._value
+
+        path = self._path(version)
+        try:
+            value = self._load(path)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError, OSError, ValueError):
+            with self._build_lock():
+                try:
+                    value = self._load(path)  # built while we waited
+                except (FileNotFoundError, EOFError, pickle.UnpicklingError, OSError, ValueError):
+                    value = loader()
+                    self._dump(path, value)
+                    self._prune(version)
+                    # read back what was written so this process shares it like every other one
+                    value = self._load(path) if self.reload_after_dump else value
+
+        with self._lock:
+            self._version = version
+            self._value = value
+        return version, value
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+            self._value = None
+
+    def _prune(self, version):
+        for p in self.directory.glob(f"{self.name}-*.{self.suffix}"):
+            try:
+                v = int(p.stem.rsplit("-", 1)[1])
+            except ValueError:
+                continue
+            if v <= version - self.keep:
+                try:
+                    p.unlink()
+                except OSError:
+                    pass
+
+class ArrowSnapshotCache(SnapshotCache):
+    # Same protocol, but the frame is an uncompressed Arrow IPC file that
+    # readers memory-map: numeric and string columns are views of the page
+    # cache, so N worker processes share one physical copy of the snapshot
+    # instead of each unpickling its own.
+    suffix = "arrow"
+    reload_after_dump = True
+
+    def _load(self, path):
+        import pandas as pd
+        import pyarrow as pa
+
+        source = pa.memory_map(str(path), "r")  # buffers keep the mapping alive
+        table = pa.ipc.open_file(source).read_all()
+        # Arrow strings come back as pyarrow-backed pandas strings (no copy)
+        strings = {pa.string(): pd.StringDtype("pyarrow"), pa.large_string(): pd.StringDtype("pyarrow")}
+        return table.to_pandas(split_blocks=True, types_mapper=strings.get)
+
+    def _dump(self, path, value):
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(value, preserve_index=False)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, path)
+
+# =========================
+# RESULT CACHE (in-process, shared by every session of a worker)
+# =========================
+class ResultCache:
+    # LRU of derived results (Browse pages, facet counts, location lookups)
+    # keyed by a normalized query tuple. Entries belong to one data version:
+    # the first lookup with a newer version drops everything.
+    def __init__(self, name, max_bytes):
+        self.name = name
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._version = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, version, key, compute):
+        with self._lock:
+            if version != self._version:
+                self._clear(version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if entry is not None:
+            perf.incr("cn_result_cache_total", cache=self.name, result="hit")
+            return entry[0]
+
+        perf.incr("cn_result_cache_total", cache=self.name, result="miss")
+        value = compute()
+        size = _sizeof(value)
+        with self._lock:
+            self.misses += 1
+            if version != self._version or size > self.max_bytes:
+                return value
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, s) = self._entries.popitem(last=False)
+                self.bytes -= s
+                self.evictions += 1
+                perf.incr("cn_result_cache_total", cache=self.name, result="evict")
+        return value
+
+    def _clear(self, version):
+        self._entries.clear()
+        self.bytes = 0
+        self._version = version
+
+    def invalidate(self):
+        with self._lock:
+            self._clear(None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "cache": self.name,
+                "version": self._version,
+                "entries": len(self._entries),
+                "kb": round(self.bytes / 1024, 1),
+                "cap_kb": round(self.max_bytes / 1024, 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+                "evictions": self.evictions,
+            }
+
+def _sizeof(value):
+    # deep-ish size estimate; DataFrames report their own (deep) usage
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(deep=True).sum()) + sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(_sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+def _atomic_write(path, data):
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
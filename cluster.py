@@ -0,0 +1,142 @@
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import writer
+
+APP_DIR = Path(__file__).resolve().parent
+STICKY_COOKIE = "cn_worker"
+HEAD_LIMIT = 64 * 1024
+
+# =========================
+# STICKY LOAD BALANCER
+# =========================
+# A Streamlit session lives on one worker (websocket + file uploads), so the
+# first response pins the browser to a worker with a cookie; later
+# connections carrying the cookie go straight to the same worker.
+class Balancer:
+    def __init__(self, backends):
+        self.backends = backends            # [(host, port), ...]
+        self.active = [0] * len(backends)
+
+    def _pick(self, head):
+        for line in head.split(b"\r\n")[1:]:
+            if not line.lower().startswith(b"cookie:"):
+                continue
+            for part in line.split(b":", 1)[1].split(b";"):
+                k, _, v = part.strip().partition(b"=")
+                if k == STICKY_COOKIE.encode() and v.isdigit() and int(v) < len(self.backends):
+                    return int(v), True
+        return min(range(len(self.backends)), key=lambda i: self.active[i]), False
+
+    async def handle(self, client_r, client_w):
+        try:
+            head = await client_r.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            client_w.close()
+            return
+
+        idx, pinned = self._pick(head)
+        order = [idx] + [i for i in range(len(self.backends)) if i != idx]
+        for i in order:
+            try:
+                up_r, up_w = await asyncio.open_connection(*self.backends[i], limit=HEAD_LIMIT)
+            except OSError:
+                pinned = False  # worker gone: re-pin to a healthy one
+                continue
+            idx = i
+            break
+        else:
+            client_w.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            await client_w.drain()
+            client_w.close()
+            return
+
+        self.active[idx] += 1
+        try:
+            up_w.write(head)
+            await up_w.drain()
+            if not pinned:
+                resp = await up_r.readuntil(b"\r\n\r\n")
+                cookie = f"Set-Cookie: {STICKY_COOKIE}={idx}; Path=/; HttpOnly; SameSite=Lax\r\n".encode()
+                client_w.write(resp[:-2] + cookie + b"\r\n")
+            await asyncio.gather(_pipe(client_r, up_w), _pipe(up_r, client_w))
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            self.active[idx] -= 1
+            for w in (up_w, client_w):
+                w.close()
+
+async def _pipe(reader, w):
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            w.write(data)
+            await w.drain()
+    except ConnectionError:
+        pass
+    finally:
+        try:
+            w.write_eof()
+        except (OSError, RuntimeError):
+            pass
+
+async def run_balancer(host, port, backends):
+    lb = Balancer(backends)
+    server = await asyncio.start_server(lb.handle, host, port, limit=HEAD_LIMIT)
+    async with server:
+        await server.serve_forever()
+
+# =========================
+# LAUNCHER
+# =========================
+def start_processes(workers, base_port, writer_address):
+    # a fresh key per run unless the operator pinned one
+    authkey = os.environ.get(writer.AUTHKEY_ENV) or writer.new_authkey()
+    env = {**os.environ, "CN_WRITER_ADDRESS": writer_address, writer.AUTHKEY_ENV: authkey}
+    procs = [subprocess.Popen([sys.executable, str(APP_DIR / "writer.py"), "--address", writer_address], env=env)]
+    time.sleep(1.0)  # coordinator runs init_db() before workers import the app
+    for i in range(workers):
+        procs.append(subprocess.Popen([
+            sys.executable, "-m", "streamlit", "run", str(APP_DIR / "app.py"),
+            "--server.port", str(base_port + i),
+            "--server.address", "127.0.0.1",
+            "--server.headless", "true",
+        ], env=env))
+    return procs
+
+def main():
+    ap = argparse.ArgumentParser(description="Run Creator Network as N Streamlit workers + one write coordinator")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8501, help="public port (load balancer)")
+    ap.add_argument("--worker-base-port", type=int, default=8601)
+    ap.add_argument("--writer-address", default=writer.DEFAULT_ADDRESS)
+    args = ap.parse_args()
+
+    procs = start_processes(args.workers, args.worker_base_port, args.writer_address)
+    backends = [("127.0.0.1", args.worker_base_port + i) for i in range(args.workers)]
+    print(f"Creator Network: {args.workers} workers behind http://{args.host}:{args.port}", flush=True)
+    try:
+        asyncio.run(run_balancer(args.host, args.port, backends))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in procs:
+            p.send_signal(signal.SIGTERM)
+        for p in procs:
+            try:
+                p.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+log = logging.getLogger("creator_network.export")
+
+# storage is imported lazily: CN_DATA_DIR must be set before it loads
+
+TABLES = {"profile": "profiles", "message": "messages"}
+# written by full exports only; appends write changed messages under
+# "messages" wherever they live now
+FULL_ONLY_TABLES = ["messages_archive"]
+# where append looks up a changed id: a message can be archived between two
+# appends (archiving logs no change), so its row may already have moved. The
+# live table is read first: a row moving mid-append is then seen in one of them.
+APPEND_SOURCES = {"profiles": ["profiles"], "messages": ["messages", "messages_archive"]}
+BATCH_ROWS = 20000        # rows per read and per row group / record batch
+IDS_PER_QUERY = 500       # changed ids fetched per IN (...) query on append
+CONSUMER = "export"
+INT_COLUMNS = {"id", "verified", "selfie_uploaded", "creator_autofill", "sender_id", "receiver_id"}
+FLOAT_COLUMNS = {"loc_lat", "loc_lon"}
+FORMATS = {"parquet": "parquet", "arrow": "arrow"}
+
+# =========================
+# OFFLINE SNAPSHOT EXPORT (profiles + messages -> Parquet / Arrow IPC)
+# =========================
+# Layout: <out>/<table>/part-NNNNNN.<ext> plus manifest.json holding the
+# change-log position the parts are complete up to. A full export writes
+# part 0 in streamed row groups; each append writes one more part with the
+# rows changed since the manifest position (latest version of each row).
+# Readers take the last occurrence of an id (load()).
+def _schema(columns):
+    def typ(c):
+        if c in INT_COLUMNS:
+            return pa.int64()
+        if c in FLOAT_COLUMNS:
+            return pa.float64()
+        return pa.string()
+    return pa.schema([(c, typ(c)) for c in columns])
+
+class _PartWriter:
+    def __init__(self, path, schema, fmt):
+        self.schema = schema
+        self.rows = 0
+        if fmt == "parquet":
+            self._w = pq.ParquetWriter(str(path), schema, compression="zstd")
+            self._write = lambda t: self._w.write_table(t, row_group_size=BATCH_ROWS)
+        else:
+            # uncompressed IPC file: loadable with a memory map, zero copy
+            self._sink = pa.OSFile(str(path), "wb")
+            self._w = pa.ipc.new_file(self._sink, schema)
+            self._write = self._w.write_table
+
+    def write(self, df):
+        if df.empty:
+            return
+        table = pa.Table.from_pandas(df[self.schema.names], schema=self.schema, preserve_index=False)
+        self._write(table)
+        self.rows += len(df)
+
+    def close(self):
+        self._w.close()
+        if hasattr(self, "_sink"):
+            self._sink.close()
+
+def _manifest_path(out):
+    return Path(out) / "manifest.json"
+
+def read_manifest(out):
+    return json.loads(_manifest_path(out).read_text())
+
+def _write_manifest(out, manifest):
+    tmp = _manifest_path(out).with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2))
+    tmp.replace(_manifest_path(out))
+
+def _new_part(out, manifest, table):
+    parts = manifest["parts"].setdefault(table, [])
+    name = f"part-{len(parts):06d}.{FORMATS[manifest['format']]}"
+    (Path(out) / table).mkdir(parents=True, exist_ok=True)
+    parts.append(name)
+    return Path(out) / table / name
+
+def export_full(out, fmt="parquet", batch=BATCH_ROWS):
+    import storage
+
+    st = storage.store()
+    out = Path(out)
+    out.mkdir(parents=True, exist_ok=True)
+    # everything up to this position is in the parts; later changes are
+    # picked up by the next append (rows may appear twice, load() keeps the last)
+    seq = storage.latest_change_seq()
+    manifest = {"format": fmt, "seq": seq, "parts": {}, "rows": {}}
+    report = {"format": fmt, "seq": seq}
+    t0 = time.perf_counter()
+    for table in [*TABLES.values(), *FULL_ONLY_TABLES]:
+        schema = _schema(st.export_batch(table, 0, 0).columns)
+        w = _PartWriter(_new_part(out, manifest, table), schema, fmt)
+        after = 0
+        while True:
+            df = st.export_batch(table, after, batch)
+            if df.empty:
+                break
+            w.write(df)
+            after = int(df["id"].iloc[-1])
+        w.close()
+        manifest["rows"][table] = w.rows
+        report[table] = w.rows
+    _write_manifest(out, manifest)
+    storage.ack_changes(CONSUMER, seq)  # keeps compaction from dropping what append still needs
+    report["seconds"] = round(time.perf_counter() - t0, 3)
+    log.warning("export full: %s", report)
+    return report
+
+def export_append(out):
+    import storage
+
+    st = storage.store()
+    manifest = read_manifest(out)
+    seq = manifest["seq"]
+    changed = {table: set() for table in TABLES.values()}
+    while True:
+        rows = storage.changes_since(seq, storage.CHANGES_BATCH, list(TABLES))
+        if not rows:
+            break
+        for r in rows:
+            changed[TABLES[r["entity"]]].add(r["entity_id"])
+        seq = rows[-1]["seq"]
+
+    report = {"from_seq": manifest["seq"], "to_seq": seq}
+    for table, ids in changed.items():
+        report[table] = 0
+        if not ids:
+            continue
+        ids = sorted(ids)
+        schema = _schema(st.export_batch(table, 0, 0).columns)
+        w = _PartWriter(_new_part(out, manifest, table), schema, manifest["format"])
+        for i in range(0, len(ids), IDS_PER_QUERY):
+            for source in APPEND_SOURCES[table]:
+                w.write(st.rows_by_ids(source, ids[i:i + IDS_PER_QUERY]))
+        w.close()
+        manifest["rows"][table] = manifest["rows"].get(table, 0) + w.rows
+        report[table] = w.rows
+    manifest["seq"] = seq
+    _write_manifest(out, manifest)
+    storage.ack_changes(CONSUMER, seq)
+    log.warning("export append: %s", report)
+    return report
+
+# =========================
+# LOADER
+# =========================
+def load(out, table, columns=None):
+    # -> pyarrow.Table with the latest version of each row. Arrow parts are
+    # memory-mapped (zero copy); Parquet parts are decoded.
+    manifest = read_manifest(out)
+    tables = []
+    for name in manifest["parts"].get(table, []):
+        path = str(Path(out) / table / name)
+        if manifest["format"] == "arrow":
+            t = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+            tables.append(t.select(columns) if columns else t)
+        else:
+            tables.append(pq.read_table(path, columns=columns, memory_map=True))
+    if not tables:
+        return None
+    t = pa.concat_tables(tables)
+    if len(tables) > 1 and "id" in t.column_names:
+        # appended parts re-export changed rows: keep the last occurrence per id
+        rownum = pa.array(range(len(t)), pa.int64())
+        last = t.append_column("_row", rownum).group_by("id").aggregate([("_row", "max")])
+        t = t.take(last["_row_max"].to_numpy())
+    return t
+
+def main():
+    ap = argparse.ArgumentParser(description="Creator Network columnar export (Parquet / Arrow IPC)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    f = sub.add_parser("full", help="Write profiles and messages to a fresh export directory")
+    f.add_argument("--out", required=True)
+    f.add_argument("--format", choices=list(FORMATS), default="parquet")
+    f.add_argument("--batch", type=int, default=BATCH_ROWS, help="rows per read / row group")
+    f.set_defaults(fn=lambda a: export_full(a.out, a.format, a.batch))
+
+    p = sub.add_parser("append", help="Append rows changed since the last export (change-log cursor)")
+    p.add_argument("--out", required=True)
+    p.set_defaults(fn=lambda a: export_append(a.out))
+
+    i = sub.add_parser("info", help="Row counts as a reader sees them (latest version per id)")
+    i.add_argument("--out", required=True)
+    i.set_defaults(fn=lambda a: {
+        **read_manifest(a.out),
+        "live_rows": {t: (lambda x: 0 if x is None else x.num_rows)(load(a.out, t, ["id"])) for t in [*TABLES.values(), *FULL_ONLY_TABLES]},
+    })
+
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    print(json.dumps(args.fn(args), indent=2))
+
+if __name__ == "__main__":
+    main()
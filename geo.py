@@ -0,0 +1,115 @@
+import csv
+import math
+import re
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+from pathlib import Path
+
+GAZETTEER_DIR = Path(__file__).resolve().parent / "gazetteer"
+EARTH_RADIUS_KM = 6371.0088
+
+Location = namedtuple("Location", ["city_id", "country_code", "lat", "lon"])
+EMPTY_LOCATION = Location(None, None, None, None)
+
+# =========================
+# GAZETTEER (bundled, offline)
+# =========================
+def _fold(text):
+    # lowercase, strip accents, collapse punctuation/whitespace
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[^a-z0-9.]+", " ", text.lower())
+    return text.replace(".", "").strip()
+
+@lru_cache(maxsize=1)
+def gazetteer():
+    countries = {}
+    country_names = {}
+    with open(GAZETTEER_DIR / "countries.csv", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            code = row["code"]
+            country_names[code] = row["name"]
+            for alias in [row["name"], code] + (row["aliases"] or "").split("|"):
+                if alias.strip():
+                    countries[_fold(alias)] = code
+
+    cities = {}
+    city_rows = {}
+    with open(GAZETTEER_DIR / "cities.csv", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            loc = Location(row["city_id"], row["country_code"], float(row["lat"]), float(row["lon"]))
+            city_rows[loc.city_id] = (row["name"], int(row["population"] or 0), loc)
+            for alias in [row["name"]] + (row["aliases"] or "").split("|"):
+                if alias.strip():
+                    cities.setdefault(_fold(alias), []).append(loc.city_id)
+
+    # Ambiguous names resolve to the most populous city unless a country is given
+    for key, ids in cities.items():
+        ids.sort(key=lambda cid: -city_rows[cid][1])
+
+    return {"countries": countries, "country_names": country_names, "cities": cities, "city_rows": city_rows}
+
+def city_name(city_id):
+    row = gazetteer()["city_rows"].get(city_id)
+    return row[0] if row else ""
+
+def country_name(code):
+    return gazetteer()["country_names"].get(code, "")
+
+@lru_cache(maxsize=4096)
+def normalize_location(text):
+    parts = [_fold(p) for p in str(text or "").split(",")]
+    parts = [p for p in parts if p]
+    if not parts:
+        return EMPTY_LOCATION
+
+    g = gazetteer()
+    country = None
+    for p in reversed(parts):
+        if p in g["countries"]:
+            country = g["countries"][p]
+            break
+
+    for p in parts:
+        candidates = g["cities"].get(p)
+        if not candidates:
+            continue
+        if country:
+            candidates = [cid for cid in candidates if g["city_rows"][cid][2].country_code == country] or candidates
+        return g["city_rows"][candidates[0]][2]
+
+    if country:
+        return Location(None, country, None, None)
+    return EMPTY_LOCATION
+
+# =========================
+# DISTANCE / BOUNDING BOXES
+# =========================
+def haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def bounding_boxes(lat, lon, km):
+    # (min_lat, max_lat, min_lon, max_lon) boxes; split when crossing the antimeridian
+    dlat = math.degrees(km / EARTH_RADIUS_KM)
+    min_lat, max_lat = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return [(min_lat, max_lat, -180.0, 180.0)]
+
+    # widest longitude reached on the circle (at a higher latitude than the
+    # centre, so it is wider than km / (R cos lat)); >= 1 means it spans every meridian
+    ratio = math.sin(km / EARTH_RADIUS_KM) / math.cos(math.radians(lat))
+    if ratio >= 1.0:
+        return [(min_lat, max_lat, -180.0, 180.0)]
+    dlon = math.degrees(math.asin(ratio))
+
+    min_lon, max_lon = lon - dlon, lon + dlon
+    if min_lon < -180.0:
+        return [(min_lat, max_lat, min_lon + 360.0, 180.0), (min_lat, max_lat, -180.0, max_lon)]
+    if max_lon > 180.0:
+        return [(min_lat, max_lat, min_lon, 180.0), (min_lat, max_lat, -180.0, max_lon - 360.0)]
+    return [(min_lat, max_lat, min_lon, max_lon)]
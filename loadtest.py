@@ -0,0 +1,1131 @@
+import argparse
+import multiprocessing as mp
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# storage/browse are imported lazily: CN_DATA_DIR must be set before they load
+
+APP_DIR = Path(__file__).resolve().parent
+
+SAMPLE_CITIES = ["London, UK", "Manchester, UK", "Paris, France", "Berlin", "Madrid, Spain", "New York, USA",
+                 "Los Angeles", "Miami", "Toronto", "Sydney", "Dubai", "Lisbon", "Somewhere rural"]
+SAMPLE_NICHES = ["fitness", "beauty", "lifestyle", "gaming", "fashion", "travel", "comedy", "education"]
+SAMPLE_CONTENT = ["Lifestyle", "Fitness", "Beauty", "Fashion", "Education", "Cosplay", "Gaming", "ASMR", "Travel"]
+SAMPLE_SERVICES = ["Account strategy", "Content planning", "Chatting/DM management", "Promotion/marketing", "Brand deals"]
+SAMPLE_PERSONALITIES = ["Direct (short messages, clear asks)", "Friendly (warm tone, supportive)", "Professional (formal, structured)"]
+SAMPLE_PAYMENT = ["Commission-based", "Monthly fee", "Yearly fee", "Hybrid", "Other"]
+PAGE = 20
+
+# =========================
+# SYNTHETIC DATA
+# =========================
+def fake_profile(rnd, i, account_type):
+    created = (datetime(2025, 1, 1) + timedelta(minutes=i)).isoformat(timespec="seconds")
+    base = {
+        "account_type": account_type,
+        "display_name": f"{account_type.lower()}_{i}",
+        "created": created,
+        "niche": rnd.choice(SAMPLE_NICHES),
+        "location_current": rnd.choice(SAMPLE_CITIES),
+        "location_hometown": rnd.choice(SAMPLE_CITIES),
+        "bio": " ".join(rnd.choice(SAMPLE_NICHES) for _ in range(rnd.randint(10, 80))),
+        "verified": int(rnd.random() < 0.3),
+        "selfie_uploaded": int(rnd.random() < 0.6),
+    }
+    if account_type == "Creator":
+        base.update({
+            "creator_personality": rnd.choice(SAMPLE_PERSONALITIES),
+            "creator_content_types": ",".join(rnd.sample(SAMPLE_CONTENT, rnd.randint(1, 3))),
+            "creator_earnings_band": "Prefer not to say",
+            "creator_photos": ",".join(f"creator_{i}_{k}_{rnd.getrandbits(32):08x}.jpg" for k in range(rnd.randint(0, 6))),
+        })
+    else:
+        base.update({
+            "agency_name": f"Agency {i}",
+            "agency_website": f"https://agency{i}.example",
+            "agency_services": ",".join(rnd.sample(SAMPLE_SERVICES, rnd.randint(1, 4))),
+            "agency_payment_model": rnd.choice(SAMPLE_PAYMENT),
+            "agency_success_story": " ".join(rnd.choice(SAMPLE_NICHES) for _ in range(rnd.randint(40, 250))),
+        })
+    return base
+
+def seed(n, rnd):
+    import storage
+
+    storage.init_db()
+    st = storage.store()
+    with st.connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM profiles")
+        have = cur.fetchone()[0]
+        for i in range(have, n):
+            p = fake_profile(rnd, i, "Creator" if i % 4 else "Agency")
+            p.update(storage._location_columns(p["location_current"], p["location_hometown"]))
+            p["updated_at"] = p["created"]
+            cols = list(p)
+            pid = st.insert_profile_row(cur, cols, [p[k] for k in cols])
+            st.index_profile(cur, pid, p)
+            st.log_change(cur, "profile", pid, "insert", cols)
+            st.flag_pii(cur, "profile", pid, p, fresh=True)
+            st.rollup_profile(cur, None, p)
+        version = st.bump_version(cur, "profiles_version")
+        conn.commit()
+    storage.profiles_snapshot.publish_version(version)
+
+def random_browse(rnd):
+    if rnd.random() < 0.5:
+        return "Creator", {
+            "q": rnd.choice(["", "", "fit", "london", "beauty"]),
+            "only_verified": rnd.random() < 0.3,
+            "content_types": rnd.sample(SAMPLE_CONTENT, rnd.randint(0, 2)),
+            "personalities": rnd.sample(SAMPLE_PERSONALITIES, rnd.randint(0, 1)),
+        }
+    return "Agency", {
+        "q": rnd.choice(["", "", "agency", "paris"]),
+        "only_verified": rnd.random() < 0.3,
+        "services": rnd.sample(SAMPLE_SERVICES, rnd.randint(0, 2)),
+        "payment_models": rnd.sample(SAMPLE_PAYMENT, rnd.randint(0, 1)),
+    }
+
+# =========================
+# WORKER-SCALING BENCHMARK (multi-process mode)
+# =========================
+def _browse_worker(seconds, worker_seed, out):
+    import browse
+    import storage
+
+    rnd = random.Random(worker_seed)
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        target, f = random_browse(rnd)
+        df = browse.filter_profiles(storage.read_profile_cards(), target, f.pop("q"), f.pop("only_verified"), **f)
+        cards = [f"{p.display_name} {p.niche} {p.location_current} {p.bio_excerpt or ''}" for p in df.head(PAGE).itertuples()]
+        latencies.append((time.perf_counter() - t0) * 1000)
+        assert len(cards) <= PAGE
+    out.put(latencies)
+
+def _write_churn(seconds, interval, n, out):
+    import storage
+
+    rnd = random.Random(7)
+    writes = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        i = rnd.randrange(n)
+        storage.upsert_profile(fake_profile(rnd, i, "Creator" if i % 4 else "Agency"))
+        writes += 1
+        time.sleep(interval)
+    out.put(writes)
+
+def run_workers(args):
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="cn-loadtest-")
+    os.environ["CN_DATA_DIR"] = data_dir
+    os.environ["CN_WRITER_ADDRESS"] = args.writer_address
+    os.environ.setdefault("CN_WRITER_AUTHKEY", os.urandom(32).hex())
+    seed(args.profiles, random.Random(1))
+
+    coordinator = subprocess.Popen([sys.executable, str(APP_DIR / "writer.py"), "--address", args.writer_address], env=dict(os.environ))
+    time.sleep(1.0)
+    ctx = mp.get_context("spawn")
+    rows = []
+    try:
+        for n in [int(x) for x in args.workers.split(",")]:
+            out = ctx.Queue()
+            churn_out = ctx.Queue()
+            procs = [ctx.Process(target=_browse_worker, args=(args.seconds, 100 + i, out)) for i in range(n)]
+            if args.write_interval > 0:
+                procs.append(ctx.Process(target=_write_churn, args=(args.seconds, args.write_interval, args.profiles, churn_out)))
+            for p in procs:
+                p.start()
+            latencies = []
+            for _ in range(n):
+                latencies += out.get()
+            writes = churn_out.get() if args.write_interval > 0 else 0
+            for p in procs:
+                p.join()
+            latencies.sort()
+            rows.append({
+                "workers": n,
+                "ops_s": len(latencies) / args.seconds,
+                "p50": statistics.median(latencies) if latencies else 0.0,
+                "p95": latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+                "writes": writes,
+            })
+    finally:
+        coordinator.terminate()
+        coordinator.wait(timeout=10)
+
+    base = rows[0]["ops_s"] or 1.0
+    print(f"profiles={args.profiles} seconds={args.seconds} cpus={os.cpu_count()} data={data_dir}")
+    print(f"{'workers':>7} {'browse/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'writes':>7} {'speedup':>8}")
+    for r in rows:
+        print(f"{r['workers']:>7} {r['ops_s']:>10.1f} {r['p50']:>8.2f} {r['p95']:>8.2f} {r['writes']:>7} {r['ops_s'] / base:>7.2f}x")
+    return rows
+
+# =========================
+# CARD PROJECTION (bytes / memory per Browse read)
+# =========================
+def run_cards(args):
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="cn-loadtest-")
+    os.environ["CN_DATA_DIR"] = data_dir
+    seed(args.profiles, random.Random(1))
+    import pandas as pd
+
+    import storage
+
+    st = storage.store()
+    rows = []
+    loaders = (
+        ("select *", st.read_profiles),
+        ("cards", st.read_profile_cards),
+        ("compact", lambda: storage.compact_cards(st.read_profile_cards())),
+    )
+    for label, loader in loaders:
+        times = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            df = loader()
+            times.append((time.perf_counter() - t0) * 1000)
+        text = sum(int(df[c].dropna().astype(str).str.len().sum()) for c in df.columns if df[c].dtype == object or pd.api.types.is_string_dtype(df[c]))
+        rows.append((label, len(df.columns), text, int(df.memory_usage(deep=True).sum()), statistics.median(times)))
+
+    print(f"profiles={args.profiles} repeat={args.repeat} data={data_dir}")
+    print(f"{'query':>9} {'cols':>5} {'text KB':>9} {'frame KB':>9} {'p50 ms':>8}")
+    for label, cols, text, mem, ms in rows:
+        print(f"{label:>9} {cols:>5} {text / 1024:>9.0f} {mem / 1024:>9.0f} {ms:>8.1f}")
+    for label, _, _, mem, _ in rows[1:]:
+        print(f"frame memory vs select *: {label} {rows[0][3] / max(mem, 1):.1f}x smaller")
+    return rows
+
+# =========================
+# SHARED RESULT CACHE (popular identical Browse queries)
+# =========================
+def run_queries(args):
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="cn-loadtest-")
+    os.environ["CN_DATA_DIR"] = data_dir
+    seed(args.profiles, random.Random(1))
+    import browse
+    import storage
+
+    # a small set of popular queries dominates traffic (zipf-like weights)
+    qrnd = random.Random(5)
+    queries = [random_browse(qrnd) for _ in range(args.distinct)]
+    weights = [1 / (i + 1) for i in range(len(queries))]
+    rows = []
+    for label, cap in (("no cache", 0), ("cache", int(storage.RESULT_CACHE_MB * 1024 * 1024))):
+        storage.result_cache.max_bytes = cap
+        storage.result_cache.invalidate()
+        storage.result_cache.hits = storage.result_cache.misses = 0
+        rnd = random.Random(11)
+        latencies = []
+        for _ in range(args.requests):
+            target, f = rnd.choices(queries, weights)[0]
+            f = dict(f)
+            t0 = time.perf_counter()
+            version, cards = storage.read_profile_cards_versioned()
+            browse.browse_page(cards, version, target, f.pop("q"), f.pop("only_verified"), **f)
+            latencies.append((time.perf_counter() - t0) * 1000)
+        latencies.sort()
+        st = storage.result_cache.stats()
+        rows.append((label, statistics.median(latencies), latencies[int(0.95 * (len(latencies) - 1))], st["hit_ratio"], st["kb"]))
+
+    print(f"profiles={args.profiles} requests={args.requests} distinct={args.distinct} data={data_dir}")
+    print(f"{'mode':>9} {'p50 ms':>8} {'p95 ms':>8} {'hit ratio':>10} {'cache KB':>9}")
+    for label, p50, p95, hit, kb in rows:
+        print(f"{label:>9} {p50:>8.3f} {p95:>8.3f} {hit:>10.2f} {kb:>9.1f}")
+    return rows
+
+# =========================
+# SAVED SEARCHES (incremental matching vs. periodic re-scans)
+# =========================
+def run_searches(args):
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="cn-loadtest-")
+    os.environ["CN_DATA_DIR"] = data_dir
+    seed(args.profiles, random.Random(1))
+    import browse
+    import searches
+    import storage
+
+    rnd = random.Random(7)
+    specs = [random_browse(rnd) for _ in range(args.searches)]
+    for i, (target, f) in enumerate(specs):
+        f = dict(f)
+        searches.create_search(i + 1, f"s{i}", target, f.pop("q"), f.pop("only_verified"), **f)
+
+    # periodic polling: every saved search re-runs its Browse filter over all profiles
+    cards = storage.read_profile_cards()
+    t0 = time.perf_counter()
+    for target, f in specs:
+        f = dict(f)
+        browse.filter_profiles(cards, target, f.pop("q"), f.pop("only_verified"), **f)
+    rescan_ms = (time.perf_counter() - t0) * 1000
+
+    # continuous query: only the changed profiles are matched, via the key index
+    wrnd = random.Random(13)
+    for i in range(args.changes):
+        storage.upsert_profile(fake_profile(wrnd, args.profiles + i, "Creator" if i % 4 else "Agency"))
+    t0 = time.perf_counter()
+    storage.read_profile_cards()  # snapshot refresh is paid by Browse anyway
+    load_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    searches.process_pending(max_batches=None)
+    match_ms = (time.perf_counter() - t0) * 1000
+    notified = storage.store().fetch_all("SELECT COUNT(*) FROM notifications")[0][0]
+
+    print(f"profiles={args.profiles} searches={args.searches} changes={args.changes} data={data_dir}")
+    print(f"full re-scan of all searches:      {rescan_ms:>9.1f} ms")
+    print(f"incremental match of {args.changes:>5} changes: {match_ms:>9.1f} ms  (+{load_ms:.1f} ms snapshot reload)")
+    print(f"notifications: {notified}")
+    return rescan_ms, match_ms, notified
+
+# =========================
+# CONTACT-DETAIL SCANNER THROUGHPUT
+# =========================
+PII_SAMPLES = ["call me on +44 7700 900123", "jane.doe@example.com", "insta: jane_fit", "@janefit",
+               "https://linktr.ee/jane", "www.janefit.co", "whatsapp: 07700900123"]
+
+def fake_message(rnd, pii_rate):
+    words = [rnd.choice(SAMPLE_NICHES + ["we", "you", "the", "a", "brand", "deal", "growth", "next", "week"])
+             for _ in range(rnd.randint(8, 60))]
+    text = " ".join(words).capitalize() + rnd.choice([".", "!", "?", " - 2x growth in 30 days."])
+    if rnd.random() < pii_rate:
+        text += " " + rnd.choice(PII_SAMPLES)
+    return text
+
+def run_pii(args):
+    import pii
+
+    rnd = random.Random(3)
+    texts = [fake_message(rnd, args.pii_rate) for _ in range(args.messages)]
+    size = sum(len(t.encode("utf-8")) for t in texts)
+
+    best = None
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        flagged = sum(1 for t in texts if pii.findings(t))
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    mbps = size / 1e6 / best
+    per_us = best / len(texts) * 1e6
+
+    print(f"messages={len(texts)} bytes={size} pii_rate={args.pii_rate}")
+    print(f"inline scan: {per_us:.2f} us/message, {mbps:.1f} MB/s, flagged {flagged}")
+
+    if args.profiles:
+        os.environ["CN_DATA_DIR"] = args.data_dir or tempfile.mkdtemp(prefix="cn-loadtest-")
+        seed(args.profiles, random.Random(1))
+        import maintenance
+        report = maintenance.scan_pii()
+        print(f"back-scan: {report['rows']} rows, {report['bytes'] / 1e6:.1f} MB, "
+              f"{report['scan_mb_per_s']} MB/s scanning, {report['seconds']} s total")
+
+    if args.min_mbps and mbps < args.min_mbps:
+        print(f"FAIL: {mbps:.1f} MB/s below --min-mbps {args.min_mbps}")
+        sys.exit(1)
+    return mbps
+
+# =========================
+# RATE LIMITING (abusive senders vs. everyone else's write latency)
+# =========================
+def run_throttle(args):
+    import threading
+
+    os.environ["CN_DATA_DIR"] = args.data_dir or tempfile.mkdtemp(prefix="cn-loadtest-")
+    seed(200, random.Random(1))
+    import ratelimit
+    import storage
+
+    rows = []
+    for label, limited in (("unlimited", False), ("token bucket", True)):
+        limiter = ratelimit.TokenBucketLimiter("loadtest", ratelimit.MESSAGE_RATE_PER_MIN, ratelimit.MESSAGE_BURST)
+        stop = threading.Event()
+        spam = [0, 0]  # written, throttled
+
+        def abuser(sender):
+            while not stop.is_set():
+                if limited and limiter.acquire(sender):
+                    spam[1] += 1
+                    time.sleep(0.001)  # the UI would show a warning and return
+                    continue
+                storage.insert_message(sender, 1, "spam spam spam")
+                spam[0] += 1
+
+        threads = [threading.Thread(target=abuser, args=(i + 2,), daemon=True) for i in range(args.abusers)]
+        for t in threads:
+            t.start()
+        latencies = []
+        deadline = time.perf_counter() + args.seconds
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            storage.insert_message(1, 2, "hello, are you taking new creators?")
+            latencies.append((time.perf_counter() - t0) * 1000)
+            time.sleep(0.05)
+        stop.set()
+        for t in threads:
+            t.join()
+        latencies.sort()
+        rows.append((label, spam[0], spam[1], statistics.median(latencies), latencies[int(0.95 * (len(latencies) - 1))]))
+
+    # limiter cost and memory bound with many distinct keys
+    limiter = ratelimit.TokenBucketLimiter("keys", 6, 10, max_keys=args.max_keys)
+    t0 = time.perf_counter()
+    for i in range(args.keys):
+        limiter.acquire(i)
+    per_op_us = (time.perf_counter() - t0) / args.keys * 1e6
+
+    print(f"abusers={args.abusers} seconds={args.seconds}")
+    print(f"{'mode':>13} {'spam written':>13} {'throttled':>10} {'honest p50 ms':>14} {'honest p95 ms':>14}")
+    for label, written, throttled, p50, p95 in rows:
+        print(f"{label:>13} {written:>13} {throttled:>10} {p50:>14.2f} {p95:>14.2f}")
+    print(f"acquire(): {per_op_us:.2f} us/op over {args.keys} keys; {limiter.stats()['keys']} buckets kept (max {args.max_keys})")
+    return rows
+
+# =========================
+# ANALYTICS (rollup reads vs. GROUP BY over raw rows)
+# =========================
+RAW_ANALYTICS = [
+    "SELECT substr(created, 1, 10) AS day, account_type, COUNT(*) FROM profiles GROUP BY 1, 2",
+    "SELECT substr(created, 1, 10) AS day, COUNT(*) FROM messages GROUP BY 1",
+    "SELECT creator_earnings_band, COUNT(*) FROM profiles WHERE account_type = 'Creator' GROUP BY 1",
+    "SELECT agency_payment_model, COUNT(*) FROM profiles WHERE account_type = 'Agency' GROUP BY 1",
+    "SELECT COUNT(*) FROM profiles WHERE account_type = 'Creator' AND selfie_uploaded = 1 AND verified = 0",
+]
+
+def run_analytics(args):
+    os.environ["CN_DATA_DIR"] = args.data_dir or tempfile.mkdtemp(prefix="cn-loadtest-")
+    seed(args.profiles, random.Random(1))
+    import storage
+
+    st = storage.store()
+    rnd = random.Random(9)
+    with st.connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM messages")
+        for i in range(cur.fetchone()[0], args.messages):
+            a, b = rnd.randint(1, args.profiles), rnd.randint(1, args.profiles)
+            created = (datetime(2025, 1, 1) + timedelta(minutes=i * 3)).isoformat(timespec="seconds")
+            st.insert_row(cur, "messages", ["sender_id", "receiver_id", "body", "created"], [a, b, "hi", created])
+            st.rollup_message(cur, a, b, created)
+        conn.commit()
+
+    def timed(fn):
+        out = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            fn()
+            out.append((time.perf_counter() - t0) * 1000)
+        return statistics.median(out)
+
+    raw_ms = timed(lambda: [st.fetch_all(q) for q in RAW_ANALYTICS])
+    rollup_ms = timed(lambda: storage.read_rollups(days=3650))
+    print(f"profiles={args.profiles} messages={args.messages} data={os.environ['CN_DATA_DIR']}")
+    print(f"GROUP BY over raw rows: {raw_ms:>9.2f} ms")
+    print(f"rollup tables:          {rollup_ms:>9.2f} ms")
+    return raw_ms, rollup_ms
+
+# =========================
+# CARD SNAPSHOT FORMAT (pickle per process vs. shared Arrow memory map)
+# =========================
+def _smaps_kb():
+    # (anonymous, file-backed) resident KB of this process (Linux). Anonymous
+    # memory is each process's own; file-backed pages of one snapshot file
+    # are a single copy in the page cache however many processes map them.
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return fields.get("Anonymous", 0), fields.get("Rss", 0) - fields.get("Anonymous", 0)
+
+def _snapshot_worker(kind, directory, name, version, out):
+    import browse
+    import cache
+
+    cls = cache.ArrowSnapshotCache if kind == "arrow" else cache.SnapshotCache
+    snap = cls(directory, name)
+    anon0, file0 = _smaps_kb()
+    t0 = time.perf_counter()
+    df = snap._load(snap._path(version))
+    load_ms = (time.perf_counter() - t0) * 1000
+    anon1, file1 = _smaps_kb()
+    rnd = random.Random(3)
+    t0 = time.perf_counter()
+    for _ in range(20):
+        target, f = random_browse(rnd)
+        browse.filter_profiles(df, target, f.pop("q"), f.pop("only_verified"), **f)
+    filter_ms = (time.perf_counter() - t0) * 1000 / 20
+    out.put((load_ms, filter_ms, (anon1 - anon0) / 1024, (file1 - file0) / 1024))
+
+def run_snapshot(args):
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="cn-loadtest-")
+    os.environ["CN_DATA_DIR"] = data_dir
+    seed(args.profiles, random.Random(1))
+    import cache
+    import storage
+
+    df = storage.compact_cards(storage.store().read_profile_cards())
+    directory = Path(data_dir) / "snapshot-bench"
+    rows = []
+    for kind, cls in (("pickle", cache.SnapshotCache), ("arrow", cache.ArrowSnapshotCache)):
+        snap = cls(directory, "cards")
+        snap._dump(snap._path(1), df)
+        size = snap._path(1).stat().st_size
+        ctx = mp.get_context("spawn")
+        out = ctx.Queue()
+        procs = [ctx.Process(target=_snapshot_worker, args=(kind, directory, "cards", 1, out)) for _ in range(args.processes)]
+        for p in procs:
+            p.start()
+        results = [out.get() for _ in procs]
+        for p in procs:
+            p.join()
+        rows.append((kind, size / 2**20, *[statistics.median(r[i] for r in results) for i in range(4)]))
+
+    print(f"profiles={args.profiles} processes={args.processes} data={data_dir}")
+    print(f"{'format':>7} {'file MB':>8} {'load ms':>8} {'filter ms':>10} {'own MB/proc':>12} {'mapped MB/proc':>15}")
+    for kind, mb, load_ms, filter_ms, anon_mb, file_mb in rows:
+        print(f"{kind:>7} {mb:>8.1f} {load_ms:>8.1f} {filter_ms:>10.2f} {anon_mb:>12.1f} {file_mb:>15.1f}")
+    return rows
+
+# =========================
+# ONLINE BACKUP (writer latency while a snapshot is taken)
+# =========================
+def run_backup_test(args):
+    import json
+
+    os.environ["CN_DATA_DIR"] = args.data_dir or tempfile.mkdtemp(prefix="cn-loadtest-")
+    seed(args.profiles, random.Random(1))
+    import storage
+
+    rnd = random.Random(5)
+    for i in range(args.uploads):
+        storage.save_upload(rnd.randbytes(args.upload_kb * 1024), "photo", "jpg")
+    def write_latencies(cmd_env, root):
+        # honest writes every 5 ms; cmd_env None = no backup running
+        proc = None
+        if cmd_env is not None:
+            env = {**os.environ, **cmd_env, "CN_BACKUP_NICE": "0"}
+            proc = subprocess.Popen([sys.executable, str(APP_DIR / "backup.py"), "--root", str(root), "run", "--keep", "0"],
+                                    env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        latencies = []
+        deadline = time.perf_counter() + args.seconds
+        while (proc.poll() is None) if proc else time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            storage.insert_message(1, 2, "still here?")
+            latencies.append((time.perf_counter() - t0) * 1000)
+            time.sleep(0.005)
+        report = {}
+        if proc:
+            out, err = proc.communicate()
+            if proc.returncode != 0:
+                raise SystemExit(f"backup.py exited {proc.returncode}:\n{err.strip()}")
+            report = json.loads(out)
+        latencies.sort()
+        return latencies, report
+
+    rows = []
+    base = Path(os.environ["CN_DATA_DIR"])
+    for label, env, root in (("no backup", None, None),
+                             ("one-shot copy", {"CN_BACKUP_PAGES_PER_STEP": "-1", "CN_BACKUP_STEP_SLEEP_MS": "0",
+                                                "CN_BACKUP_UPLOAD_MBPS": "0"}, base / "backups-oneshot"),
+                             ("paged backup", {}, base / "backups-paged"),
+                             ("paged, incremental", {}, base / "backups-paged")):
+        lat, report = write_latencies(env, root)
+        uploads = report.get("uploads", {})
+        rows.append((label, len(lat), statistics.median(lat), lat[int(0.99 * (len(lat) - 1))], lat[-1],
+                     report.get("seconds", 0), uploads.get("hashed", 0), uploads.get("new_bytes", 0) / 1e6))
+
+    print(f"profiles={args.profiles} uploads={args.uploads}x{args.upload_kb}KB db={storage.DB_PATH.stat().st_size / 1e6:.1f}MB")
+    print(f"{'mode':>18} {'writes':>7} {'p50 ms':>7} {'p99 ms':>7} {'max ms':>7} {'backup s':>9} {'hashed':>7} {'new MB':>7}")
+    for label, n, p50, p99, worst, secs, hashed, new_mb in rows:
+        print(f"{label:>18} {n:>7} {p50:>7.2f} {p99:>7.2f} {worst:>7.2f} {secs:>9.2f} {hashed:>7} {new_mb:>7.1f}")
+    return rows
+
+# =========================
+# INBOX (hot table + archive vs. one unbounded messages table)
+# =========================
+def run_inbox(args):
+    os.environ["CN_DATA_DIR"] = args.data_dir or tempfile.mkdtemp(prefix="cn-loadtest-")
+    seed(args.profiles, random.Random(1))
+    import storage
+
+    st = storage.store()
+    rnd = random.Random(3)
+    start = datetime.now() - timedelta(days=args.days)
+    step = args.days * 86400 / args.messages
+    with st.connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM messages")
+        rows = []
+        for i in range(cur.fetchone()[0], args.messages):
+            created = (start + timedelta(seconds=i * step)).isoformat(timespec="seconds")
+            rows.append((rnd.randint(1, args.profiles), rnd.randint(1, args.profiles), fake_message(rnd, 0), created))
+        cur.executemany("INSERT INTO messages (sender_id, receiver_id, body, created) VALUES (?, ?, ?, ?)", rows)
+        t0 = time.perf_counter()
+        st.rebuild_message_index(cur)  # bulk rows bypassed insert_message
+        fts_build_s = time.perf_counter() - t0
+        conn.commit()
+
+    users = [rnd.randint(1, args.profiles) for _ in range(args.repeat)]
+
+    def timed(fn):
+        out = []
+        for u in users:
+            t0 = time.perf_counter()
+            fn(u)
+            out.append((time.perf_counter() - t0) * 1000)
+        return statistics.median(out)
+
+    # what read_inbox() ran before: every message of the user, no index
+    legacy = timed(lambda u: st.fetch_df("SELECT * FROM messages NOT INDEXED WHERE sender_id = ? OR receiver_id = ? ORDER BY created DESC", (u, u)))
+    first_unarchived = timed(lambda u: storage.read_inbox(u))
+
+    def scan_history(u):
+        df = st.fetch_df("SELECT * FROM messages NOT INDEXED WHERE sender_id = ? OR receiver_id = ? ORDER BY created DESC", (u, u))
+        return df[df["body"].str.contains("brand deal", case=False)]
+    search_scan = timed(scan_history)
+    search_fts = timed(lambda u: storage.search_messages(u, "brand deal"))
+    search_prefix = timed(lambda u: storage.search_messages(u, "fitn"))
+    t0 = time.perf_counter()
+    while storage.archive_messages(args.hot_days):
+        pass
+    archive_s = time.perf_counter() - t0
+    tiers = storage.message_tiers()
+    first = timed(lambda u: storage.read_inbox(u))
+    deep = timed(lambda u: storage.read_inbox(u, limit=storage.INBOX_PAGE * 20))
+    print(f"profiles={args.profiles} messages={args.messages} over {args.days} days, hot window {args.hot_days} days")
+    print(f"archived {tiers['archive']} in {archive_s:.1f} s; hot table now {tiers['hot']} rows")
+    print(f"{'full inbox, no index (before)':>34}: {legacy:>8.2f} ms")
+    print(f"{'first page, single table':>34}: {first_unarchived:>8.2f} ms")
+    print(f"{'first page, hot + archive':>34}: {first:>8.2f} ms")
+    print(f"{'20 pages back (into the archive)':>34}: {deep:>8.2f} ms")
+    print(f"message search (FTS index built in {fts_build_s:.1f} s):")
+    print(f"{'history frame + str.contains':>34}: {search_scan:>8.2f} ms")
+    print(f"{'FTS5, ranked page + snippets':>34}: {search_fts:>8.2f} ms")
+    print(f"{'FTS5, prefix term':>34}: {search_prefix:>8.2f} ms")
+    return legacy, first_unarchived, first, deep, search_scan, search_fts
+
+# =========================
+# VERIFICATION QUEUE (keyset pages + batch decisions vs. scan + per-profile writes)
+# =========================
+def run_review(args):
+    os.environ["CN_DATA_DIR"] = args.data_dir or tempfile.mkdtemp(prefix="cn-loadtest-")
+    seed(args.profiles, random.Random(1))
+    import storage
+
+    def timed(fn, repeat=args.repeat):
+        out = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            out.append((time.perf_counter() - t0) * 1000)
+        return statistics.median(out)
+
+    def scan_page():
+        df = storage.read_profiles()
+        return df[(df["selfie_uploaded"] == 1) & (df["verified"] == 0)].sort_values(["created", "id"]).head(storage.REVIEW_PAGE)
+
+    pending = storage.verification_stats()[0]["pending"]
+    scan_ms = timed(scan_page, 5)
+    first_ms = timed(lambda: storage.pending_verifications())
+    deep = storage.pending_verifications(limit=pending // 2).iloc[-1]
+    deep_ms = timed(lambda: storage.pending_verifications((deep["created"], int(deep["id"]))))
+
+    # clearing the queue: one update per profile vs. one transaction per page
+    n = min(args.clear, pending // 2)
+    ids = storage.pending_verifications(limit=2 * n)["id"].tolist()
+    t0 = time.perf_counter()
+    for pid in ids[:n]:
+        storage.update_profile(pid, {"verified": storage.VERIFIED})
+    single_rate = n / (time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    for i in range(n, 2 * n, storage.REVIEW_PAGE):
+        storage.review_profiles(ids[i:i + storage.REVIEW_PAGE], storage.VERIFIED, "loadtest")
+    batch_rate = n / (time.perf_counter() - t0)
+
+    print(f"profiles={args.profiles} pending={pending} page={storage.REVIEW_PAGE}")
+    print(f"{'first page, full read + filter':>34}: {scan_ms:>8.2f} ms")
+    print(f"{'first page, keyset on index':>34}: {first_ms:>8.2f} ms")
+    print(f"{'mid-queue page, keyset on index':>34}: {deep_ms:>8.2f} ms")
+    print(f"{'approve one profile per write':>34}: {single_rate:>8.0f} profiles/s")
+    print(f"{'approve a page per transaction':>34}: {batch_rate:>8.0f} profiles/s (audit row + notification each)")
+    return scan_ms, first_ms, deep_ms, single_rate, batch_rate
+
+# =========================
+# IDENTITY (session token vs. re-deriving the profile per run)
+# =========================
+def run_identity(args):
+    os.environ["CN_DATA_DIR"] = args.data_dir or tempfile.mkdtemp(prefix="cn-loadtest-")
+    seed(args.profiles, random.Random(1))
+    import sessions
+    import storage
+
+    people = storage.store().fetch_all(f"SELECT id, display_name, account_type FROM profiles LIMIT {int(args.sessions)}")
+    t0 = time.perf_counter()
+    tokens = [sessions.create(pid, name, role) for pid, name, role in people]
+    create_ms = (time.perf_counter() - t0) * 1000 / len(tokens)
+
+    def per_op_us(fn, items):
+        t0 = time.perf_counter()
+        for x in items:
+            fn(x)
+        return (time.perf_counter() - t0) * 1e6 / len(items)
+
+    rnd = random.Random(2)
+    sample = [rnd.randrange(len(people)) for _ in range(args.lookups)]
+    derive_us = per_op_us(lambda i: storage.get_profile_id(people[i][1], people[i][2]), sample)
+    sessions._cache.clear()  # as after a restart: every token is read once
+    cold_us = per_op_us(lambda i: sessions.resolve(tokens[i]), sorted(set(sample)))
+    warm_us = per_op_us(lambda i: sessions.resolve(tokens[i]), sample)
+    assert all(sessions.resolve(tokens[i])["profile_id"] == people[i][0] for i in sample[:100])
+
+    print(f"profiles={args.profiles} sessions={len(tokens)} lookups={args.lookups}")
+    print(f"{'create session':>36}: {create_ms * 1000:>9.1f} us")
+    print(f"{'get_profile_id(name, role) per run':>36}: {derive_us:>9.1f} us")
+    print(f"{'resolve token, not cached (1 read)':>36}: {cold_us:>9.1f} us")
+    print(f"{'resolve token, cached in worker':>36}: {warm_us:>9.1f} us")
+    print(f"{'reruns after the first':>36}: {0:>9.1f} us (identity is in st.session_state)")
+    return derive_us, cold_us, warm_us
+
+# =========================
+# APP SESSIONS (simulated users driving app.py headless through AppTest)
+# =========================
+# Each worker process stands in for one Streamlit server (see cluster.py)
+# and hosts its share of the users. AppTest swaps process-global runtime
+# state on every run, so a worker interleaves its users one step at a time
+# instead of using threads; the GIL serializes a real server's session
+# threads much the same way. A step is a widget change or click plus every
+# rerun it triggers, timed and attributed to the screen it lands on.
+def _png(rnd):
+    import io
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 64), tuple(rnd.randrange(256) for _ in range(3))).save(buf, "PNG")
+    return buf.getvalue()
+
+class _SimUser:
+    def __init__(self, i, creator_share, think, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.rnd = random.Random(1000 + i)
+        self.role = "Creator" if self.rnd.random() < creator_share else "Agency"
+        self.name = f"load_{self.role.lower()}_{i}"
+        self.think = think
+        self.at = AppTest.from_file(str(APP_DIR / "app.py"), default_timeout=timeout)
+        self.samples = []  # (screen, ms)
+
+    def screen(self):
+        s = self.at.session_state
+        return s["screen"] if s["auth_step"] == "app" else f"onboarding.{s['auth_step']}"
+
+    def step(self, prepare=None, click=None, key=None):
+        # generator: yields the think time before the step, then runs it
+        yield self.rnd.uniform(0, 2 * self.think)
+        t0 = time.perf_counter()
+        if prepare:
+            prepare(self.at)
+        if click or key:
+            button = self.at.button(key=key) if key else [b for b in self.at.button if b.label == click][0]
+            button.click()
+        self.at.run()
+        self.samples.append((self.screen(), (time.perf_counter() - t0) * 1000))
+        if self.at.exception:
+            raise RuntimeError(self.at.exception[0].message)
+
+    def widget(self, kind, label):
+        return [w for w in getattr(self.at, kind) if w.label == label][0]
+
+    def onboard(self):
+        yield from self.step()
+        yield from self.step(click="I’m a Creator" if self.role == "Creator" else "I’m an Agency")
+        yield from self.step(lambda at: at.text_input[0].input(self.name), click="Continue")
+        if self.role == "Creator":
+            yield from self.step(lambda at: at.file_uploader[0].upload("me.png", _png(self.rnd), "image/png"))
+            yield from self.step(click="Next")
+            yield from self.step(lambda at: (self.widget("text_input", "Primary niche").input(self.rnd.choice(SAMPLE_NICHES)),
+                                             self.widget("text_area", "Short bio").input("Growing steadily, looking for a partner.")), click="Next")
+            yield from self.step(lambda at: self.widget("text_input", "Current location").input(self.rnd.choice(SAMPLE_CITIES)), click="Next")
+            yield from self.step(click="Next")
+            yield from self.step(click="Next")
+            yield from self.step(lambda at: at.checkbox[0].check(), click="Finish & enter app")
+        else:
+            yield from self.step(lambda at: (at.text_input[0].input(f"{self.name} Mgmt"), at.text_input[1].input("https://agency.example"),
+                                             at.text_input[2].input(self.rnd.choice(SAMPLE_CITIES))), click="Next")
+            yield from self.step(lambda at: (at.text_area[0].input("Took a creator from 1k to 10k"), at.text_area[1].input("Full service")), click="Next")
+            yield from self.step(click="Next")
+            yield from self.step(click="Finish & enter app")
+        assert self.at.session_state["auth_step"] == "app", self.screen()
+
+    def browse(self):
+        yield from self.step(click="Browse")
+        facets = ["personalities", "content_types"] if self.role == "Agency" else ["services", "payment_models"]
+        for _ in range(self.rnd.randint(1, 3)):
+            kind = self.rnd.choice(facets + ["location", "verified", "q"])
+            if kind == "location":
+                value = self.rnd.choice(["Anywhere", "Same city", "Same country"])
+                yield from self.step(lambda at: at.selectbox(key="browse_location").set_value(value))
+            elif kind == "verified":
+                yield from self.step(lambda at: at.checkbox(key="browse_verified").set_value(self.rnd.random() < 0.5))
+            elif kind == "q":
+                q = self.rnd.choice(["", "fit", "london", "beauty"])
+                yield from self.step(lambda at: self.widget("text_input", "Search (name, niche, location)").input(q))
+            else:
+                def pick(at, kind=kind):
+                    ms = at.multiselect(key=f"browse_{kind}")
+                    ms.set_value(self.rnd.sample(list(ms.options), 1) if self.rnd.random() < 0.7 else [])
+                yield from self.step(pick)
+        if any(b.label == "Next page" and not b.disabled for b in self.at.button):
+            yield from self.step(click="Next page")
+
+    def message(self):
+        cards = [b.key for b in self.at.button if b.key and b.key.startswith("msg_")]
+        if cards:
+            yield from self.step(key=self.rnd.choice(cards))
+        else:
+            yield from self.step(click="Back to home")
+            yield from self.step(click="Messages")
+        yield from self.step(lambda at: self.widget("text_area", "Message").input(fake_message(self.rnd, 0)), click="Send")
+        if any(b.label == "Older messages" for b in self.at.button):
+            yield from self.step(click="Older messages")
+        yield from self.step(click="Back to home")
+
+    def script(self, rounds):
+        yield from self.onboard()
+        for _ in range(rounds):
+            yield from self.browse()
+            yield from self.message()
+
+def _session_worker(ids, args, out):
+    import heapq
+
+    import cache
+    import perf
+    import sqltrace
+
+    sqltrace.ROLLING_SAMPLES = 1 << 20  # keep every sample for the lock-wait estimate
+    warm = _SimUser(-1, 0, 0, args["timeout"])  # imports, schema check, first-run caches
+    warm.at.run()
+    perf.reset()
+    sqltrace.reset()
+    anon0, _ = _smaps_kb()
+
+    users = [_SimUser(i, args["creator_share"], args["think"], args["timeout"]) for i in ids]
+    scripts = [u.script(args["rounds"]) for u in users]
+    errors = []
+    now = time.perf_counter()
+    ready = [(now, n) for n in range(len(users))]
+    while ready:
+        at, n = heapq.heappop(ready)
+        time.sleep(max(0.0, at - time.perf_counter()))
+        try:
+            heapq.heappush(ready, (time.perf_counter() + next(scripts[n]), n))
+        except StopIteration:
+            pass
+        except Exception as e:
+            errors.append(f"{users[n].screen()}: {type(e).__name__}: {e}")
+    anon1, _ = _smaps_kb()
+
+    # SQLite waits for the write lock inside a transaction's first write
+    # statement; time above that statement's median is counted as waiting
+    waits = []
+    for sql, stat in sqltrace._table.items():
+        if sql.split(" ", 1)[0].upper() in ("INSERT", "UPDATE", "DELETE", "REPLACE"):
+            samples = sorted(stat["samples"])
+            median = samples[len(samples) // 2]
+            waits += [ms - median for ms in samples]
+    writes = {h["labels"]["span"]: h["buckets"] for h in perf.snapshot()["histograms"]
+              if h["name"] == "cn_span_ms" and h["labels"].get("span") in ("upsert_profile", "insert_message")}
+    out.put({
+        "samples": [s for u in users for s in u.samples],
+        "errors": errors,
+        "waits": waits,
+        "writes": writes,
+        "anon_mb": anon1 / 1024,
+        "session_mb": (anon1 - anon0) / 1024 / max(1, len(users)),
+        "state_kb": statistics.median(cache._sizeof(u.at.session_state.to_dict()) for u in users) / 1024,
+    })
+
+def _pctl(sorted_ms, q):
+    return sorted_ms[min(len(sorted_ms) - 1, int(q * len(sorted_ms)))] if sorted_ms else 0.0
+
+def run_sessions(args):
+    import perf
+
+    os.environ["CN_DATA_DIR"] = args.data_dir or tempfile.mkdtemp(prefix="cn-loadtest-")
+    os.environ["CN_SQL_TRACE"] = "1"
+    os.environ.setdefault("CN_SLOW_QUERY_MS", "60000")
+    for limit in ("CN_MESSAGE_RATE_PER_MIN", "CN_PROFILE_WRITE_RATE_PER_MIN", "CN_SIGNUP_RATE_PER_MIN", "CN_SIGNUP_GLOBAL_RATE_PER_MIN"):
+        os.environ.setdefault(limit, "0")  # simulated users would only measure the throttle
+    if args.writer:
+        os.environ["CN_WRITER_ADDRESS"] = args.writer_address
+        os.environ.setdefault("CN_WRITER_AUTHKEY", os.urandom(32).hex())
+    seed(args.profiles, random.Random(1))
+
+    coordinator = None
+    if args.writer:
+        coordinator = subprocess.Popen([sys.executable, str(APP_DIR / "writer.py"), "--address", args.writer_address], env=dict(os.environ))
+        time.sleep(1.0)
+    ctx = mp.get_context("spawn")
+    out = ctx.Queue()
+    opts = {k: getattr(args, k) for k in ("creator_share", "think", "timeout", "rounds")}
+    procs = [ctx.Process(target=_session_worker, args=(list(range(w, args.users, args.workers)), opts, out))
+             for w in range(args.workers)]
+    t0 = time.perf_counter()
+    try:
+        for p in procs:
+            p.start()
+        results = [out.get() for _ in procs]
+        for p in procs:
+            p.join()
+    finally:
+        if coordinator:
+            coordinator.terminate()
+            coordinator.wait(timeout=10)
+    seconds = time.perf_counter() - t0
+
+    by_screen = {}
+    for r in results:
+        for screen, ms in r["samples"]:
+            by_screen.setdefault("onboarding" if screen.startswith("onboarding") else screen, []).append(ms)
+    waits = sorted(w for r in results for w in r["waits"])
+    writes = {}
+    for r in results:
+        for name, buckets in r["writes"].items():
+            h = writes.setdefault(name, perf.Histogram())
+            h.counts = [a + b for a, b in zip(h.counts, buckets)]
+            h.count += sum(buckets)
+    errors = [e for r in results for e in r["errors"]]
+
+    steps = sum(len(ms) for ms in by_screen.values())
+    print(f"users={args.users} workers={args.workers} rounds={args.rounds} think={args.think}s profiles={args.profiles} "
+          f"writer={'on' if args.writer else 'off'} cpus={os.cpu_count()}")
+    print(f"steps={steps} seconds={seconds:.1f} steps/s={steps / seconds:.1f}")
+    print(f"{'screen':>12} {'steps':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for screen, ms in sorted(by_screen.items()):
+        ms.sort()
+        print(f"{screen:>12} {len(ms):>6} {_pctl(ms, 0.5):>8.1f} {_pctl(ms, 0.95):>8.1f} {_pctl(ms, 0.99):>8.1f} {ms[-1]:>8.1f}")
+    if waits:
+        print(f"db lock wait over {len(waits)} write statements: p95={_pctl(waits, 0.95):.2f} ms "
+              f"p99={_pctl(waits, 0.99):.2f} ms max={waits[-1]:.2f} ms total={sum(w for w in waits if w > 0) / 1000:.2f} s")
+    for name, h in sorted(writes.items()):
+        print(f"{name + '()':>17}: calls={h.count} p50={h.quantile(0.5):.1f} ms p95={h.quantile(0.95):.1f} ms (incl. lock / writer queue)")
+    print(f"memory per session: {statistics.median(r['session_mb'] for r in results):.2f} MB worker growth, "
+          f"{statistics.median(r['state_kb'] for r in results):.1f} KB session_state; "
+          f"worker total {max(r['anon_mb'] for r in results):.0f} MB")
+    for e in errors[:5]:
+        print(f"error: {e}")
+    if errors:
+        print(f"{len(errors)} of {args.users} users stopped on an error")
+    return by_screen, waits, errors
+
+# =========================
+# COLD START (fresh worker process to first page)
+# =========================
+def _startup_probe(token, out):
+    # runs in a fresh interpreter: what one new Streamlit worker pays
+    t0 = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    t1 = time.perf_counter()
+    import browse, searches, sessions, storage  # noqa: F401  (what app.py imports)
+    t2 = time.perf_counter()
+    at = AppTest.from_file(str(APP_DIR / "app.py"), default_timeout=120)
+    at.run()
+    t3 = time.perf_counter()
+    landing_pandas = "pandas" in sys.modules
+    at.run()
+    t4 = time.perf_counter()
+    me = AppTest.from_file(str(APP_DIR / "app.py"), default_timeout=120)
+    me.query_params["s"] = token
+    me.run()
+    t5 = time.perf_counter()
+    out.put({
+        "streamlit_ms": (t1 - t0) * 1000,
+        "app_import_ms": (t2 - t1) * 1000,
+        "first_page_ms": (t3 - t2) * 1000,
+        "rerun_ms": (t4 - t3) * 1000,
+        "signed_in_ms": (t5 - t4) * 1000,
+        "landing_pandas": landing_pandas,
+        "signed_in_screen": me.session_state["screen"] if me.session_state["auth_step"] == "app" else None,
+    })
+
+def run_startup(args):
+    os.environ["CN_DATA_DIR"] = args.data_dir or tempfile.mkdtemp(prefix="cn-loadtest-")
+    seed(args.profiles, random.Random(1))
+    import sessions
+    import storage
+
+    # one token per probe: a token arriving in the URL is rotated on first use
+    me = storage.store().fetch_all("SELECT display_name, account_type FROM profiles WHERE id = 1")[0]
+    tokens = [sessions.create(1, *me) for _ in range(args.repeat)]
+    st = storage.store()
+
+    def init_ms():
+        t0 = time.perf_counter()
+        storage.init_db()
+        return (time.perf_counter() - t0) * 1000
+    full, current = [], []
+    for _ in range(args.repeat):
+        if st.name == "sqlite":
+            with st.connection() as conn:
+                conn.execute("PRAGMA user_version = 0")  # as before migrations were tracked
+        full.append(init_ms())
+        current.append(init_ms())
+
+    ctx = mp.get_context("spawn")
+    rows = []
+    for token in tokens:
+        out = ctx.Queue()
+        t0 = time.perf_counter()
+        p = ctx.Process(target=_startup_probe, args=(token, out))
+        p.start()
+        r = out.get()
+        r["ready_ms"] = (time.perf_counter() - t0) * 1000 - r["rerun_ms"] - r["signed_in_ms"]
+        p.join()
+        rows.append(r)
+
+    med = {k: statistics.median(r[k] for r in rows) for k in ("streamlit_ms", "app_import_ms", "first_page_ms", "rerun_ms", "signed_in_ms", "ready_ms")}
+    print(f"profiles={args.profiles} repeat={args.repeat} backend={st.name} cpus={os.cpu_count()}")
+    print(f"{'init_db, schema DDL':>34}: {statistics.median(full):>8.1f} ms")
+    print(f"{'init_db, schema current':>34}: {statistics.median(current):>8.2f} ms (every rerun)")
+    print(f"{'import streamlit + AppTest':>34}: {med['streamlit_ms']:>8.1f} ms")
+    print(f"{'import app modules':>34}: {med['app_import_ms']:>8.1f} ms")
+    # AppTest adds a fixed cost to every run; the rerun shows how much
+    print(f"{'first page (onboarding)':>34}: {med['first_page_ms']:>8.1f} ms (pandas loaded: {any(r['landing_pandas'] for r in rows)})")
+    print(f"{'rerun of the same page':>34}: {med['rerun_ms']:>8.1f} ms")
+    print(f"{'first signed-in page (token)':>34}: {med['signed_in_ms']:>8.1f} ms (screen: {rows[0]['signed_in_screen']})")
+    verdict = "within" if med["ready_ms"] <= args.budget_ms else "OVER"
+    print(f"{'new worker to first page':>34}: {med['ready_ms']:>8.1f} ms, {verdict} budget of {args.budget_ms:.0f} ms")
+    if verdict == "OVER":
+        sys.exit(1)
+    return med
+
+def main():
+    ap = argparse.ArgumentParser(description="Creator Network load tests (offline, single box)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    w = sub.add_parser("workers", help="Browse throughput vs. worker process count (shared snapshot + single writer)")
+    w.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    w.add_argument("--seconds", type=float, default=10.0)
+    w.add_argument("--profiles", type=int, default=5000)
+    w.add_argument("--write-interval", type=float, default=0.5, help="seconds between coordinator writes (0 = read-only)")
+    w.add_argument("--writer-address", default="127.0.0.1:8598")
+    w.add_argument("--data-dir", default="", help="defaults to a fresh temp dir; never points at data/ by default")
+    w.set_defaults(fn=run_workers)
+
+    c = sub.add_parser("cards", help="Full-row read vs. Browse card projection: columns, text bytes, frame memory")
+    c.add_argument("--profiles", type=int, default=5000)
+    c.add_argument("--repeat", type=int, default=5)
+    c.add_argument("--data-dir", default="", help="defaults to a fresh temp dir; never points at data/ by default")
+    c.set_defaults(fn=run_cards)
+
+    r = sub.add_parser("queries", help="Browse page latency with and without the shared result cache")
+    r.add_argument("--profiles", type=int, default=5000)
+    r.add_argument("--requests", type=int, default=2000)
+    r.add_argument("--distinct", type=int, default=50, help="distinct queries in the popularity distribution")
+    r.add_argument("--data-dir", default="", help="defaults to a fresh temp dir; never points at data/ by default")
+    r.set_defaults(fn=run_queries)
+
+    s = sub.add_parser("searches", help="Saved-search matching over the change log vs. re-running every search")
+    s.add_argument("--profiles", type=int, default=5000)
+    s.add_argument("--searches", type=int, default=2000)
+    s.add_argument("--changes", type=int, default=100, help="profiles inserted after the searches are saved")
+    s.add_argument("--data-dir", default="", help="defaults to a fresh temp dir; never points at data/ by default")
+    s.set_defaults(fn=run_searches)
+
+    p = sub.add_parser("pii", help="Contact-detail scanner throughput (inline per message and bulk back-scan)")
+    p.add_argument("--messages", type=int, default=50000)
+    p.add_argument("--pii-rate", type=float, default=0.05, help="share of messages with a contact detail")
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--min-mbps", type=float, default=10.0, help="exit 1 below this scan rate (0 = report only)")
+    p.add_argument("--profiles", type=int, default=0, help="also seed this many profiles and time the back-scan")
+    p.add_argument("--data-dir", default="", help="defaults to a fresh temp dir; never points at data/ by default")
+    p.set_defaults(fn=run_pii)
+
+    t = sub.add_parser("throttle", help="Honest write latency while abusive senders hammer insert_message, with and without rate limiting")
+    t.add_argument("--abusers", type=int, default=4)
+    t.add_argument("--seconds", type=float, default=5.0)
+    t.add_argument("--keys", type=int, default=200000, help="distinct keys for the limiter cost/memory check")
+    t.add_argument("--max-keys", type=int, default=50000)
+    t.add_argument("--data-dir", default="", help="defaults to a fresh temp dir; never points at data/ by default")
+    t.set_defaults(fn=run_throttle)
+
+    an = sub.add_parser("analytics", help="Admin dashboard data: rollup tables vs. GROUP BY over profiles/messages")
+    an.add_argument("--profiles", type=int, default=50000)
+    an.add_argument("--messages", type=int, default=200000)
+    an.add_argument("--repeat", type=int, default=5)
+    an.add_argument("--data-dir", default="", help="defaults to a fresh temp dir; never points at data/ by default")
+    an.set_defaults(fn=run_analytics)
+
+    sn = sub.add_parser("snapshot", help="Card snapshot: per-process pickle vs. shared memory-mapped Arrow IPC")
+    sn.add_argument("--profiles", type=int, default=50000)
+    sn.add_argument("--processes", type=int, default=4)
+    sn.add_argument("--data-dir", default="", help="defaults to a fresh temp dir; never points at data/ by default")
+    sn.set_defaults(fn=run_snapshot)
+
+    ib = sub.add_parser("inbox", help="Inbox page and message search latency vs. the old full-history read")
+    ib.add_argument("--profiles", type=int, default=5000)
+    ib.add_argument("--messages", type=int, default=1000000)
+    ib.add_argument("--days", type=int, default=3 * 365, help="span of message history")
+    ib.add_argument("--hot-days", type=float, default=180)
+    ib.add_argument("--repeat", type=int, default=50)
+    ib.add_argument("--data-dir", default="", help="defaults to a fresh temp dir; never points at data/ by default")
+    ib.set_defaults(fn=run_inbox)
+
+    rv = sub.add_parser("review", help="Verification queue: keyset pages and batch decisions vs. full scan and per-profile writes")
+    rv.add_argument("--profiles", type=int, default=50000)
+    rv.add_argument("--clear", type=int, default=2000, help="profiles approved by each method")
+    rv.add_argument("--repeat", type=int, default=20)
+    rv.add_argument("--data-dir", default="", help="defaults to a fresh temp dir; never points at data/ by default")
+    rv.set_defaults(fn=run_review)
+
+    idn = sub.add_parser("identity", help="Resolving the signed-in user: session token (cached / one read) vs. name+role lookup")
+    idn.add_argument("--profiles", type=int, default=50000)
+    idn.add_argument("--sessions", type=int, default=5000)
+    idn.add_argument("--lookups", type=int, default=5000)
+    idn.add_argument("--data-dir", default="", help="defaults to a fresh temp dir; never points at data/ by default")
+    idn.set_defaults(fn=run_identity)
+
+    ss = sub.add_parser("sessions", help="Concurrent simulated users through onboarding, Browse, compose and inbox (headless AppTest)")
+    ss.add_argument("--users", type=int, default=20)
+    ss.add_argument("--workers", type=int, default=2, help="processes, each hosting users/workers sessions (like cluster.py)")
+    ss.add_argument("--rounds", type=int, default=3, help="browse + message rounds per user after onboarding")
+    ss.add_argument("--think", type=float, default=0.2, help="mean seconds between a user's steps (0 = back to back)")
+    ss.add_argument("--creator-share", type=float, default=0.5)
+    ss.add_argument("--profiles", type=int, default=5000)
+    ss.add_argument("--timeout", type=float, default=120, help="seconds one step may take")
+    ss.add_argument("--writer", action="store_true", help="route writes through a writer.py coordinator")
+    ss.add_argument("--writer-address", default="127.0.0.1:8598")
+    ss.add_argument("--data-dir", default="", help="defaults to a fresh temp dir; never points at data/ by default")
+    ss.set_defaults(fn=run_sessions)
+
+    su = sub.add_parser("startup", help="Cold start: fresh worker process to first page, import and schema-check costs; fails over budget")
+    su.add_argument("--profiles", type=int, default=20000)
+    su.add_argument("--repeat", type=int, default=3)
+    su.add_argument("--budget-ms", type=float, default=float(os.environ.get("CN_STARTUP_BUDGET_MS", "1500")),
+                    help="new worker to first rendered page, median (exit status 1 when over)")
+    su.add_argument("--data-dir", default="", help="defaults to a fresh temp dir; never points at data/ by default")
+    su.set_defaults(fn=run_startup)
+
+    b = sub.add_parser("backup", help="Honest write latency while backup.py snapshots the database and uploads")
+    b.add_argument("--profiles", type=int, default=50000)
+    b.add_argument("--uploads", type=int, default=300)
+    b.add_argument("--upload-kb", type=int, default=256)
+    b.add_argument("--seconds", type=float, default=5.0, help="length of the no-backup baseline")
+    b.add_argument("--data-dir", default="", help="defaults to a fresh temp dir; never points at data/ by default")
+    b.set_defaults(fn=run_backup_test)
+
+    args = ap.parse_args()
+    args.fn(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+
+log = logging.getLogger("creator_network.maintenance")
+
+# storage is imported lazily: CN_DATA_DIR must be set before it loads
+
+GRACE_HOURS = 24.0
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _hardlink(keep, dup):
+    # replace dup with a link to keep's inode; atomic, the name stays valid
+    tmp = dup.with_name(f".{dup.name}.{os.getpid()}.link")
+    os.link(keep, tmp)
+    os.replace(tmp, dup)
+
+# =========================
+# UPLOAD GC + DEDUPE
+# =========================
+def gc_uploads(grace_hours=GRACE_HOURS, dry_run=False):
+    # 1. files nothing references and older than the grace period are deleted
+    #    (the grace period covers uploads saved just before their profile row)
+    # 2. remaining files with identical content are hardlinked to one inode
+    import storage
+
+    names, legacy_prefixes = storage.referenced_uploads()
+    cutoff = time.time() - grace_hours * 3600
+    report = {
+        "files": 0, "bytes": 0,
+        "referenced": 0, "missing_referenced": 0,
+        "orphans_deleted": 0, "orphan_bytes": 0, "orphans_in_grace": 0,
+        "duplicates_linked": 0, "dedupe_bytes": 0,
+        "dry_run": dry_run,
+    }
+
+    live = []
+    for path in sorted(storage.UPLOAD_DIR.iterdir()):
+        if not path.is_file() or path.name.startswith("."):
+            continue
+        st = path.stat()
+        report["files"] += 1
+        report["bytes"] += st.st_size
+        if path.name in names or path.name.startswith(tuple(legacy_prefixes)):
+            report["referenced"] += 1
+            live.append((path, st))
+        elif st.st_mtime > cutoff:
+            report["orphans_in_grace"] += 1
+            live.append((path, st))
+        else:
+            report["orphans_deleted"] += 1
+            report["orphan_bytes"] += st.st_size if st.st_nlink == 1 else 0
+            if not dry_run:
+                path.unlink()
+    report["missing_referenced"] = len([n for n in names if not (storage.UPLOAD_DIR / n).exists()])
+
+    # content hash only where sizes collide; already-linked files share an inode
+    by_size = {}
+    for path, st in live:
+        by_size.setdefault(st.st_size, []).append((path, st))
+    for size, group in by_size.items():
+        if len(group) < 2:
+            continue
+        by_hash = {}
+        for path, st in group:
+            by_hash.setdefault(_sha256(path), []).append((path, st))
+        for same in by_hash.values():
+            keep, keep_st = same[0]
+            inodes = {(keep_st.st_dev, keep_st.st_ino)}
+            for dup, st in same[1:]:
+                if (st.st_dev, st.st_ino) in inodes:
+                    continue
+                inodes.add((st.st_dev, st.st_ino))
+                report["duplicates_linked"] += 1
+                report["dedupe_bytes"] += size
+                if not dry_run:
+                    _hardlink(keep, dup)
+
+    report["bytes_reclaimed"] = report["orphan_bytes"] + report["dedupe_bytes"]
+    log.warning("upload gc: %s", report)
+    return report
+
+# =========================
+# CHANGE LOG COMPACTION
+# =========================
+def compact_changes(retention_hours=None):
+    import storage
+
+    before = storage.latest_change_seq()
+    hours = storage.CHANGES_RETENTION_HOURS if retention_hours is None else retention_hours
+    report = storage.compact_changes(hours)
+    report["retention_hours"] = hours
+    report["latest_seq"] = before
+    log.warning("change log compaction: %s", report)
+    return report
+
+# =========================
+# MESSAGE ARCHIVAL (hot table -> messages_archive)
+# =========================
+def archive_messages(hot_days=None, batch=None, pause=0.05):
+    # batches until nothing is old enough; the pause lets live writes through
+    import storage
+
+    hot_days = storage.MESSAGE_HOT_DAYS if hot_days is None else hot_days
+    batch = batch or storage.ARCHIVE_BATCH
+    t0 = time.perf_counter()
+    moved = batches = 0
+    while True:
+        n = storage.archive_messages(hot_days, batch)
+        if not n:
+            break
+        moved += n
+        batches += 1
+        time.sleep(pause)
+    report = {"hot_days": hot_days, "moved": moved, "batches": batches,
+              "seconds": round(time.perf_counter() - t0, 3), **storage.message_tiers()}
+    log.warning("message archival: %s", {k: v for k, v in report.items() if k != "archive_months"})
+    return report
+
+# =========================
+# SIGN-IN SESSIONS
+# =========================
+def evict_sessions():
+    # new sign-ins already evict expired rows; this covers quiet periods
+    import storage
+
+    evicted = storage.evict_sessions()
+    report = {"evicted": evicted, "live": storage.count_sessions()}
+    log.warning("session eviction: %s", report)
+    return report
+
+# =========================
+# CONTACT-DETAIL BACK-SCAN
+# =========================
+SCAN_BATCH = 2000
+
+def scan_pii(entities=("profile", "message"), batch=SCAN_BATCH):
+    # Rows written before the inline scanner existed (or under older
+    # patterns): rescan in id order and replace each batch's flags.
+    import pii
+    import storage
+
+    st = storage.store()
+    report = {"rows": 0, "bytes": 0, "flagged": 0, "kinds": {k: 0 for k in pii.KINDS}}
+    scan_seconds = 0.0
+    started = time.perf_counter()
+    for entity in entities:
+        fields = storage.PII_FIELDS[entity]
+        after = 0
+        while True:
+            rows = st.pii_text_batch(entity, after, batch)
+            if not rows:
+                break
+            flags = []
+            t0 = time.perf_counter()
+            for row in rows:
+                for field, text in zip(fields, row[1:]):
+                    if not text:
+                        continue
+                    report["bytes"] += len(text.encode("utf-8"))
+                    found = pii.kinds(text)
+                    if found:
+                        flags.append((row[0], field, ",".join(found)))
+                        for k in found:
+                            report["kinds"][k] += 1
+            scan_seconds += time.perf_counter() - t0
+            st.replace_pii_flags(entity, [row[0] for row in rows], flags)
+            report["rows"] += len(rows)
+            report["flagged"] += len(flags)
+            after = rows[-1][0]
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    report["scan_mb_per_s"] = round(report["bytes"] / 1e6 / scan_seconds, 1) if scan_seconds else None
+    log.warning("pii back-scan: %s", report)
+    return report
+
+# =========================
+# ANALYTICS ROLLUPS
+# =========================
+def rebuild_rollups():
+    # rollups are kept up to date on write; this is the full recompute for
+    # drift repair (e.g. after rows were edited by hand)
+    import storage
+
+    t0 = time.perf_counter()
+    storage.rebuild_rollups()
+    daily, totals = storage.read_rollups(days=36500)
+    report = {"daily_rows": len(daily), "total_rows": len(totals), "seconds": round(time.perf_counter() - t0, 3)}
+    log.warning("rollups rebuilt: %s", report)
+    return report
+
+# =========================
+# SAVED SEARCH MATCHING (standalone consumer)
+# =========================
+def match_searches(follow=0.0):
+    # The app matches opportunistically on each rerun; this drains the backlog
+    # (and with --follow keeps doing so) when no sessions are active.
+    import searches
+
+    total = 0
+    while True:
+        n = searches.process_pending(max_batches=None)
+        total += n
+        if n:
+            log.warning("saved searches: %d notification(s)", n)
+        if not follow:
+            return {"notifications": total}
+        time.sleep(follow)
+
+def main():
+    ap = argparse.ArgumentParser(description="Creator Network storage maintenance")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    u = sub.add_parser("uploads", help="Delete unreferenced uploads and hardlink duplicate files")
+    u.add_argument("--grace-hours", type=float, default=GRACE_HOURS, help="keep unreferenced files younger than this")
+    u.add_argument("--dry-run", action="store_true", help="report only, change nothing")
+    u.set_defaults(fn=lambda a: gc_uploads(a.grace_hours, a.dry_run))
+
+    c = sub.add_parser("changes", help="Drop acknowledged change-log rows and collapse old ones per entity")
+    c.add_argument("--retention-hours", type=float, default=None, help="only touch rows older than this (default CN_CHANGES_RETENTION_HOURS)")
+    c.set_defaults(fn=lambda a: compact_changes(a.retention_hours))
+
+    a = sub.add_parser("messages", help="Move messages older than the hot window into messages_archive")
+    a.add_argument("--hot-days", type=float, default=None, help="default CN_MESSAGE_HOT_DAYS; whole months move")
+    a.add_argument("--batch", type=int, default=None)
+    a.add_argument("--pause", type=float, default=0.05, help="seconds between batches")
+    a.set_defaults(fn=lambda a: archive_messages(a.hot_days, a.batch, a.pause))
+
+    s = sub.add_parser("sessions", help="Delete expired sign-in sessions")
+    s.set_defaults(fn=lambda a: evict_sessions())
+
+    p = sub.add_parser("pii", help="Back-scan profile text and messages for contact details")
+    p.add_argument("--entity", choices=["profile", "message"], action="append", help="default: both")
+    p.add_argument("--batch", type=int, default=SCAN_BATCH)
+    p.set_defaults(fn=lambda a: scan_pii(a.entity or ("profile", "message"), a.batch))
+
+    r = sub.add_parser("rollups", help="Recompute the analytics rollup tables from profiles and messages")
+    r.set_defaults(fn=lambda a: rebuild_rollups())
+
+    m = sub.add_parser("searches", help="Match changed profiles against saved searches")
+    m.add_argument("--follow", type=float, default=0.0, help="keep polling every N seconds")
+    m.set_defaults(fn=lambda a: match_searches(a.follow))
+
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    print(json.dumps(args.fn(args), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import bisect
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets (milliseconds) shared by every histogram
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_lock = threading.Lock()
+_counters = {}     # (name, labels) -> float
+_histograms = {}   # (name, labels) -> Histogram
+_local = threading.local()
+
+# =========================
+# METRICS
+# =========================
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS_MS, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q):
+        # linear interpolation inside the bucket that holds the q-th sample
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lo = BUCKETS_MS[i - 1] if i > 0 else 0.0
+                hi = BUCKETS_MS[i] if i < len(BUCKETS_MS) else BUCKETS_MS[-1]
+                return lo + (hi - lo) * (rank - seen) / n
+            seen += n
+        return float(BUCKETS_MS[-1])
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def incr(name, value=1, **labels):
+    k = _key(name, labels)
+    with _lock:
+        _counters[k] = _counters.get(k, 0) + value
+
+def observe(name, value_ms, **labels):
+    k = _key(name, labels)
+    with _lock:
+        h = _histograms.get(k)
+        if h is None:
+            h = _histograms[k] = Histogram()
+        h.observe(value_ms)
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+# =========================
+# SPANS (per-thread = per Streamlit session rerun)
+# =========================
+def _run():
+    if not hasattr(_local, "run"):
+        _local.run = {"screen": None, "start": time.perf_counter(), "spans": [], "depth": 0}
+    return _local.run
+
+def begin_run(screen):
+    _local.run = {"screen": screen, "start": time.perf_counter(), "spans": [], "depth": 0}
+
+def end_run():
+    run = _run()
+    total_ms = (time.perf_counter() - run["start"]) * 1000
+    if run["screen"]:
+        observe("cn_screen_ms", total_ms, screen=run["screen"])
+    return {"screen": run["screen"], "total_ms": round(total_ms, 3), "spans": list(run["spans"])}
+
+def current_spans():
+    return list(_run()["spans"])
+
+@contextmanager
+def span(name):
+    run = _run()
+    depth = run["depth"]
+    run["depth"] = depth + 1
+    entry = {"name": name, "ms": None, "depth": depth}
+    run["spans"].append(entry)  # pre-order, so nested spans list under their parent
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - t0) * 1000
+        run["depth"] = depth
+        entry["ms"] = round(ms, 3)
+        observe("cn_span_ms", ms, span=name)
+
+def timed(name=None):
+    # Decorator for data helpers: latency histogram, call count and result size
+    def wrap(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with span(label):
+                result = fn(*args, **kwargs)
+            incr("cn_calls_total", helper=label)
+            if hasattr(result, "__len__") and not isinstance(result, (str, bytes)):
+                incr("cn_rows_total", len(result), helper=label)
+            return result
+        return inner
+    return wrap
+
+# =========================
+# EXPORT
+# =========================
+def snapshot():
+    with _lock:
+        counters = [{"name": k[0], "labels": dict(k[1]), "value": v} for k, v in _counters.items()]
+        histograms = [{
+            "name": k[0],
+            "labels": dict(k[1]),
+            "count": h.count,
+            "sum_ms": round(h.total, 3),
+            "p50_ms": round(h.quantile(0.50), 3),
+            "p95_ms": round(h.quantile(0.95), 3),
+            "p99_ms": round(h.quantile(0.99), 3),
+            "buckets": list(h.counts),
+        } for k, h in _histograms.items()]
+    return {"counters": counters, "histograms": histograms}
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+def _labels_text(labels, extra=None):
+    items = list(labels.items()) + (list(extra.items()) if extra else [])
+    if not items:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in items)
+    return "{" + body + "}"
+
+def prometheus_text():
+    snap = snapshot()
+    lines = []
+    for name in sorted({c["name"] for c in snap["counters"]}):
+        lines.append(f"# TYPE {name} counter")
+        for c in snap["counters"]:
+            if c["name"] == name:
+                lines.append(f"{name}{_labels_text(c['labels'])} {c['value']}")
+    for name in sorted({h["name"] for h in snap["histograms"]}):
+        lines.append(f"# TYPE {name} histogram")
+        for h in snap["histograms"]:
+            if h["name"] != name:
+                continue
+            cumulative = 0
+            for i, n in enumerate(h["buckets"]):
+                cumulative += n
+                le = str(BUCKETS_MS[i]) if i < len(BUCKETS_MS) else "+Inf"
+                lines.append(f"{name}_bucket{_labels_text(h['labels'], {'le': le})} {cumulative}")
+            lines.append(f"{name}_sum{_labels_text(h['labels'])} {h['sum_ms']}")
+            lines.append(f"{name}_count{_labels_text(h['labels'])} {h['count']}")
+    return "\n".join(lines) + "\n"
+
+def jsonl():
+    ts = time.time()
+    snap = snapshot()
+    rows = [{"ts": ts, "type": "counter", **c} for c in snap["counters"]]
+    rows += [{"ts": ts, "type": "histogram", **h} for h in snap["histograms"]]
+    return "\n".join(json.dumps(r) for r in rows) + ("\n" if rows else "")
+
+def append_jsonl(path, record):
+    line = json.dumps({"ts": time.time(), **record})
+    with _lock, open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
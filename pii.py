@@ -0,0 +1,116 @@
+import re
+
+# =========================
+# CONTACT-DETAIL (PII) SCANNER
+# =========================
+# One precompiled pass for every kind (email, URL, social handle, phone).
+# Each branch starts at a rare trigger character (@ : = . + digit) and the
+# leading lookahead lets the regex engine skip ahead to the next trigger
+# instead of trying every branch at every letter. Context to the left of
+# a trigger (an email's local part, "https", "insta:") is checked only for
+# the few positions that hit.
+TLDS = ["com", "net", "org", "io", "me", "co", "uk", "link", "ly", "gg", "tv", "app", "bio", "page", "xyz", "info"]
+HANDLE_KEYWORDS = ["snapchat", "snap", "instagram", "insta", "ig", "telegram", "tg", "whatsapp", "whats app",
+                   "kik", "signal", "discord", "tiktok", "twitter"]
+KINDS = ["email", "url", "handle", "phone"]
+
+SCAN_RE = re.compile(
+    r"(?=[@:=.+0-9])(?:"
+    r"(?P<at>@[A-Za-z0-9_-]+(?:\.[A-Za-z0-9_-]+)*)"
+    r"|(?P<scheme>://[^\s<>\"']+)"
+    r"|(?P<sep>[:=][ \t]*@?[A-Za-z0-9_.]{2,30})"
+    r"|(?P<dot>\.[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*(?:/[^\s<>\"']*)?)"
+    r"|(?P<phone>\+?\d[\d\s().-]{6,}\d)"
+    r")"
+)
+_LOCAL_RE = re.compile(r"[A-Za-z0-9._%+-]+$")
+_LABEL_RE = re.compile(r"[A-Za-z0-9-]+$")
+_SCHEME_RE = re.compile(r"https?$", re.I)
+_KEYWORD_RE = re.compile(r"(?<![A-Za-z])(?:%s)[ \t]*$" % "|".join(k.replace(" ", "[ \t]?") for k in HANDLE_KEYWORDS), re.I)
+_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+# a digit run only counts as a phone in a phone-like shape: an international
+# prefix (+44, 0044), North American 3-3-4 grouping, or a trunk-0 national
+# number. Year ranges ("2019 - 2023"), thousands ("1.250.000") and bare id
+# runs ("12345678") fit none of them.
+_INTL_RE = re.compile(r"(?:\+|00)[1-9]")
+_PHONE_SHAPE_RE = re.compile(
+    r"(?:1[ .-]?)?\(?\d{3}\)?[ .-]?\d{3}[ .-]?\d{4}(?!\d)"
+    r"|0\d{2,4}[ .-]?\d{3,4}[ .-]?\d{3,4}(?!\d)"
+)
+_TLDS = set(TLDS)
+
+# the phone pattern also spans amounts and id runs; a phone has at least this many digits
+MIN_PHONE_DIGITS = 7
+# how far left of a trigger to look for its context
+LEFT_CONTEXT = 64
+
+def _classify(text, m):
+    # -> (kind, start, end) or None
+    s, e = m.span()
+    kind = m.lastgroup
+    left = text[max(0, s - LEFT_CONTEXT):s]
+    if kind == "at":
+        local = _LOCAL_RE.search(left)
+        if local:
+            domain = m.group()[1:].split(".")
+            if len(domain) > 1 and len(domain[-1]) >= 2 and domain[-1].isalpha():
+                return "email", s - len(local.group()), e
+            return None
+        if len(m.group()) > 2:
+            return "handle", s, e
+        return None
+    if kind == "scheme":
+        scheme = _SCHEME_RE.search(left)
+        return ("url", s - len(scheme.group()), e) if scheme else None
+    if kind == "sep":
+        keyword = _KEYWORD_RE.search(left[-16:])
+        return ("handle", s - len(keyword.group()), e) if keyword else None
+    if kind == "dot":
+        label = _LABEL_RE.search(left)
+        if not label:
+            return None
+        host = m.group().split("/", 1)[0]
+        if label.group().lower() == "www" or host.rsplit(".", 1)[-1].lower() in _TLDS:
+            return "url", s - len(label.group()), e
+        return None
+    digits = sum(ch.isdigit() for ch in m.group())
+    if digits < MIN_PHONE_DIGITS or _DATE_RE.fullmatch(m.group().strip()) or left.endswith("#"):
+        return None
+    if _INTL_RE.match(m.group()):
+        return "phone", s, e
+    # the run can swallow a neighbouring number ("555 123 4567 10am"); keep the phone part
+    shape = _PHONE_SHAPE_RE.match(m.group())
+    return ("phone", s, s + shape.end()) if shape else None
+
+def findings(text):
+    # -> [(kind, start, end)]
+    if not text:
+        return []
+    out = []
+    for m in SCAN_RE.finditer(text):
+        hit = _classify(text, m)
+        if hit:
+            out.append(hit)
+    return out
+
+def kinds(text):
+    return sorted({k for k, _, _ in findings(text)})
+
+def contains(text, only=None):
+    # stops at the first hit; only= restricts to some kinds (e.g. {"phone"})
+    if not text:
+        return False
+    for m in SCAN_RE.finditer(text):
+        hit = _classify(text, m)
+        if hit and (not only or hit[0] in only):
+            return True
+    return False
+
+def redact(text, mask="[hidden]"):
+    for _, start, end in reversed(findings(text)):
+        text = text[:start] + mask + text[end:]
+    return text
+
+def describe(found_kinds):
+    names = {"email": "email addresses", "url": "links", "handle": "social handles", "phone": "phone numbers"}
+    return ", ".join(names[k] for k in found_kinds)
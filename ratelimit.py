@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import perf
+
+# =========================
+# CONFIG (per minute refill, burst = bucket size; rate 0 = unlimited)
+# =========================
+MESSAGE_RATE_PER_MIN = float(os.environ.get("CN_MESSAGE_RATE_PER_MIN", "6"))
+MESSAGE_BURST = float(os.environ.get("CN_MESSAGE_BURST", "10"))
+PROFILE_WRITE_RATE_PER_MIN = float(os.environ.get("CN_PROFILE_WRITE_RATE_PER_MIN", "6"))
+PROFILE_WRITE_BURST = float(os.environ.get("CN_PROFILE_WRITE_BURST", "10"))
+SIGNUP_RATE_PER_MIN = float(os.environ.get("CN_SIGNUP_RATE_PER_MIN", "1"))
+SIGNUP_BURST = float(os.environ.get("CN_SIGNUP_BURST", "3"))
+# all sessions together: new sessions are free, so per-session alone is not enough
+SIGNUP_GLOBAL_RATE_PER_MIN = float(os.environ.get("CN_SIGNUP_GLOBAL_RATE_PER_MIN", "30"))
+SIGNUP_GLOBAL_BURST = float(os.environ.get("CN_SIGNUP_GLOBAL_BURST", "60"))
+# admin key attempts, per profile
+ADMIN_KEY_RATE_PER_MIN = float(os.environ.get("CN_ADMIN_KEY_RATE_PER_MIN", "2"))
+ADMIN_KEY_BURST = float(os.environ.get("CN_ADMIN_KEY_BURST", "5"))
+MAX_KEYS = int(os.environ.get("CN_RATE_LIMIT_MAX_KEYS", "50000"))
+
+# =========================
+# TOKEN BUCKETS
+# =========================
+class TokenBucketLimiter:
+    # One bucket per key: up to `burst` tokens, refilled continuously at
+    # rate_per_min. Buckets sit in an OrderedDict in last-use order, so the
+    # front is always the idlest: a bucket idle long enough to be full again
+    # is the same as no bucket and is dropped from the front, and beyond
+    # max_keys the idlest bucket goes (that key just starts full again).
+    # Every operation is O(1) amortized and memory is bounded by max_keys.
+    def __init__(self, name, rate_per_min, burst, max_keys=MAX_KEYS, clock=time.monotonic):
+        self.name = name
+        self.rate = rate_per_min / 60.0
+        self.burst = float(burst)
+        self.max_keys = max_keys
+        self.clock = clock
+        self.refill_seconds = self.burst / self.rate if self.rate > 0 else 0.0
+        self._buckets = OrderedDict()  # key -> (tokens, last update)
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.throttled = 0
+        self.evicted = 0
+
+    def acquire(self, key, cost=1.0):
+        # -> 0.0 if allowed (tokens spent), else seconds until it would be
+        if self.rate <= 0:
+            return 0.0
+        now = self.clock()
+        with self._lock:
+            while self._buckets:
+                oldest = next(iter(self._buckets.values()))
+                if now - oldest[1] < self.refill_seconds:
+                    break
+                self._buckets.popitem(last=False)
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+                self.allowed += 1
+            else:
+                wait = (cost - tokens) / self.rate
+                self.throttled += 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evicted += 1
+        perf.incr("cn_rate_limit_total", limiter=self.name, result="throttled" if wait else "allowed")
+        return wait
+
+    def stats(self):
+        with self._lock:
+            keys = len(self._buckets)
+        return {
+            "limiter": self.name,
+            "per_min": round(self.rate * 60, 2),
+            "burst": self.burst,
+            "keys": keys,
+            "allowed": self.allowed,
+            "throttled": self.throttled,
+            "evicted": self.evicted,
+        }
+
+messages = TokenBucketLimiter("messages", MESSAGE_RATE_PER_MIN, MESSAGE_BURST)            # by sender profile id
+profile_writes = TokenBucketLimiter("profile_writes", PROFILE_WRITE_RATE_PER_MIN, PROFILE_WRITE_BURST)  # by profile id
+signups = TokenBucketLimiter("signups", SIGNUP_RATE_PER_MIN, SIGNUP_BURST)                  # by session id
+signups_global = TokenBucketLimiter("signups_global", SIGNUP_GLOBAL_RATE_PER_MIN, SIGNUP_GLOBAL_BURST, max_keys=1)
+admin_keys = TokenBucketLimiter("admin_keys", ADMIN_KEY_RATE_PER_MIN, ADMIN_KEY_BURST)         # by profile id
+LIMITERS = [messages, profile_writes, signups, signups_global, admin_keys]
+
+def signup_wait(session_key):
+    # per-session first, so one noisy session does not spend the shared budget
+    return signups.acquire(session_key) or signups_global.acquire("*")
+
+def stats():
+    return [lim.stats() for lim in LIMITERS]
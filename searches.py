@@ -0,0 +1,196 @@
+import json
+import os
+import threading
+import time
+
+import geo
+import perf
+from storage import (
+    CACHED_COLUMNS,
+    ack_changes,
+    add_notifications,
+    change_cursor,
+    consume_changes,
+    latest_change_seq,
+    mask_tags,
+    profile_locations,
+    read_profile_cards,
+    save_search,
+    saved_searches_for_keys,
+    tag_mask,
+)
+from vocab import AGENCY_SERVICES, CONTENT_TYPES
+
+CONSUMER = "saved_searches"
+# change batches handled per app rerun; the maintenance worker drains fully
+APP_MAX_BATCHES = 2
+# reruns check the log at most this often per process; negative leaves all
+# matching to `maintenance.py searches --follow`
+APP_INTERVAL_SECONDS = float(os.environ.get("CN_SEARCH_APP_INTERVAL_SECONDS", "5"))
+
+# Browse filter -> access key kind, most selective first
+KEYED_FILTERS = [
+    ("content_types", "content"),
+    ("services", "service"),
+    ("personalities", "personality"),
+    ("payment_models", "payment"),
+]
+
+_lock = threading.Lock()
+_next_app_check = 0.0
+
+# =========================
+# SPEC + ACCESS KEYS
+# =========================
+# A saved search is the Browse arguments plus the owner's resolved location
+# at save time. It is indexed under the keys a profile must carry to match
+# it: the values of one conjunct (the most selective one present). A changed
+# profile probes with all of its own keys, so only searches it could satisfy
+# are evaluated in full.
+def search_spec(q, only_verified, loc, filters):
+    loc_filter, my_loc, radius_km = loc
+    spec = {"q": q.strip(), "verified": bool(only_verified), "filters": {k: sorted(v) for k, v in filters.items() if v}}
+    # same rule as Browse: an unresolvable viewer location means "anywhere"
+    if loc_filter == "Same city" and my_loc.city_id:
+        spec["loc"] = {"filter": loc_filter, "city_id": my_loc.city_id}
+    elif loc_filter == "Same country" and my_loc.country_code:
+        spec["loc"] = {"filter": loc_filter, "country": my_loc.country_code}
+    elif loc_filter == "Within distance" and my_loc.lat is not None:
+        spec["loc"] = {"filter": loc_filter, "lat": my_loc.lat, "lon": my_loc.lon, "radius_km": radius_km}
+    return spec
+
+def search_keys(target_type, spec):
+    for name, kind in KEYED_FILTERS:
+        if spec["filters"].get(name):
+            return [f"{target_type}|{kind}:{v}" for v in spec["filters"][name]]
+    loc = spec.get("loc") or {}
+    if loc.get("filter") == "Same city":
+        return [f"{target_type}|city:{loc['city_id']}"]
+    if loc.get("filter") == "Same country":
+        return [f"{target_type}|country:{loc['country']}"]
+    if spec["verified"]:
+        return [f"{target_type}|verified"]
+    return [f"{target_type}|any"]
+
+def profile_keys(p, loc):
+    t = p["account_type"]
+    keys = [f"{t}|any"]
+    if int(p["verified"]) == 1:
+        keys.append(f"{t}|verified")
+    keys += [f"{t}|content:{v}" for v in mask_tags(p["creator_content_mask"], CONTENT_TYPES)]
+    keys += [f"{t}|service:{v}" for v in mask_tags(p["agency_services_mask"], AGENCY_SERVICES)]
+    if p["creator_personality"]:
+        keys.append(f"{t}|personality:{p['creator_personality']}")
+    if p["agency_payment_model"]:
+        keys.append(f"{t}|payment:{p['agency_payment_model']}")
+    if loc.city_id:
+        keys.append(f"{t}|city:{loc.city_id}")
+    if loc.country_code:
+        keys.append(f"{t}|country:{loc.country_code}")
+    return keys
+
+def _row_matches(spec, target_type, p):
+    # filter_profiles() for a single card row; a pandas pass per (search,
+    # profile) pair would cost more than the full re-scan this replaces
+    if p["account_type"] != target_type:
+        return False
+    if spec["verified"] and int(p["verified"]) != 1:
+        return False
+    q = spec["q"].lower()
+    if q and not any(q in str(p[k]).lower() for k in ("display_name", "niche", "location_current")):
+        return False
+    f = spec["filters"]
+    if f.get("services") and not int(p["agency_services_mask"]) & tag_mask(f["services"], AGENCY_SERVICES):
+        return False
+    if f.get("payment_models") and p["agency_payment_model"] not in f["payment_models"]:
+        return False
+    if f.get("personalities") and p["creator_personality"] not in f["personalities"]:
+        return False
+    if f.get("content_types") and not int(p["creator_content_mask"]) & tag_mask(f["content_types"], CONTENT_TYPES):
+        return False
+    return True
+
+def _location_ok(spec_loc, loc):
+    if not spec_loc:
+        return True
+    if spec_loc["filter"] == "Same city":
+        return loc.city_id == spec_loc["city_id"]
+    if spec_loc["filter"] == "Same country":
+        return loc.country_code == spec_loc["country"]
+    if loc.lat is None:
+        return False
+    return geo.haversine_km(spec_loc["lat"], spec_loc["lon"], loc.lat, loc.lon) <= spec_loc["radius_km"]
+
+def create_search(owner_id, label, target_type, q="", only_verified=False, loc=(None, geo.EMPTY_LOCATION, 100), **filters):
+    spec = search_spec(q, only_verified, loc, filters)
+    # the first saved search starts the consumer at the head of the log
+    if not change_cursor(CONSUMER):
+        ack_changes(CONSUMER, latest_change_seq())
+    return save_search(owner_id, label.strip() or "Saved search", target_type, json.dumps(spec), search_keys(target_type, spec))
+
+# =========================
+# CONTINUOUS MATCHING (consumer of the change log)
+# =========================
+def match_changes(changes):
+    # -> notifications inserted for this batch of change rows
+    last_seq = {}
+    for c in changes:
+        if c["op"] == "insert" or "*" in c["columns"] or CACHED_COLUMNS.intersection(c["columns"]):
+            last_seq[c["entity_id"]] = c["seq"]
+    if not last_seq:
+        return 0
+
+    with perf.span("searches.match"):
+        cards = read_profile_cards()
+        cards = {p["id"]: p for p in cards[cards["id"].isin(last_seq)].to_dict("records")}
+        locs = {r[0]: geo.Location(*r[1:]) for r in profile_locations(list(last_seq))}
+
+        probes = {}
+        for pid, p in cards.items():
+            for k in profile_keys(p, locs.get(pid, geo.EMPTY_LOCATION)):
+                probes.setdefault(k, set()).add(pid)
+
+        searches = {}
+        for sid, owner_id, label, target_type, spec, since_seq, key in saved_searches_for_keys(list(probes)):
+            s = searches.setdefault(sid, {"owner_id": owner_id, "label": label, "target_type": target_type,
+                                          "spec": spec, "since_seq": since_seq, "candidates": set()})
+            s["candidates"] |= probes[key]
+
+        rows = []
+        for sid, s in searches.items():
+            spec = json.loads(s["spec"])
+            for pid in sorted(s["candidates"]):
+                if pid == s["owner_id"] or last_seq[pid] <= s["since_seq"]:
+                    continue
+                p = cards[pid]
+                if _row_matches(spec, s["target_type"], p) and _location_ok(spec.get("loc"), locs.get(pid, geo.EMPTY_LOCATION)):
+                    name = (p["agency_name"] if p["account_type"] == "Agency" else "") or p["display_name"]
+                    rows.append((s["owner_id"], "search_match", sid, int(pid), f"New match for \"{s['label']}\": {name}"))
+        perf.incr("cn_search_candidates_total", value=sum(len(s["candidates"]) for s in searches.values()))
+    return add_notifications(rows)
+
+def process_pending(max_batches=APP_MAX_BATCHES):
+    # Cheap when idle (cursor + one indexed range read). Concurrent callers in
+    # one process skip instead of waiting; across processes a replayed batch
+    # is harmless because notifications are unique per (owner, search, profile).
+    if not _lock.acquire(blocking=False):
+        return 0
+    try:
+        if not change_cursor(CONSUMER):
+            return 0  # nothing saved yet
+        return consume_changes(CONSUMER, match_changes, entities=["profile"], max_batches=max_batches)
+    finally:
+        _lock.release()
+
+def process_pending_from_app():
+    # Called on every rerun: throttled per process, and batches are read only
+    # when the log has moved past the cursor (two point reads otherwise).
+    global _next_app_check
+    now = time.monotonic()
+    if APP_INTERVAL_SECONDS < 0 or now < _next_app_check:
+        return 0
+    _next_app_check = now + APP_INTERVAL_SECONDS
+    cursor = change_cursor(CONSUMER)
+    if not cursor or latest_change_seq() <= cursor:
+        return 0
+    return process_pending()
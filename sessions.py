@@ -0,0 +1,111 @@
+import hashlib
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+import perf
+from storage import create_session, delete_session, extend_session, get_session
+
+# =========================
+# CONFIG
+# =========================
+SESSION_TTL_HOURS = float(os.environ.get("CN_SESSION_TTL_HOURS", "720"))
+# how long a worker trusts its cached copy before re-reading the row
+# (bounds how late a sign-out elsewhere is noticed by this process)
+CACHE_SECONDS = float(os.environ.get("CN_SESSION_CACHE_SECONDS", "60"))
+MAX_CACHED = int(os.environ.get("CN_SESSION_CACHE_MAX", "50000"))
+COOKIE = "cn_session"  # the browser keeps its token in a first-party cookie
+# Older links carried the token in the URL (?s=...). Such a token is still
+# honoured once, then swapped for a fresh one and stripped: URLs end up in
+# history, server logs and Referer headers.
+QUERY_PARAM = "s"
+
+# =========================
+# SIGN-IN SESSIONS
+# =========================
+# A token is handed out at the end of onboarding; the database stores only
+# its hash with the identity summary the app needs on every run (profile id,
+# display name, role). A new Streamlit session (reload, server restart)
+# resolves the token once: from this process's cache, else one primary-key
+# read. After that st.session_state holds the identity and reruns query
+# nothing. Expiry slides: a session used in the second half of its TTL is
+# pushed out by a full TTL (at most one write per half TTL).
+_cache = OrderedDict()  # token hash -> (summary, expires, trusted until)
+_lock = threading.Lock()
+
+def _hash(token):
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def _remember(key, summary, expires, now):
+    with _lock:
+        _cache.pop(key, None)
+        _cache[key] = (summary, expires, min(expires, now + CACHE_SECONDS))
+        while len(_cache) > MAX_CACHED:
+            _cache.popitem(last=False)
+
+def create(profile_id, display_name, role, admin=False):
+    # admin: granted by the app after checking the operator's key, never by name
+    token = secrets.token_urlsafe(24)
+    summary = {"profile_id": int(profile_id), "display_name": display_name, "role": role}
+    if admin:
+        summary["admin"] = True
+    now = time.time()
+    expires = now + SESSION_TTL_HOURS * 3600
+    create_session(_hash(token), int(profile_id), summary, expires)
+    _remember(_hash(token), summary, expires, now)
+    perf.incr("cn_sessions_total", op="create")
+    return token
+
+def resolve(token):
+    # -> identity summary dict, or None if the token is unknown or expired
+    if not token or not isinstance(token, str):
+        return None
+    key = _hash(token)
+    now = time.time()
+    with _lock:
+        hit = _cache.get(key)
+        if hit is not None and hit[2] > now:
+            _cache.move_to_end(key)
+        else:
+            hit = None
+    if hit is not None:
+        perf.incr("cn_sessions_total", op="resolve", result="cache")
+        return hit[0]
+
+    row = get_session(key)
+    if row is None:
+        with _lock:
+            _cache.pop(key, None)
+        perf.incr("cn_sessions_total", op="resolve", result="unknown")
+        return None
+    summary, expires = row
+    if expires - now < SESSION_TTL_HOURS * 1800:
+        expires = now + SESSION_TTL_HOURS * 3600
+        extend_session(key, expires)
+    _remember(key, summary, expires, now)
+    perf.incr("cn_sessions_total", op="resolve", result="db")
+    return summary
+
+def rotate(token):
+    # -> (summary, new token) for a valid token, which stops working; (None, None) otherwise
+    summary = resolve(token)
+    if summary is None:
+        return None, None
+    fresh = create(summary["profile_id"], summary["display_name"], summary["role"], summary.get("admin", False))
+    revoke(token)
+    return summary, fresh
+
+def revoke(token):
+    if not token:
+        return
+    key = _hash(token)
+    with _lock:
+        _cache.pop(key, None)
+    delete_session(key)
+    perf.incr("cn_sessions_total", op="revoke")
+
+def stats():
+    with _lock:
+        return {"cached": len(_cache), "cap": MAX_CACHED}
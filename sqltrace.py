@@ -0,0 +1,231 @@
+import importlib.util
+import logging
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+log = logging.getLogger("creator_network.sql")
+
+# Per-statement rolling window used for p50/p95/p99
+ROLLING_SAMPLES = 512
+SLOW_QUERY_MS = 100.0
+
+_lock = threading.Lock()
+_table = {}  # normalized sql -> stats dict
+
+# Frames from these files are never reported as the "calling helper"
+_SKIP_FILES = {str(Path(__file__).resolve())}
+_SKIP_DIRS = (str(Path(sqlite3.__file__).resolve().parent),)
+# located without importing it: pandas is loaded lazily (first tabular screen)
+_pd_spec = importlib.util.find_spec("pandas")
+if _pd_spec is not None:
+    _SKIP_DIRS += (str(Path(_pd_spec.origin).resolve().parent),)
+
+# =========================
+# STATEMENT NORMALIZATION
+# =========================
+_WS_RE = re.compile(r"\s+")
+_NUM_RE = re.compile(r"\b\d+(\.\d+)?\b")
+_STR_RE = re.compile(r"'(?:[^']|'')*'")
+_IN_RE = re.compile(r"\bIN\s*\(\s*\?(\s*,\s*\?)+\s*\)", re.I)
+
+def normalize_sql(sql):
+    sql = _STR_RE.sub("?", sql)
+    sql = _NUM_RE.sub("?", sql)
+    sql = _IN_RE.sub("IN (?...)", sql)
+    return _WS_RE.sub(" ", sql).strip()
+
+def params_shape(params):
+    if params is None:
+        return "()"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}:{type(v).__name__}" for k, v in params.items()) + "}"
+    return "(" + ", ".join(type(v).__name__ for v in params) + ")"
+
+# decorator wrappers and the storage backends' generic query plumbing
+_SKIP_NAMES = {"inner", "<module>", "fetch_df", "fetch_all", "connection", "__enter__", "__exit__"}
+
+def _caller():
+    f = sys._getframe(1)
+    while f is not None:
+        fn = f.f_code.co_filename
+        if fn not in _SKIP_FILES and not fn.startswith(_SKIP_DIRS) and f.f_code.co_name not in _SKIP_NAMES:
+            return f.f_code.co_name
+        f = f.f_back
+    return "<module>"
+
+# =========================
+# ROLLING TABLE
+# =========================
+def record(sql, ms, rows, shape, caller, threshold_ms=None):
+    key = normalize_sql(sql)
+    threshold_ms = SLOW_QUERY_MS if threshold_ms is None else threshold_ms
+    with _lock:
+        st = _table.get(key)
+        if st is None:
+            st = _table[key] = {"samples": deque(maxlen=ROLLING_SAMPLES), "calls": 0, "rows": 0, "slow": 0, "callers": set()}
+        st["samples"].append(ms)
+        st["calls"] += 1
+        st["rows"] += rows
+        st["callers"].add(caller)
+        if ms >= threshold_ms:
+            st["slow"] += 1
+    if ms >= threshold_ms:
+        log.warning("slow query %.1f ms rows=%d params=%s caller=%s sql=%s", ms, rows, shape, caller, key)
+
+def _pct(sorted_samples, q):
+    if not sorted_samples:
+        return 0.0
+    i = min(len(sorted_samples) - 1, int(round(q * (len(sorted_samples) - 1))))
+    return sorted_samples[i]
+
+def stats():
+    with _lock:
+        items = [(k, list(v["samples"]), v["calls"], v["rows"], v["slow"], sorted(v["callers"])) for k, v in _table.items()]
+    out = []
+    for sql, samples, calls, rows, slow, callers in items:
+        samples.sort()
+        out.append({
+            "sql": sql,
+            "calls": calls,
+            "rows": rows,
+            "slow": slow,
+            "p50_ms": round(_pct(samples, 0.50), 3),
+            "p95_ms": round(_pct(samples, 0.95), 3),
+            "p99_ms": round(_pct(samples, 0.99), 3),
+            "callers": ", ".join(callers),
+        })
+    out.sort(key=lambda r: -r["p95_ms"])
+    return out
+
+def reset():
+    with _lock:
+        _table.clear()
+
+# =========================
+# CONNECTION / CURSOR WRAPPERS
+# =========================
+class TracedCursor(sqlite3.Cursor):
+    # SQLite steps lazily, so a statement's latency is execute() plus every fetch
+    _pending = None
+
+    def _begin(self, sql, params, many=False):
+        self._finish()
+        self._pending = {
+            "sql": sql,
+            "shape": ("many:" if many else "") + params_shape(params),
+            "caller": _caller(),
+            "ms": 0.0,
+            "rows": 0,
+        }
+
+    def _finish(self):
+        p = self._pending
+        if p is None:
+            return
+        self._pending = None
+        rows = p["rows"] if p["rows"] else max(self.rowcount, 0)
+        record(p["sql"], p["ms"], rows, p["shape"], p["caller"], self.connection.slow_query_ms)
+
+    def _timed(self, fn, *args):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            if self._pending is not None:
+                self._pending["ms"] += (time.perf_counter() - t0) * 1000
+
+    def execute(self, sql, params=()):
+        self._begin(sql, params)
+        self._timed(super().execute, sql, params)
+        if self.description is None:
+            self._finish()  # DML/DDL is complete once execute() returns
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        self._begin(sql, seq_of_params[0] if seq_of_params else None, many=True)
+        self._timed(super().executemany, sql, seq_of_params)
+        self._finish()
+        return self
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        elif self._pending is not None:
+            self._pending["rows"] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        if self._pending is not None:
+            self._pending["rows"] += len(rows)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self._pending is not None:
+            self._pending["rows"] += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        if self._pending is not None:
+            self._pending["rows"] += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # cursors from conn.execute(...).fetchone() are dropped, not closed
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+class TracedConnection(sqlite3.Connection):
+    # sqlite3.connect(..., factory=TracedConnection)
+    slow_query_ms = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._user_trace = None
+        super().set_trace_callback(self._on_trace)
+
+    def set_trace_callback(self, fn):
+        # SQLite allows one trace callback per connection; chain the caller's
+        self._user_trace = fn
+
+    def _on_trace(self, sql):
+        if self._user_trace is not None:
+            self._user_trace(sql)
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def executescript(self, script):
+        t0 = time.perf_counter()
+        try:
+            return super().executescript(script)
+        finally:
+            record(script, (time.perf_counter() - t0) * 1000, 0, "script", _caller(), self.slow_query_ms)
@@ -0,0 +1,1656 @@
+import hashlib
+import io
+import json
+import os
+import re
+import sqlite3
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import cache
+import geo
+import perf
+import pii
+import sqltrace
+import writer
+from vocab import (
+    ACCOUNT_TYPES,
+    AGENCY_SERVICES,
+    COMMISSION_BANDS,
+    CONTENT_TYPES,
+    EARNINGS_BANDS,
+    FEE_BANDS,
+    PAYMENT_MODELS,
+    PERSONALITY_TYPES,
+)
+
+# =========================
+# CONFIG
+# =========================
+DATA_DIR = Path(os.environ.get("CN_DATA_DIR", "data"))
+DB_PATH = DATA_DIR / "app.db"
+UPLOAD_DIR = DATA_DIR / "uploads"
+CACHE_DIR = DATA_DIR / "cache"
+
+# Storage backend: empty = SQLite at DB_PATH, "postgresql://..." = PostgreSQL,
+# "pgserver:///some/dir" = embedded PostgreSQL stand-in (see storage_pg.py)
+DATABASE_URL = os.environ.get("CN_DATABASE_URL", "")
+
+# Bump whenever init_schema's DDL changes: a database at an older version runs
+# the (idempotent) DDL once and records the new one (SQLite: PRAGMA
+# user_version, Postgres: meta.schema_version); later starts only read it
+SCHEMA_VERSION = 1
+
+# Multi-process mode: "host:port" of the single write coordinator (writer.py)
+WRITER_ADDRESS = os.environ.get("CN_WRITER_ADDRESS", "")
+
+# Opt-in SQL tracing: per-statement latency table + slow-query log
+SQL_TRACE = os.environ.get("CN_SQL_TRACE", "") not in ("", "0")
+SLOW_QUERY_MS = float(os.environ.get("CN_SLOW_QUERY_MS", "100"))
+
+# Memory cap for the in-process Browse result cache (per worker)
+RESULT_CACHE_MB = float(os.environ.get("CN_RESULT_CACHE_MB", "64"))
+
+# Profile columns behind the analytics distributions (rollup_totals)
+ROLLUP_COLUMNS = ["account_type", "creator_earnings_band", "agency_payment_model", "verified", "selfie_uploaded"]
+
+# Free text scanned for contact details on every write (pii.py), per entity
+PII_FIELDS = {
+    "profile": ["bio", "agency_success_story", "agency_payment_other"],
+    "message": ["body"],
+}
+# back-scan sources per entity: archived messages keep their ids and their flags
+PII_TABLES = {"profile": ["profiles"], "message": ["messages", "messages_archive"]}
+
+# Messages older than this move to messages_archive (whole calendar months);
+# inbox pages read the hot table first and only reach the archive past its end
+MESSAGE_HOT_DAYS = float(os.environ.get("CN_MESSAGE_HOT_DAYS", "180"))
+ARCHIVE_BATCH = 500  # ~30 ms write transaction each on SQLite
+INBOX_PAGE = 12
+MESSAGE_SEARCH_PAGE = 10
+MESSAGE_SEARCH_MAX_TERMS = 8
+
+# Verification review queue: profiles.verified is 0 pending / 1 verified / -1 rejected
+VERIFIED, VERIFICATION_REJECTED = 1, -1
+REVIEW_PAGE = 24
+IDS_PER_STATEMENT = 500
+THUMB_PX = 160
+
+# Change log: rows per consumer batch, and age before compaction may drop/collapse rows
+CHANGES_BATCH = 500
+CHANGES_RETENTION_HOURS = float(os.environ.get("CN_CHANGES_RETENTION_HOURS", "168"))
+
+DATA_DIR.mkdir(parents=True, exist_ok=True)
+UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+
+LOCATION_COLUMNS = {
+    "loc_city_id": "TEXT",
+    "loc_country": "TEXT",
+    "loc_lat": "REAL",
+    "loc_lon": "REAL",
+    "home_city_id": "TEXT",
+    "home_country": "TEXT",
+}
+
+# What a Browse card / compose list needs; long free text and photos are
+# fetched per profile on demand (get_profile_by_id)
+CARD_COLUMNS = [
+    "id", "account_type", "display_name", "created", "updated_at",
+    "niche", "location_current", "verified", "selfie_uploaded",
+    "creator_personality", "creator_content_types", "creator_earnings_band",
+    "agency_name", "agency_website", "agency_services", "agency_payment_model",
+    "agency_fee_band", "agency_commission_band",
+]
+BIO_EXCERPT = 240
+
+# Compact card frame: enumerations as categoricals (int8 codes, "" = unset),
+# csv tag lists as bitmasks over their vocabulary, flags as int8
+CARD_CATEGORIES = {
+    "account_type": ACCOUNT_TYPES,
+    "creator_personality": PERSONALITY_TYPES,
+    "creator_earnings_band": EARNINGS_BANDS,
+    "agency_payment_model": PAYMENT_MODELS,
+    "agency_fee_band": FEE_BANDS,
+    "agency_commission_band": COMMISSION_BANDS,
+}
+CARD_MASKS = {
+    "creator_content_types": ("creator_content_mask", CONTENT_TYPES),
+    "agency_services": ("agency_services_mask", AGENCY_SERVICES),
+}
+CARD_FLAGS = ["verified", "selfie_uploaded"]
+
+# Browse-card frame shared across reruns, sessions and worker processes;
+# the name carries the column list so a changed projection never reuses old pickles
+profiles_snapshot = cache.ArrowSnapshotCache(CACHE_DIR, f"profile_cards-{zlib.crc32(','.join(CARD_COLUMNS).encode()):08x}")
+# Browse pages, facet counts and location lookups, valid for one profiles version
+result_cache = cache.ResultCache("browse", int(RESULT_CACHE_MB * 1024 * 1024))
+
+# Columns behind the shared card snapshot, result cache and location
+# lookups; patches touching only other columns (photos, links, long text
+# shown on the detail view) leave those caches valid
+CACHED_COLUMNS = {*CARD_COLUMNS, "bio", "location_current", "location_hometown", *LOCATION_COLUMNS} - {"updated_at"}
+
+# Multi-valued csv columns mirrored into the indexed profile_tags table
+TAG_FIELDS = {
+    "content": "creator_content_types",
+    "service": "agency_services",
+    "specialty": "agency_content_specialties",
+}
+
+def _csv_join(x):
+    if not x:
+        return ""
+    if isinstance(x, str):
+        return x
+    return ",".join([str(i) for i in x])
+
+def _csv_split(x):
+    if not x:
+        return []
+    return [i.strip() for i in str(x).split(",") if i.strip()]
+
+# letters/digits runs, the same split as the FTS5 unicode61 tokenizer
+_TERM_RE = re.compile(r"[^\W_]+")
+
+def search_terms(text):
+    # words of a message search box, lowercased; the last one is a prefix
+    return _TERM_RE.findall((text or "").lower())[:MESSAGE_SEARCH_MAX_TERMS]
+
+def scoped_tokens(sender_id, receiver_id, body):
+    # every word once per participant ("p12xoffer"): a search for one profile
+    # reads only that profile's postings, however common the word is overall
+    terms = _TERM_RE.findall((body or "").lower())
+    owners = dict.fromkeys([int(sender_id), int(receiver_id)])
+    return " ".join(f"p{pid}x{t}" for pid in owners for t in terms)
+
+def message_snippet(body, terms, width=16):
+    # ~width words around the first hit, hits in bold
+    words = (body or "").split()
+    hit = lambda w: any(t.startswith(q) if i == len(terms) - 1 else t == q
+                        for t in _TERM_RE.findall(w.lower()) for i, q in enumerate(terms))
+    first = next((i for i, w in enumerate(words) if hit(w)), 0)
+    start = max(0, min(first - width // 3, len(words) - width))
+    out = [f"**{w}**" if hit(w) else w for w in words[start:start + width]]
+    return ("… " if start else "") + " ".join(out) + (" …" if start + width < len(words) else "")
+
+def tag_mask(tags, vocab):
+    bits = 0
+    for t in tags:
+        if t in vocab:
+            bits |= 1 << vocab.index(t)
+    return bits
+
+def mask_tags(mask, vocab):
+    mask = int(mask or 0)
+    return [t for i, t in enumerate(vocab) if mask >> i & 1]
+
+def _mask_dtype(vocab):
+    return "int16" if len(vocab) <= 15 else "int32" if len(vocab) <= 31 else "int64"
+
+def compact_cards(df):
+    import pandas as pd
+
+    out = pd.DataFrame(index=df.index)
+    for col in df.columns:
+        s = df[col]
+        if col == "id":
+            out[col] = s.astype("int32")
+        elif col in CARD_FLAGS:
+            out[col] = s.fillna(0).astype("int8")
+        elif col in CARD_CATEGORIES:
+            # values outside the vocabulary (older data) are kept as extra categories
+            vocab = ["", *CARD_CATEGORIES[col]]
+            s = s.fillna("").astype(object)
+            extra = sorted(set(s.unique()) - set(vocab))
+            out[col] = pd.Categorical(s, categories=vocab + extra)
+        elif col in CARD_MASKS:
+            name, vocab = CARD_MASKS[col]
+            out[name] = s.map(lambda x: tag_mask(_csv_split(x), vocab)).astype(_mask_dtype(vocab))
+        else:
+            out[col] = s.fillna("").astype(pd.StringDtype("pyarrow"))
+    return out
+
+def _profile_totals(p):
+    # (metric, key) pairs one profile contributes to rollup_totals
+    out = [("profiles", p["account_type"])]
+    if p["account_type"] == "Creator":
+        out.append(("earnings_band", p.get("creator_earnings_band") or ""))
+        if int(p.get("verified") or 0) == VERIFIED:
+            out.append(("verification", "verified"))
+        elif int(p.get("verified") or 0) == VERIFICATION_REJECTED:
+            out.append(("verification", "rejected"))
+        elif int(p.get("selfie_uploaded") or 0) == 1:
+            out.append(("verification", "pending"))
+        else:
+            out.append(("verification", "no selfie"))
+    else:
+        out.append(("payment_model", p.get("agency_payment_model") or ""))
+    return out
+
+def _location_columns(location_current, location_hometown):
+    cur = geo.normalize_location(location_current)
+    home = geo.normalize_location(location_hometown)
+    return {
+        "loc_city_id": cur.city_id,
+        "loc_country": cur.country_code,
+        "loc_lat": cur.lat,
+        "loc_lon": cur.lon,
+        "home_city_id": home.city_id,
+        "home_country": home.country_code,
+    }
+
+def _like(q):
+    q = q.strip().lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{q}%"
+
+# =========================
+# STORE INTERFACE
+# =========================
+# Profiles, messages, tags and search. SQL shared by every backend is
+# written once here with "?" placeholders; backends translate them and
+# override schema, id generation and anything dialect-specific.
+class Store:
+    name = "base"
+    placeholder = "?"
+
+    def sql(self, q):
+        return q if self.placeholder == "?" else q.replace("?", self.placeholder)
+
+    def connect(self):
+        raise NotImplementedError
+
+    @contextmanager
+    def connection(self):
+        conn = self.connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def fetch_df(self, q, params=()):
+        import pandas as pd
+
+        with self.connection() as conn:
+            return pd.read_sql_query(self.sql(q), conn, params=params)
+
+    def fetch_all(self, q, params=()):
+        with self.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self.sql(q), params)
+            return cur.fetchall()
+
+    # --- schema / versions
+    def init_schema(self):
+        raise NotImplementedError
+
+    def get_version(self, cur, key):
+        cur.execute(self.sql("SELECT value FROM meta WHERE key = ?"), (key,))
+        row = cur.fetchone()
+        return row[0] if row else 0
+
+    def bump_version(self, cur, key):
+        cur.execute(self.sql("UPDATE meta SET value = value + 1 WHERE key = ?"), (key,))
+        return self.get_version(cur, key)
+
+    # --- profiles
+    def read_profiles(self):
+        return self.fetch_df("SELECT * FROM profiles ORDER BY created DESC")
+
+    def read_profile_cards(self):
+        # one extra char so the card knows whether to add "..."
+        return self.fetch_df(f"""
+            SELECT {", ".join(CARD_COLUMNS)}, substr(trim(bio), 1, {BIO_EXCERPT + 1}) AS bio_excerpt
+            FROM profiles
+            ORDER BY created DESC
+        """)
+
+    def get_profile_by_id(self, pid):
+        return self.fetch_df("SELECT * FROM profiles WHERE id = ?", (pid,))
+
+    def get_profile_by_display_name(self, display_name, account_type):
+        return self.fetch_df("""
+            SELECT * FROM profiles
+            WHERE display_name = ? AND account_type = ?
+            ORDER BY created DESC
+            LIMIT 1
+        """, (display_name, account_type))
+
+    def get_profile_id(self, display_name, account_type):
+        rows = self.fetch_all("""
+            SELECT id FROM profiles
+            WHERE display_name = ? AND account_type = ?
+            ORDER BY created DESC
+            LIMIT 1
+        """, (display_name, account_type))
+        return rows[0][0] if rows else None
+
+    def insert_row(self, cur, table, cols, vals):
+        # -> id of the new row
+        raise NotImplementedError
+
+    def insert_profile_row(self, cur, cols, vals):
+        return self.insert_row(cur, "profiles", cols, vals)
+
+    def index_profile(self, cur, pid, payload):
+        # secondary structures kept in the same transaction as the row
+        for kind, field in TAG_FIELDS.items():
+            if field not in payload:
+                continue
+            cur.execute(self.sql("DELETE FROM profile_tags WHERE profile_id = ? AND kind = ?"), (pid, kind))
+            for tag in dict.fromkeys(_csv_split(payload[field])):
+                cur.execute(self.sql("INSERT INTO profile_tags (profile_id, kind, tag) VALUES (?, ?, ?)"), (pid, kind, tag))
+
+    def upsert_profile(self, payload):
+        with self.connection() as conn:
+            c = conn.cursor()
+
+            # "identity" = display_name + type
+            c.execute(
+                self.sql(f"SELECT id, {', '.join(ROLLUP_COLUMNS)} FROM profiles WHERE display_name = ? AND account_type = ?"),
+                (payload["display_name"], payload["account_type"])
+            )
+            existing = c.fetchone()
+            old = dict(zip(ROLLUP_COLUMNS, existing[1:])) if existing else None
+
+            cols = list(payload.keys())
+            vals = [payload[k] for k in cols]
+
+            if existing:
+                # identity and the original creation time never change on update
+                keep = ("account_type", "display_name", "created")
+                sets = ", ".join([f"{k}=?" for k in cols if k not in keep])
+                vals2 = [payload[k] for k in cols if k not in keep]
+                vals2.append(existing[0])
+                c.execute(self.sql(f"UPDATE profiles SET {sets} WHERE id=?"), vals2)
+                pid = existing[0]
+                self.log_change(c, "profile", pid, "update", [k for k in cols if k not in keep])
+            else:
+                pid = self.insert_profile_row(c, cols, vals)
+                self.log_change(c, "profile", pid, "insert", cols)
+            self.flag_pii(c, "profile", pid, payload, fresh=not existing)
+            self.rollup_profile(c, old, {**old, **payload} if old else payload)
+
+            self.index_profile(c, pid, payload)
+            version = self.bump_version(c, "profiles_version")
+            conn.commit()
+        return pid, version
+
+    def update_profile(self, pid, changes):
+        # Patch by id: compare with the stored row and write only what differs.
+        # -> (changed columns, new profiles version or None if no cached view is affected)
+        loc_text = ("location_current", "location_hometown")
+        cols = list(dict.fromkeys([*changes, *loc_text, *LOCATION_COLUMNS, *ROLLUP_COLUMNS]))
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute(self.sql(f"SELECT {', '.join(cols)} FROM profiles WHERE id = ?"), (pid,))
+            row = c.fetchone()
+            if row is None:
+                raise KeyError(f"profile {pid} not found")
+            current = dict(zip(cols, row))
+
+            if any(k in changes for k in loc_text):
+                merged = {**current, **changes}
+                changes = {**changes, **_location_columns(merged["location_current"], merged["location_hometown"])}
+            # "" and NULL both mean "not set"; don't rewrite one as the other
+            diff = {k: v for k, v in changes.items() if (v if v != "" else None) != (current[k] if current[k] != "" else None)}
+            if not diff:
+                return [], None
+            diff["updated_at"] = datetime.now().isoformat(timespec="microseconds")
+
+            sets = ", ".join([f"{k}=?" for k in diff])
+            c.execute(self.sql(f"UPDATE profiles SET {sets} WHERE id=?"), [*diff.values(), pid])
+            index = dict(diff)
+            if "loc_lat" in diff or "loc_lon" in diff:
+                index.update(loc_lat=changes["loc_lat"], loc_lon=changes["loc_lon"])
+            self.index_profile(c, pid, index)
+
+            changed = sorted(k for k in diff if k != "updated_at")
+            self.log_change(c, "profile", pid, "update", changed)
+            self.flag_pii(c, "profile", pid, diff)
+            old = {k: current[k] for k in ROLLUP_COLUMNS}
+            self.rollup_profile(c, old, {**old, **{k: v for k, v in diff.items() if k in old}})
+            version = self.bump_version(c, "profiles_version") if CACHED_COLUMNS.intersection(changed) else None
+            conn.commit()
+        return changed, version
+
+    def upload_references(self):
+        return self.fetch_all("SELECT display_name, selfie_uploaded, creator_photos, selfie_photo FROM profiles")
+
+    # --- bulk export (keyset pages, so memory stays flat on any table size)
+    def export_batch(self, table, after_id, limit):
+        return self.fetch_df(f"SELECT * FROM {table} WHERE id > ? ORDER BY id LIMIT {int(limit)}", (after_id,))
+
+    def rows_by_ids(self, table, ids):
+        if not ids:
+            return self.fetch_df(f"SELECT * FROM {table} WHERE 1 = 0")
+        return self.fetch_df(f"SELECT * FROM {table} WHERE id IN ({','.join(['?'] * len(ids))}) ORDER BY id", list(ids))
+
+    # --- messages
+    def insert_message(self, sender_id, receiver_id, body):
+        cols = ["sender_id", "receiver_id", "body", "created"]
+        with self.connection() as conn:
+            c = conn.cursor()
+            created = datetime.now().isoformat(timespec="seconds")
+            mid = self.insert_row(c, "messages", cols, [sender_id, receiver_id, body, created])
+            self.log_change(c, "message", mid, "insert", cols)
+            self.flag_pii(c, "message", mid, {"body": body}, fresh=True)
+            self.rollup_message(c, sender_id, receiver_id, created)
+            self.index_message(c, mid, sender_id, receiver_id, body)
+            conn.commit()
+        return mid
+
+    def index_message(self, cur, mid, sender_id, receiver_id, body):
+        # full-text index kept in the same transaction (backends that index
+        # an expression over the table have nothing to do)
+        pass
+
+    def search_messages(self, profile_id, terms, limit, offset):
+        # ranked hits among messages the profile sent or received, hot and
+        # archived: id, sender_id, receiver_id, created, snippet
+        raise NotImplementedError
+
+    def read_inbox(self, profile_id, before_id, limit, archived=False):
+        # newest first below before_id: two index range scans (sender_id, id)
+        # and (receiver_id, id) instead of an OR over the whole table
+        table = "messages_archive" if archived else "messages"
+        limit = int(limit)
+        return self.fetch_df(f"""
+            SELECT * FROM (
+                SELECT id, sender_id, receiver_id, body, created FROM {table}
+                WHERE sender_id = ? AND id < ? ORDER BY id DESC LIMIT {limit}
+            ) s
+            UNION ALL
+            SELECT * FROM (
+                SELECT id, sender_id, receiver_id, body, created FROM {table}
+                WHERE receiver_id = ? AND sender_id <> ? AND id < ? ORDER BY id DESC LIMIT {limit}
+            ) r
+            ORDER BY id DESC
+            LIMIT {limit}
+        """, (profile_id, before_id, profile_id, profile_id, before_id))
+
+    def archive_messages(self, cutoff, batch):
+        # one short transaction per batch so live writers interleave; ids and
+        # created grow together, so the oldest rows are at the front of the
+        # id order and the scan stops after `batch` of them
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute(self.sql(f"SELECT id FROM messages WHERE created < ? ORDER BY id LIMIT {int(batch)}"), (cutoff,))
+            ids = [r[0] for r in c.fetchall()]
+            if ids:
+                marks = ",".join(["?"] * len(ids))
+                c.execute(self.sql(f"""
+                    INSERT INTO messages_archive (id, sender_id, receiver_id, body, created, month)
+                    SELECT id, sender_id, receiver_id, body, created, substr(created, 1, 7) FROM messages
+                    WHERE id IN ({marks})
+                """), ids)
+                c.execute(self.sql(f"DELETE FROM messages WHERE id IN ({marks})"), ids)
+            conn.commit()
+        return len(ids)
+
+    def message_tiers(self):
+        hot = self.fetch_all("SELECT COUNT(*), MIN(created) FROM messages")[0]
+        months = self.fetch_all("SELECT month, COUNT(*) FROM messages_archive GROUP BY month ORDER BY month")
+        return {"hot": hot[0], "hot_oldest": hot[1], "archive": sum(n for _, n in months), "archive_months": dict(months)}
+
+    # --- change data capture
+    # Append-only log written in the same transaction as the change itself.
+    # Rows say *what* changed (entity, id, op, columns); consumers re-read the
+    # current row. seq only grows, so a consumer's position is one integer.
+    def log_change(self, cur, entity, entity_id, op, columns=()):
+        cur.execute(
+            self.sql("INSERT INTO changes (entity, entity_id, op, columns, created) VALUES (?, ?, ?, ?, ?)"),
+            (entity, entity_id, op, ",".join(columns), datetime.now().isoformat(timespec="seconds"))
+        )
+
+    def changes_since(self, seq, limit, entities=None, upto=None):
+        where = ["seq > ?"]
+        params = [seq]
+        if upto is not None:
+            where.append("seq <= ?")
+            params.append(upto)
+        if entities:
+            where.append(f"entity IN ({','.join(['?'] * len(entities))})")
+            params += list(entities)
+        rows = self.fetch_all(f"""
+            SELECT seq, entity, entity_id, op, columns, created FROM changes
+            WHERE {' AND '.join(where)}
+            ORDER BY seq
+            LIMIT {int(limit)}
+        """, params)
+        return [
+            {"seq": r[0], "entity": r[1], "entity_id": r[2], "op": r[3], "columns": _csv_split(r[4]), "created": r[5]}
+            for r in rows
+        ]
+
+    def latest_change_seq(self):
+        return self.fetch_all("SELECT COALESCE(MAX(seq), 0) FROM changes")[0][0]
+
+    def get_cursor(self, consumer):
+        rows = self.fetch_all("SELECT seq FROM change_cursors WHERE consumer = ?", (consumer,))
+        return rows[0][0] if rows else 0
+
+    def ack_changes(self, consumer, seq):
+        # cursors only move forward
+        with self.connection() as conn:
+            conn.cursor().execute(self.sql("""
+                INSERT INTO change_cursors (consumer, seq, updated) VALUES (?, ?, ?)
+                ON CONFLICT (consumer) DO UPDATE SET
+                    seq = CASE WHEN excluded.seq > change_cursors.seq THEN excluded.seq ELSE change_cursors.seq END,
+                    updated = excluded.updated
+            """), (consumer, seq, datetime.now().isoformat(timespec="seconds")))
+            conn.commit()
+
+    def compact_changes(self, cutoff):
+        # Rows older than cutoff: drop what every registered consumer has
+        # acknowledged, then keep only the newest row per entity (op "insert"
+        # if the entity was created in the collapsed range, columns "*").
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT MIN(seq) FROM change_cursors")
+            floor = c.fetchone()[0]
+            if floor is None:
+                c.execute("SELECT COALESCE(MAX(seq), 0) FROM changes")
+                floor = c.fetchone()[0]
+            c.execute(self.sql("DELETE FROM changes WHERE seq <= ? AND created < ?"), (floor, cutoff))
+            acknowledged = c.rowcount
+
+            c.execute(self.sql("SELECT seq, entity, entity_id, op FROM changes WHERE created < ? ORDER BY seq"), (cutoff,))
+            groups = {}
+            for seq, entity, entity_id, op in c.fetchall():
+                groups.setdefault((entity, entity_id), []).append((seq, op))
+            collapsed = 0
+            for rows in groups.values():
+                if len(rows) < 2:
+                    continue
+                older = [seq for seq, _ in rows[:-1]]
+                op = "insert" if any(op == "insert" for _, op in rows) else rows[-1][1]
+                c.execute(self.sql(f"DELETE FROM changes WHERE seq IN ({','.join(['?'] * len(older))})"), older)
+                c.execute(self.sql("UPDATE changes SET op = ?, columns = '*' WHERE seq = ?"), (op, rows[-1][0]))
+                collapsed += len(older)
+            conn.commit()
+        return {"acknowledged_deleted": acknowledged, "collapsed": collapsed, "floor": floor}
+
+    # --- analytics rollups (maintained in the writing transaction)
+    # rollup_daily: per-day counters (signups, messages, conversations started
+    # / replied, bucketed by the day they started). rollup_totals: current
+    # distributions, moved by old -> new deltas. Dashboards read only these.
+    def _bump(self, cur, table, key_cols, key, delta):
+        if not delta:
+            return
+        cols = [*key_cols, "value"]
+        cur.execute(self.sql(f"""
+            INSERT INTO {table} ({", ".join(cols)}) VALUES ({", ".join(["?"] * len(cols))})
+            ON CONFLICT ({", ".join(key_cols)}) DO UPDATE SET value = {table}.value + excluded.value
+        """), (*key, delta))
+
+    def rollup_profile(self, cur, old, new):
+        # old None = new profile
+        if old is None:
+            self._bump(cur, "rollup_daily", ("day", "metric", "key"), (str(new["created"])[:10], "signups", new["account_type"]), 1)
+        before = _profile_totals(old) if old else []
+        after = _profile_totals(new)
+        for k in set(before) | set(after):
+            self._bump(cur, "rollup_totals", ("metric", "key"), k, after.count(k) - before.count(k))
+
+    def rollup_message(self, cur, sender_id, receiver_id, created):
+        day = created[:10]
+        self._bump(cur, "rollup_daily", ("day", "metric", "key"), (day, "messages", ""), 1)
+        a, b = sorted((sender_id, receiver_id))
+        cur.execute(self.sql("SELECT starter_id, started_day, replied FROM conversations WHERE a_id = ? AND b_id = ?"), (a, b))
+        conv = cur.fetchone()
+        if conv is None:
+            cur.execute(
+                self.sql("INSERT INTO conversations (a_id, b_id, starter_id, started_day, replied) VALUES (?, ?, ?, ?, 0)"),
+                (a, b, sender_id, day)
+            )
+            self._bump(cur, "rollup_daily", ("day", "metric", "key"), (day, "conversations", ""), 1)
+        elif not conv[2] and sender_id != conv[0]:
+            cur.execute(self.sql("UPDATE conversations SET replied = 1 WHERE a_id = ? AND b_id = ?"), (a, b))
+            self._bump(cur, "rollup_daily", ("day", "metric", "key"), (conv[1], "replied", ""), 1)
+
+    def rebuild_rollups(self, conn):
+        # one full pass over raw rows: first build and drift repair only
+        c = conn.cursor()
+        for table in ("rollup_daily", "rollup_totals", "conversations"):
+            c.execute(f"DELETE FROM {table}")
+        c.execute(f"SELECT created, {', '.join(ROLLUP_COLUMNS)} FROM profiles")
+        for row in c.fetchall():
+            self.rollup_profile(c, None, dict(zip(["created", *ROLLUP_COLUMNS], row)))
+        c.execute("""
+            SELECT id, sender_id, receiver_id, created FROM messages_archive
+            UNION ALL
+            SELECT id, sender_id, receiver_id, created FROM messages
+            ORDER BY id
+        """)
+        for _, sender_id, receiver_id, created in c.fetchall():
+            self.rollup_message(c, sender_id, receiver_id, created)
+
+    def read_rollups(self, since_day):
+        daily = self.fetch_df("SELECT day, metric, key, value FROM rollup_daily WHERE day >= ? ORDER BY day", (since_day,))
+        totals = self.fetch_df("SELECT metric, key, value FROM rollup_totals WHERE value <> 0 ORDER BY metric, key")
+        return daily, totals
+
+    # --- moderation: contact details found in free text (pii.py)
+    def flag_pii(self, cur, entity, entity_id, values, fresh=False):
+        # values: any {column: value}; only PII_FIELDS of the entity are scanned.
+        # fresh = new row, nothing to clear
+        for field in PII_FIELDS[entity]:
+            if field not in values:
+                continue
+            found = pii.kinds(values[field])
+            if not fresh:
+                cur.execute(self.sql("DELETE FROM pii_flags WHERE entity = ? AND entity_id = ? AND field = ?"), (entity, entity_id, field))
+            if found:
+                cur.execute(
+                    self.sql("INSERT INTO pii_flags (entity, entity_id, field, kinds, created) VALUES (?, ?, ?, ?, ?)"),
+                    (entity, entity_id, field, ",".join(found), datetime.now().isoformat(timespec="seconds"))
+                )
+
+    def pii_text_batch(self, entity, after_id, limit):
+        # keyset page of (id, *PII_FIELDS) for the back-scan, across every
+        # table that holds the entity (one keyset range scan each)
+        limit = int(limit)
+        parts = [f"""
+            SELECT * FROM (
+                SELECT id, {", ".join(PII_FIELDS[entity])} FROM {table}
+                WHERE id > ? ORDER BY id LIMIT {limit}
+            ) t{i}""" for i, table in enumerate(PII_TABLES[entity])]
+        return self.fetch_all(f"{' UNION ALL '.join(parts)} ORDER BY id LIMIT {limit}", [after_id] * len(parts))
+
+    def replace_pii_flags(self, entity, ids, flags):
+        # flags: (entity_id, field, kinds csv) for every hit among the scanned ids;
+        # flags of rows not scanned in this batch are left alone
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute(self.sql(f"DELETE FROM pii_flags WHERE entity = ? AND entity_id IN ({','.join(['?'] * len(ids))})"), [entity, *ids])
+            c.executemany(
+                self.sql("INSERT INTO pii_flags (entity, entity_id, field, kinds, created) VALUES (?, ?, ?, ?, ?)"),
+                [(entity, eid, field, kinds, now) for eid, field, kinds in flags]
+            )
+            conn.commit()
+
+    def read_pii_flags(self, limit):
+        return self.fetch_df(f"""
+            SELECT entity, entity_id, field, kinds, created FROM pii_flags
+            ORDER BY created DESC
+            LIMIT {int(limit)}
+        """)
+
+    # --- verification review queue (selfie uploaded, not yet decided)
+    def pending_verifications(self, after, limit):
+        # keyset page, oldest first; after = (created, id) of the last row shown
+        return self.fetch_df(f"""
+            SELECT id, account_type, display_name, created, niche, location_current, selfie_photo, creator_photos
+            FROM profiles
+            WHERE selfie_uploaded = 1 AND verified = 0 AND (created, id) > (?, ?)
+            ORDER BY created, id
+            LIMIT {int(limit)}
+        """, tuple(after))
+
+    def review_profiles(self, ids, decision, reviewer):
+        # One transaction for the whole batch. Rows another reviewer decided
+        # meanwhile are skipped. -> (decided ids, new profiles version)
+        now = datetime.now()
+        stamp = now.isoformat(timespec="seconds")
+        message = ("Your profile is now verified." if decision == VERIFIED
+                   else "Your verification selfie could not be approved.")
+        done = []
+        with self.connection() as conn:
+            c = conn.cursor()
+            for i in range(0, len(ids), IDS_PER_STATEMENT):
+                chunk = [int(x) for x in ids[i:i + IDS_PER_STATEMENT]]
+                marks = ",".join(["?"] * len(chunk))
+                c.execute(self.sql(f"""
+                    SELECT id, created, {', '.join(ROLLUP_COLUMNS)} FROM profiles
+                    WHERE id IN ({marks}) AND selfie_uploaded = 1 AND verified = 0
+                """), chunk)
+                rows = c.fetchall()
+                if not rows:
+                    continue
+                pending = [r[0] for r in rows]
+                c.execute(
+                    self.sql(f"UPDATE profiles SET verified = ?, updated_at = ? WHERE id IN ({','.join(['?'] * len(pending))})"),
+                    [decision, now.isoformat(timespec="microseconds"), *pending]
+                )
+                for pid, created, *rollup in rows:
+                    old = dict(zip(ROLLUP_COLUMNS, rollup))
+                    self.rollup_profile(c, old, {**old, "verified": decision})
+                    self.log_change(c, "profile", pid, "update", ["verified"])
+                    try:
+                        waited = (now - datetime.fromisoformat(created)).total_seconds()
+                    except (TypeError, ValueError):
+                        waited = None
+                    rid = self.insert_row(
+                        c, "verification_reviews",
+                        ["profile_id", "decision", "reviewer", "waited_seconds", "created"],
+                        [pid, decision, reviewer, waited, stamp]
+                    )
+                    c.execute(self.sql("""
+                        INSERT INTO notifications (profile_id, kind, ref_id, subject_id, body, created)
+                        VALUES (?, 'verification', ?, ?, ?, ?)
+                    """), (pid, rid, pid, message, stamp))
+                done += pending
+            version = self.bump_version(c, "profiles_version") if done else None
+            conn.commit()
+        return done, version
+
+    def verification_stats(self, since):
+        pending, oldest = self.fetch_all("SELECT COUNT(*), MIN(created) FROM profiles WHERE selfie_uploaded = 1 AND verified = 0")[0]
+        reviews = self.fetch_df("""
+            SELECT reviewer, decision, COUNT(*) AS reviews, MIN(created) AS first, MAX(created) AS last,
+                   AVG(waited_seconds) AS avg_wait_seconds
+            FROM verification_reviews
+            WHERE created >= ?
+            GROUP BY reviewer, decision
+        """, (since,))
+        return {"pending": pending, "oldest_pending": oldest}, reviews
+
+    # --- saved searches (keys = indexed access predicates, see searches.py)
+    def insert_saved_search(self, owner_id, label, target_type, spec, keys, since_seq):
+        with self.connection() as conn:
+            c = conn.cursor()
+            sid = self.insert_row(
+                c, "saved_searches",
+                ["owner_id", "label", "target_type", "spec", "since_seq", "created"],
+                [owner_id, label, target_type, spec, since_seq, datetime.now().isoformat(timespec="seconds")]
+            )
+            for k in sorted(set(keys)):
+                c.execute(self.sql("INSERT INTO saved_search_keys (key, search_id) VALUES (?, ?)"), (k, sid))
+            conn.commit()
+        return sid
+
+    def delete_saved_search(self, owner_id, search_id):
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute(self.sql("DELETE FROM saved_searches WHERE id = ? AND owner_id = ?"), (search_id, owner_id))
+            deleted = c.rowcount
+            if deleted:
+                c.execute(self.sql("DELETE FROM saved_search_keys WHERE search_id = ?"), (search_id,))
+            conn.commit()
+        return deleted > 0
+
+    def read_saved_searches(self, owner_id):
+        return self.fetch_df("SELECT * FROM saved_searches WHERE owner_id = ? ORDER BY id", (owner_id,))
+
+    def saved_searches_for_keys(self, keys):
+        # -> rows (id, owner_id, label, target_type, spec, since_seq, matched key)
+        if not keys:
+            return []
+        return self.fetch_all(f"""
+            SELECT s.id, s.owner_id, s.label, s.target_type, s.spec, s.since_seq, k.key
+            FROM saved_search_keys k
+            JOIN saved_searches s ON s.id = k.search_id
+            WHERE k.key IN ({",".join(["?"] * len(keys))})
+        """, list(keys))
+
+    def profile_locations(self, ids):
+        if not ids:
+            return []
+        return self.fetch_all(f"""
+            SELECT id, loc_city_id, loc_country, loc_lat, loc_lon FROM profiles
+            WHERE id IN ({",".join(["?"] * len(ids))})
+        """, list(ids))
+
+    # --- notifications
+    def insert_notifications(self, rows):
+        # rows: (profile_id, kind, ref_id, subject_id, body); a repeat of the
+        # same (recipient, kind, ref, subject) is ignored, so replays are harmless
+        now = datetime.now().isoformat(timespec="seconds")
+        inserted = 0
+        with self.connection() as conn:
+            c = conn.cursor()
+            for r in rows:
+                c.execute(self.sql("""
+                    INSERT INTO notifications (profile_id, kind, ref_id, subject_id, body, created)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (profile_id, kind, ref_id, subject_id) DO NOTHING
+                """), (*r, now))
+                inserted += max(c.rowcount, 0)
+            conn.commit()
+        return inserted
+
+    def read_notifications(self, profile_id, limit):
+        return self.fetch_df(f"""
+            SELECT * FROM notifications
+            WHERE profile_id = ?
+            ORDER BY id DESC
+            LIMIT {int(limit)}
+        """, (profile_id,))
+
+    def count_unseen_notifications(self, profile_id):
+        return self.fetch_all("SELECT COUNT(*) FROM notifications WHERE profile_id = ? AND seen = 0", (profile_id,))[0][0]
+
+    def mark_notifications_seen(self, profile_id):
+        with self.connection() as conn:
+            conn.cursor().execute(self.sql("UPDATE notifications SET seen = 1 WHERE profile_id = ? AND seen = 0"), (profile_id,))
+            conn.commit()
+
+    # --- sessions
+    def insert_session(self, token_hash, profile_id, summary, now, expires):
+        # expired rows are evicted in the same transaction (range on expires)
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute(self.sql("DELETE FROM sessions WHERE expires < ?"), (now,))
+            evicted = max(c.rowcount, 0)
+            c.execute(self.sql("""
+                INSERT INTO sessions (token_hash, profile_id, summary, created, expires)
+                VALUES (?, ?, ?, ?, ?)
+            """), (token_hash, profile_id, summary, now, expires))
+            conn.commit()
+        return evicted
+
+    def get_session(self, token_hash, now):
+        rows = self.fetch_all("SELECT summary, expires FROM sessions WHERE token_hash = ? AND expires >= ?", (token_hash, now))
+        return rows[0] if rows else None
+
+    def extend_session(self, token_hash, expires):
+        with self.connection() as conn:
+            conn.cursor().execute(self.sql("UPDATE sessions SET expires = ? WHERE token_hash = ?"), (expires, token_hash))
+            conn.commit()
+
+    def delete_session(self, token_hash):
+        with self.connection() as conn:
+            conn.cursor().execute(self.sql("DELETE FROM sessions WHERE token_hash = ?"), (token_hash,))
+            conn.commit()
+
+    def evict_sessions(self, now):
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute(self.sql("DELETE FROM sessions WHERE expires < ?"), (now,))
+            conn.commit()
+            return max(c.rowcount, 0)
+
+    def count_sessions(self):
+        return self.fetch_all("SELECT COUNT(*) FROM sessions")[0][0]
+
+    # --- tags
+    def profile_ids_with_tags(self, kind, tags, account_type):
+        # any-of match, served by the (kind, tag, profile_id) primary key
+        if not tags:
+            return set()
+        marks = ",".join(["?"] * len(tags))
+        rows = self.fetch_all(f"""
+            SELECT DISTINCT t.profile_id FROM profile_tags t
+            JOIN profiles p ON p.id = t.profile_id
+            WHERE t.kind = ? AND t.tag IN ({marks}) AND p.account_type = ?
+        """, (kind, *tags, account_type))
+        return {r[0] for r in rows}
+
+    # --- search
+    def search_profile_ids(self, account_type, q="", only_verified=False, tags=None, limit=None):
+        where = ["account_type = ?"]
+        params = [account_type]
+        if only_verified:
+            where.append("verified = 1")
+        if q.strip():
+            where.append("(lower(display_name) LIKE ? ESCAPE '\\' OR lower(niche) LIKE ? ESCAPE '\\' OR lower(location_current) LIKE ? ESCAPE '\\')")
+            params += [_like(q)] * 3
+        for kind, values in (tags or {}).items():
+            if values:
+                marks = ",".join(["?"] * len(values))
+                where.append(f"id IN (SELECT profile_id FROM profile_tags WHERE kind = ? AND tag IN ({marks}))")
+                params += [kind, *values]
+        q_sql = f"SELECT id FROM profiles WHERE {' AND '.join(where)} ORDER BY created DESC"
+        if limit:
+            q_sql += f" LIMIT {int(limit)}"
+        return [r[0] for r in self.fetch_all(q_sql, params)]
+
+    # --- location
+    def profile_ids_in_city(self, city_id, account_type):
+        # current city or hometown; each UNION branch uses its own index
+        rows = self.fetch_all("""
+            SELECT id FROM profiles WHERE loc_city_id = ? AND account_type = ?
+            UNION
+            SELECT id FROM profiles WHERE home_city_id = ? AND account_type = ?
+        """, (city_id, account_type, city_id, account_type))
+        return {r[0] for r in rows}
+
+    def profile_ids_in_country(self, country_code, account_type):
+        rows = self.fetch_all("""
+            SELECT id FROM profiles WHERE loc_country = ? AND account_type = ?
+            UNION
+            SELECT id FROM profiles WHERE home_country = ? AND account_type = ?
+        """, (country_code, account_type, country_code, account_type))
+        return {r[0] for r in rows}
+
+    def geo_candidates(self, box, account_type):
+        # (id, lat, lon) inside a bounding box; backends use their spatial index
+        raise NotImplementedError
+
+    def profiles_within_km(self, lat, lon, km, account_type):
+        # bounding-box prefilter, exact haversine distance on the survivors
+        found = {}
+        for box in geo.bounding_boxes(lat, lon, km):
+            for pid, plat, plon in self.geo_candidates(box, account_type):
+                d = geo.haversine_km(lat, lon, plat, plon)
+                if d <= km:
+                    found[pid] = d
+        return found
+
+# =========================
+# SQLITE BACKEND (default)
+# =========================
+def _count_statement(sql):
+    perf.incr("cn_sql_statements_total")
+
+class SQLiteStore(Store):
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def connect(self):
+        with perf.span("db.connect"):
+            if SQL_TRACE:
+                conn = sqlite3.connect(str(self.path), check_same_thread=False, factory=sqltrace.TracedConnection)
+                conn.slow_query_ms = SLOW_QUERY_MS
+            else:
+                conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.set_trace_callback(_count_statement)
+            conn.execute("PRAGMA journal_mode=WAL;")
+        return conn
+
+    def init_schema(self):
+        with self.connection() as conn:
+            c = conn.cursor()
+            if c.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+                return self.get_version(c, "profiles_version")
+
+            # Single table that supports both roles (creator + agency)
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS profiles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                account_type TEXT NOT NULL,              -- Creator / Agency
+
+                display_name TEXT NOT NULL,              -- visible name
+                created TEXT NOT NULL,
+
+                -- Shared / marketplace
+                niche TEXT,
+                location_current TEXT,
+                location_hometown TEXT,
+                bio TEXT,
+                verified INTEGER DEFAULT 0,              -- platform-verified (manual review placeholder)
+                selfie_uploaded INTEGER DEFAULT 0,
+
+                -- Creator fields
+                creator_personality TEXT,
+                creator_platform_handle TEXT,            -- e.g. handle on external subscription platform
+                creator_platform_url TEXT,               -- link to profile
+                creator_autofill INTEGER DEFAULT 0,       -- user chose "autofill" option
+                creator_earnings_band TEXT,               -- stated band
+                creator_content_types TEXT,               -- csv
+                creator_photos TEXT,                      -- csv of local saved filenames
+
+                -- Agency fields
+                agency_name TEXT,
+                agency_website TEXT,
+                agency_success_story TEXT,
+                agency_services TEXT,                     -- csv
+                agency_content_specialties TEXT,          -- csv
+
+                agency_payment_model TEXT,                -- fee / commission / other
+                agency_fee_band TEXT,                     -- band
+                agency_commission_band TEXT,              -- band
+                agency_payment_other TEXT                 -- free text
+            )
+            """)
+
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sender_id INTEGER NOT NULL,
+                receiver_id INTEGER NOT NULL,
+                body TEXT NOT NULL,
+                created TEXT NOT NULL
+            )
+            """)
+            # inbox: one range scan per side (rowid = id is the implicit tail)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_messages_sender ON messages(sender_id)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_messages_receiver ON messages(receiver_id)")
+
+            # Cold tier: whole months of old messages moved out of the hot table
+            # (archive_messages); ids are kept, so inbox paging crosses over by id
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS messages_archive (
+                id INTEGER PRIMARY KEY,
+                sender_id INTEGER NOT NULL,
+                receiver_id INTEGER NOT NULL,
+                body TEXT NOT NULL,
+                created TEXT NOT NULL,
+                month TEXT NOT NULL                       -- YYYY-MM
+            )
+            """)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_messages_archive_sender ON messages_archive(sender_id)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_messages_archive_receiver ON messages_archive(receiver_id)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_messages_archive_month ON messages_archive(month)")
+
+            # Full-text search over both tiers, rowid = message id. Contentless:
+            # only participant-scoped tokens are indexed (scoped_tokens), bodies
+            # stay in their tables, and archiving (same id) leaves it untouched.
+            has_fts = c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'message_fts'").fetchone()
+            c.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5(
+                tokens, content = '', tokenize = 'unicode61 remove_diacritics 2'
+            )
+            """)
+            if not has_fts:
+                self.rebuild_message_index(c)
+
+            # Normalized location (see geo.py) in indexed columns + R*Tree for radius search
+            # Last-change stamp (render caches key on it); older rows start at "created"
+            if self._add_missing_columns(conn, "profiles", {"updated_at": "TEXT"}):
+                c.execute("UPDATE profiles SET updated_at = created")
+            # Upload filename of the verification selfie (GC reference)
+            self._add_missing_columns(conn, "profiles", {"selfie_photo": "TEXT"})
+
+            added = self._add_missing_columns(conn, "profiles", LOCATION_COLUMNS)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_profiles_loc_city ON profiles(loc_city_id, account_type)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_profiles_loc_country ON profiles(loc_country, account_type)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_profiles_home_city ON profiles(home_city_id, account_type)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_profiles_home_country ON profiles(home_country, account_type)")
+            # verification queue: the pending set is one range, keyset-paged by (created, rowid)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_profiles_review ON profiles(selfie_uploaded, verified, created)")
+            c.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS profile_geo USING rtree(
+                id, min_lat, max_lat, min_lon, max_lon
+            )
+            """)
+            if added:
+                self._backfill_locations(conn)
+
+            # Multi-valued csv fields as (kind, tag) rows
+            has_tags = c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'profile_tags'").fetchone()
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS profile_tags (
+                profile_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                tag TEXT NOT NULL,
+                PRIMARY KEY (kind, tag, profile_id)
+            ) WITHOUT ROWID
+            """)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_profile_tags_profile ON profile_tags(profile_id)")
+            if not has_tags:
+                self._backfill_tags(c)
+
+            # Change log (CDC) + per-consumer positions in it
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,    -- never reused, even after compaction
+                entity TEXT NOT NULL,                     -- profile / message
+                entity_id INTEGER NOT NULL,
+                op TEXT NOT NULL,                         -- insert / update
+                columns TEXT,                             -- csv of written columns, "*" after compaction
+                created TEXT NOT NULL
+            )
+            """)
+            c.execute("CREATE TABLE IF NOT EXISTS change_cursors (consumer TEXT PRIMARY KEY, seq INTEGER NOT NULL, updated TEXT)")
+
+            # Contact details found in free text, one row per (row, field) with hits
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS pii_flags (
+                entity TEXT NOT NULL,                     -- profile / message
+                entity_id INTEGER NOT NULL,
+                field TEXT NOT NULL,
+                kinds TEXT NOT NULL,                      -- csv: email,url,handle,phone
+                created TEXT NOT NULL,
+                PRIMARY KEY (entity, entity_id, field)
+            ) WITHOUT ROWID
+            """)
+
+            # Verification decisions (audit trail + reviewer throughput)
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS verification_reviews (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                profile_id INTEGER NOT NULL,
+                decision INTEGER NOT NULL,                -- 1 verified / -1 rejected
+                reviewer TEXT NOT NULL,
+                waited_seconds REAL,                      -- profile created -> decision
+                created TEXT NOT NULL
+            )
+            """)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_verification_reviews_created ON verification_reviews(created)")
+
+            # Analytics rollups (see rollup_profile / rollup_message)
+            has_rollups = c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'rollup_totals'").fetchone()
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS rollup_daily (
+                day TEXT NOT NULL,                        -- YYYY-MM-DD
+                metric TEXT NOT NULL,                     -- signups / messages / conversations / replied
+                key TEXT NOT NULL,                        -- e.g. account type, "" if none
+                value INTEGER NOT NULL,
+                PRIMARY KEY (day, metric, key)
+            ) WITHOUT ROWID
+            """)
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS rollup_totals (
+                metric TEXT NOT NULL,                     -- profiles / earnings_band / payment_model / verification
+                key TEXT NOT NULL,
+                value INTEGER NOT NULL,
+                PRIMARY KEY (metric, key)
+            ) WITHOUT ROWID
+            """)
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS conversations (
+                a_id INTEGER NOT NULL,                    -- lower profile id of the pair
+                b_id INTEGER NOT NULL,
+                starter_id INTEGER NOT NULL,
+                started_day TEXT NOT NULL,
+                replied INTEGER NOT NULL,
+                PRIMARY KEY (a_id, b_id)
+            ) WITHOUT ROWID
+            """)
+            if not has_rollups:
+                self.rebuild_rollups(conn)
+
+            # Saved Browse searches, their access-predicate index, and in-app notifications
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS saved_searches (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                owner_id INTEGER NOT NULL,
+                label TEXT NOT NULL,
+                target_type TEXT NOT NULL,
+                spec TEXT NOT NULL,                       -- json filter spec (searches.py)
+                since_seq INTEGER NOT NULL,               -- only changes after this notify
+                created TEXT NOT NULL
+            )
+            """)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_saved_searches_owner ON saved_searches(owner_id)")
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS saved_search_keys (
+                key TEXT NOT NULL,
+                search_id INTEGER NOT NULL,
+                PRIMARY KEY (key, search_id)
+            ) WITHOUT ROWID
+            """)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_saved_search_keys_search ON saved_search_keys(search_id)")
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS notifications (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                profile_id INTEGER NOT NULL,              -- recipient
+                kind TEXT NOT NULL,                       -- e.g. search_match
+                ref_id INTEGER NOT NULL,                  -- e.g. saved search id
+                subject_id INTEGER NOT NULL,              -- e.g. matched profile id
+                body TEXT NOT NULL,
+                created TEXT NOT NULL,
+                seen INTEGER DEFAULT 0,
+                UNIQUE (profile_id, kind, ref_id, subject_id)
+            )
+            """)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_notifications_profile ON notifications(profile_id, seen)")
+
+            # Sign-in sessions (sessions.py): the browser holds the token, only its hash is stored
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                token_hash TEXT PRIMARY KEY,              -- sha256 of the token
+                profile_id INTEGER NOT NULL,
+                summary TEXT NOT NULL,                    -- json identity the app needs each run
+                created TEXT NOT NULL,
+                expires TEXT NOT NULL
+            ) WITHOUT ROWID
+            """)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires)")
+
+            # Monotonic data versions; readers compare them instead of re-querying
+            c.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            c.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('profiles_version', 0)")
+            version = self.bump_version(c, "profiles_version") if added else self.get_version(c, "profiles_version")
+
+            c.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.commit()
+        return version
+
+    def _add_missing_columns(self, conn, table, columns):
+        have = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+        added = [k for k in columns if k not in have]
+        for k in added:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {k} {columns[k]}")
+        return added
+
+    def _backfill_locations(self, conn):
+        rows = conn.execute("SELECT id, location_current, location_hometown FROM profiles").fetchall()
+        for pid, cur, home in rows:
+            loc = _location_columns(cur, home)
+            sets = ", ".join([f"{k}=?" for k in loc])
+            conn.execute(f"UPDATE profiles SET {sets} WHERE id=?", list(loc.values()) + [pid])
+            self.index_geo(conn, pid, loc["loc_lat"], loc["loc_lon"])
+
+    def _backfill_tags(self, c):
+        fields = ", ".join(TAG_FIELDS.values())
+        for row in c.execute(f"SELECT id, {fields} FROM profiles").fetchall():
+            self.index_profile(c, row[0], dict(zip(TAG_FIELDS.values(), row[1:])))
+
+    def index_geo(self, conn, pid, lat, lon):
+        conn.execute("DELETE FROM profile_geo WHERE id = ?", (pid,))
+        if lat is not None and lon is not None:
+            conn.execute(
+                "INSERT INTO profile_geo (id, min_lat, max_lat, min_lon, max_lon) VALUES (?, ?, ?, ?, ?)",
+                (pid, lat, lat, lon, lon)
+            )
+
+    def index_profile(self, cur, pid, payload):
+        super().index_profile(cur, pid, payload)
+        if "loc_lat" in payload:
+            self.index_geo(cur, pid, payload["loc_lat"], payload["loc_lon"])
+
+    def insert_row(self, cur, table, cols, vals):
+        placeholders = ",".join(["?"] * len(cols))
+        cur.execute(f"INSERT INTO {table} ({','.join(cols)}) VALUES ({placeholders})", vals)
+        return cur.lastrowid
+
+    def index_message(self, cur, mid, sender_id, receiver_id, body):
+        cur.execute("INSERT INTO message_fts (rowid, tokens) VALUES (?, ?)", (mid, scoped_tokens(sender_id, receiver_id, body)))
+
+    def rebuild_message_index(self, c):
+        c.execute("INSERT INTO message_fts (message_fts) VALUES ('delete-all')")
+        src = c.connection.execute("""
+            SELECT id, sender_id, receiver_id, body FROM messages
+            UNION ALL
+            SELECT id, sender_id, receiver_id, body FROM messages_archive
+        """)
+        while True:
+            rows = src.fetchmany(5000)
+            if not rows:
+                break
+            c.executemany(
+                "INSERT INTO message_fts (rowid, tokens) VALUES (?, ?)",
+                [(mid, scoped_tokens(s, r, body)) for mid, s, r, body in rows]
+            )
+
+    def search_messages(self, profile_id, terms, limit, offset):
+        prefix = f"p{int(profile_id)}x"
+        match = " ".join([f'"{prefix}{t}"' for t in terms[:-1]] + [f'"{prefix}{terms[-1]}"*'])
+        ranked = [r[0] for r in self.fetch_all(f"""
+            SELECT rowid FROM message_fts WHERE message_fts MATCH ?
+            ORDER BY bm25(message_fts), rowid DESC
+            LIMIT {int(limit)} OFFSET {int(offset)}
+        """, (match,))]
+        # the page's rows by primary key, from whichever tier holds them
+        marks = ",".join(["?"] * len(ranked))
+        hits = self.fetch_df(f"""
+            SELECT id, sender_id, receiver_id, created, body FROM messages WHERE id IN ({marks})
+            UNION ALL
+            SELECT id, sender_id, receiver_id, created, body FROM messages_archive WHERE id IN ({marks})
+        """, ranked * 2)
+        order = {mid: i for i, mid in enumerate(ranked)}
+        hits = hits.sort_values("id", key=lambda ids: ids.map(order)).reset_index(drop=True)
+        hits["snippet"] = [message_snippet(b, terms) for b in hits.pop("body")]
+        return hits
+
+    def geo_candidates(self, box, account_type):
+        min_lat, max_lat, min_lon, max_lon = box
+        return self.fetch_all("""
+            SELECT p.id, p.loc_lat, p.loc_lon
+            FROM profile_geo g JOIN profiles p ON p.id = g.id
+            WHERE g.max_lat >= ? AND g.min_lat <= ?
+              AND g.max_lon >= ? AND g.min_lon <= ?
+              AND p.account_type = ?
+        """, (min_lat, max_lat, min_lon, max_lon, account_type))
+
+_store = None
+
+def store():
+    global _store
+    if _store is None:
+        if DATABASE_URL.startswith(("postgres://", "postgresql://", "pgserver://")):
+            import storage_pg
+            _store = storage_pg.PostgresStore.from_url(DATABASE_URL)
+        else:
+            _store = SQLiteStore(DB_PATH)
+    return _store
+
+def db():
+    # raw DB-API connection to the active backend (SQLite unless configured)
+    return store().connect()
+
+# =========================
+# DATA HELPERS (what the UI calls)
+# =========================
+@perf.timed()
+def init_db():
+    version = store().init_schema()
+    # A version file ahead of the database means app.db was replaced; resync
+    profiles_snapshot.publish_version(version, force=profiles_snapshot.version() > version)
+
+@perf.timed()
+def read_profiles():
+    # every column, uncached; the UI reads cards + per-profile details instead
+    return store().read_profiles()
+
+def profiles_version():
+    # version of the shared card frame; use it to key derived caches
+    return profiles_snapshot.version()
+
+@perf.timed()
+def read_profile_cards():
+    # Shared, read-only, compact frame: callers filter/copy, never mutate in place
+    return profiles_snapshot.get(lambda: compact_cards(store().read_profile_cards()))
+
+@perf.timed()
+def read_profile_cards_versioned():
+    # -> (version, cards): the version the frame was built for, for cache keys
+    return profiles_snapshot.get_versioned(lambda: compact_cards(store().read_profile_cards()))
+
+@perf.timed()
+def get_profile_by_display_name(display_name, account_type):
+    return store().get_profile_by_display_name(display_name, account_type)
+
+@perf.timed()
+def upsert_profile(payload: dict):
+    if WRITER_ADDRESS:
+        return writer.call(WRITER_ADDRESS, "upsert_profile", payload)
+
+    payload = {**payload, "updated_at": datetime.now().isoformat(timespec="microseconds")}
+    if "location_current" in payload or "location_hometown" in payload:
+        payload = {**payload, **_location_columns(payload.get("location_current"), payload.get("location_hometown"))}
+
+    pid, version = store().upsert_profile(payload)
+    profiles_snapshot.publish_version(version)
+    return pid
+
+# =========================
+# UPLOADS (content-addressed files in UPLOAD_DIR)
+# =========================
+def save_upload(data, kind, ext=""):
+    # Identical bytes map to one file, so re-uploads write nothing
+    ext = re.sub(r"[^a-z0-9]", "", ext.lower().lstrip("."))
+    name = f"{kind}_{hashlib.sha256(data).hexdigest()[:32]}{'.' + ext if ext else ''}"
+    path = UPLOAD_DIR / name
+    if path.exists():
+        os.utime(path)  # fresh mtime keeps a re-used file out of the GC window
+    else:
+        cache._atomic_write(path, data)
+    return name
+
+def upload_thumbnail(name, px=THUMB_PX):
+    # -> path of a small JPEG of an uploaded image (made once, cached by
+    # content-hash name), the original if it can't be decoded, None if missing
+    src = UPLOAD_DIR / name
+    thumb = CACHE_DIR / "thumbs" / f"{Path(name).stem}-{px}.jpg"
+    if thumb.exists():
+        return thumb
+    if not src.exists():
+        return None
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(src) as im:
+            im.thumbnail((px, px))
+            buf = io.BytesIO()
+            im.convert("RGB").save(buf, "JPEG", quality=80)
+    except (UnidentifiedImageError, OSError):
+        return src
+    thumb.parent.mkdir(parents=True, exist_ok=True)
+    cache._atomic_write(thumb, buf.getvalue())
+    return thumb
+
+def referenced_uploads():
+    # -> (filenames referenced by profiles, filename prefixes of legacy
+    # selfies that predate selfie_photo and are kept conservatively)
+    names = set()
+    prefixes = set()
+    for display_name, selfie_uploaded, photos, selfie in store().upload_references():
+        names.update(_csv_split(photos))
+        if selfie:
+            names.add(selfie)
+        elif int(selfie_uploaded or 0) == 1:
+            prefixes.add(re.sub(r"[^a-zA-Z0-9_-]", "_", f"selfie_{display_name}")[:24] + "_")
+    return names, prefixes
+
+@perf.timed()
+def update_profile(pid, changes: dict):
+    # Partial edit: only fields whose value differs are written
+    if WRITER_ADDRESS:
+        return writer.call(WRITER_ADDRESS, "update_profile", pid, changes)
+
+    changed, version = store().update_profile(pid, changes)
+    if version is not None:
+        profiles_snapshot.publish_version(version)
+    return changed
+
+@perf.timed()
+def insert_message(sender_id, receiver_id, body):
+    if WRITER_ADDRESS:
+        return writer.call(WRITER_ADDRESS, "insert_message", sender_id, receiver_id, body)
+    return store().insert_message(sender_id, receiver_id, body)
+
+@perf.timed()
+def read_inbox(profile_id, limit=INBOX_PAGE, before_id=None):
+    # newest first; continues into the archive when the hot table runs out
+    before_id = before_id or 2 ** 62
+    hot = store().read_inbox(profile_id, before_id, limit)
+    if len(hot) >= limit:
+        return hot
+    older = store().read_inbox(profile_id, int(hot["id"].min()) if len(hot) else before_id, limit - len(hot), archived=True)
+    if older.empty:
+        return hot
+    import pandas as pd
+
+    return older if hot.empty else pd.concat([hot, older], ignore_index=True)
+
+@perf.timed()
+def search_messages(profile_id, text, page=0, page_size=MESSAGE_SEARCH_PAGE):
+    # best matches first, one page at a time; nothing is loaded beyond the page
+    terms = search_terms(text)
+    if not terms:
+        import pandas as pd
+
+        return pd.DataFrame(columns=["id", "sender_id", "receiver_id", "created", "snippet"])
+    return store().search_messages(profile_id, terms, page_size, page * page_size)
+
+def archive_messages(hot_days=MESSAGE_HOT_DAYS, batch=ARCHIVE_BATCH):
+    # -> rows moved by one batch; callers loop until 0
+    if WRITER_ADDRESS:
+        return writer.call(WRITER_ADDRESS, "archive_messages", hot_days, batch)
+    keep_from = datetime.now() - timedelta(days=hot_days)
+    cutoff = keep_from.replace(day=1).strftime("%Y-%m-%d")  # whole months only
+    return store().archive_messages(cutoff, batch)
+
+def message_tiers():
+    return store().message_tiers()
+
+@perf.timed()
+def get_profile_id(display_name, account_type):
+    return store().get_profile_id(display_name, account_type)
+
+@perf.timed()
+def get_profile_by_id(pid):
+    return store().get_profile_by_id(pid)
+
+@perf.timed()
+def profile_ids_with_tags(kind, tags, account_type):
+    return store().profile_ids_with_tags(kind, list(tags), account_type)
+
+@perf.timed()
+def search_profile_ids(account_type, q="", only_verified=False, tags=None, limit=None):
+    return store().search_profile_ids(account_type, q, only_verified, tags, limit)
+
+@perf.timed()
+def profile_ids_in_city(city_id, account_type):
+    return store().profile_ids_in_city(city_id, account_type)
+
+@perf.timed()
+def profile_ids_in_country(country_code, account_type):
+    return store().profile_ids_in_country(country_code, account_type)
+
+@perf.timed()
+def profiles_within_km(lat, lon, km, account_type):
+    return store().profiles_within_km(lat, lon, km, account_type)
+
+# =========================
+# ANALYTICS (rollup tables only; no scans of profiles/messages)
+# =========================
+@perf.timed()
+def read_rollups(days=90):
+    since = (datetime.now() - timedelta(days=days)).date().isoformat()
+    return store().read_rollups(since)
+
+def rebuild_rollups():
+    with store().connection() as conn:
+        store().rebuild_rollups(conn)
+        conn.commit()
+
+# =========================
+# MODERATION (contact-detail flags, verification queue)
+# =========================
+@perf.timed()
+def read_pii_flags(limit=200):
+    return store().read_pii_flags(limit)
+
+@perf.timed()
+def pending_verifications(after=("", 0), limit=REVIEW_PAGE):
+    return store().pending_verifications(after, limit)
+
+@perf.timed()
+def review_profiles(ids, decision, reviewer):
+    # -> ids actually decided (others were already reviewed)
+    if decision not in (VERIFIED, VERIFICATION_REJECTED):
+        raise ValueError(f"unknown verification decision {decision!r}")
+    if WRITER_ADDRESS:
+        return writer.call(WRITER_ADDRESS, "review_profiles", [int(i) for i in ids], decision, reviewer)
+    done, version = store().review_profiles(list(ids), decision, reviewer)
+    if version is not None:
+        profiles_snapshot.publish_version(version)
+    perf.incr("cn_verification_reviews_total", value=len(done), decision="verified" if decision == VERIFIED else "rejected")
+    return done
+
+def verification_stats(hours=24):
+    since = (datetime.now() - timedelta(hours=hours)).isoformat(timespec="seconds")
+    return store().verification_stats(since)
+
+# =========================
+# SAVED SEARCHES + NOTIFICATIONS
+# =========================
+@perf.timed()
+def save_search(owner_id, label, target_type, spec: str, keys):
+    if WRITER_ADDRESS:
+        return writer.call(WRITER_ADDRESS, "save_search", owner_id, label, target_type, spec, list(keys))
+    # matches start with the next change; what exists now is what Browse shows
+    return store().insert_saved_search(owner_id, label, target_type, spec, keys, store().latest_change_seq())
+
+def delete_search(owner_id, search_id):
+    if WRITER_ADDRESS:
+        return writer.call(WRITER_ADDRESS, "delete_search", owner_id, search_id)
+    return store().delete_saved_search(owner_id, search_id)
+
+@perf.timed()
+def read_saved_searches(owner_id):
+    return store().read_saved_searches(owner_id)
+
+@perf.timed()
+def saved_searches_for_keys(keys):
+    return store().saved_searches_for_keys(sorted(set(keys)))
+
+@perf.timed()
+def profile_locations(ids):
+    return store().profile_locations(sorted(set(ids)))
+
+@perf.timed()
+def add_notifications(rows):
+    if WRITER_ADDRESS:
+        return writer.call(WRITER_ADDRESS, "add_notifications", [list(r) for r in rows])
+    return store().insert_notifications(rows) if rows else 0
+
+@perf.timed()
+def read_notifications(profile_id, limit=50):
+    return store().read_notifications(profile_id, limit)
+
+@perf.timed()
+def count_unseen_notifications(profile_id):
+    return store().count_unseen_notifications(profile_id)
+
+def mark_notifications_seen(profile_id):
+    if WRITER_ADDRESS:
+        return writer.call(WRITER_ADDRESS, "mark_notifications_seen", profile_id)
+    store().mark_notifications_seen(profile_id)
+
+# =========================
+# SESSIONS (see sessions.py for tokens and the in-process cache)
+# =========================
+def _stamp(ts):
+    return datetime.fromtimestamp(ts).isoformat(timespec="seconds")
+
+def create_session(token_hash, profile_id, summary: dict, expires_ts):
+    if WRITER_ADDRESS:
+        return writer.call(WRITER_ADDRESS, "create_session", token_hash, profile_id, summary, expires_ts)
+    return store().insert_session(token_hash, profile_id, json.dumps(summary), _stamp(time.time()), _stamp(expires_ts))
+
+@perf.timed()
+def get_session(token_hash):
+    # -> (summary dict, expiry timestamp) of a live session, else None
+    row = store().get_session(token_hash, _stamp(time.time()))
+    if row is None:
+        return None
+    return json.loads(row[0]), datetime.fromisoformat(row[1]).timestamp()
+
+def extend_session(token_hash, expires_ts):
+    if WRITER_ADDRESS:
+        return writer.call(WRITER_ADDRESS, "extend_session", token_hash, expires_ts)
+    store().extend_session(token_hash, _stamp(expires_ts))
+
+def delete_session(token_hash):
+    if WRITER_ADDRESS:
+        return writer.call(WRITER_ADDRESS, "delete_session", token_hash)
+    store().delete_session(token_hash)
+
+def evict_sessions():
+    if WRITER_ADDRESS:
+        return writer.call(WRITER_ADDRESS, "evict_sessions")
+    return store().evict_sessions(_stamp(time.time()))
+
+def count_sessions():
+    return store().count_sessions()
+
+# =========================
+# CHANGE FEED (consumer API over the changes table)
+# =========================
+# A new consumer builds its state from a full read, then starts its cursor
+# at latest_change_seq() and applies batches from there on.
+@perf.timed()
+def changes_since(seq=0, limit=CHANGES_BATCH, entities=None, upto=None):
+    return store().changes_since(seq, limit, entities, upto)
+
+def latest_change_seq():
+    return store().latest_change_seq()
+
+def change_cursor(consumer):
+    return store().get_cursor(consumer)
+
+def ack_changes(consumer, seq):
+    if WRITER_ADDRESS:
+        return writer.call(WRITER_ADDRESS, "ack_changes", consumer, seq)
+    store().ack_changes(consumer, seq)
+
+@perf.timed()
+def consume_changes(consumer, handler, batch=CHANGES_BATCH, entities=None, max_batches=None):
+    # handler(list of change dicts) runs before the cursor moves past the
+    # batch: a crash re-delivers it (at-least-once), so handlers must be idempotent
+    done = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        cursor = change_cursor(consumer)
+        # filtered consumers still advance over changes they don't care about,
+        # but only up to a position read before the query: a matching change
+        # committed after it is picked up next time instead of skipped
+        latest = latest_change_seq() if entities else None
+        rows = changes_since(cursor, batch, entities, latest)
+        if not rows:
+            if entities and latest > cursor:
+                ack_changes(consumer, latest)
+            break
+        handler(rows)
+        ack_changes(consumer, rows[-1]["seq"])
+        done += len(rows)
+        batches += 1
+    return done
+
+@perf.timed()
+def compact_changes(retention_hours=CHANGES_RETENTION_HOURS):
+    if WRITER_ADDRESS:
+        return writer.call(WRITER_ADDRESS, "compact_changes", retention_hours)
+    cutoff = (datetime.now() - timedelta(hours=retention_hours)).isoformat(timespec="seconds")
+    return store().compact_changes(cutoff)
@@ -0,0 +1,353 @@
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import perf
+from storage import LOCATION_COLUMNS, SCHEMA_VERSION, TAG_FIELDS, Store
+
+try:
+    import psycopg2
+    import psycopg2.pool
+except ImportError:  # optional: only needed when CN_DATABASE_URL points at PostgreSQL
+    psycopg2 = None
+
+# Rows per round trip for server-side (named) cursors on the wide reads
+FETCH_CHUNK = 2000
+POOL_MIN = 1
+POOL_MAX = 8
+
+# =========================
+# POSTGRESQL BACKEND
+# =========================
+# Same interface as SQLiteStore. Connections come from a thread-safe pool,
+# full-table reads stream through server-side cursors, ids come from
+# SERIAL + RETURNING, and radius search uses a btree on (loc_lat, loc_lon)
+# for the bounding box instead of SQLite's R*Tree.
+class PostgresStore(Store):
+    name = "postgresql"
+    placeholder = "%s"
+
+    def __init__(self, dsn, server=None):
+        if psycopg2 is None:
+            raise RuntimeError("CN_DATABASE_URL is a PostgreSQL URL but psycopg2 is not installed (pip install psycopg2-binary)")
+        self.dsn = dsn
+        self._server = server  # keeps an embedded pgserver instance alive
+        self.pool = psycopg2.pool.ThreadedConnectionPool(POOL_MIN, POOL_MAX, dsn)
+
+    @classmethod
+    def from_url(cls, url):
+        if url.startswith("pgserver://"):
+            # local stand-in: a private PostgreSQL cluster in a data directory
+            import pgserver
+
+            server = pgserver.get_server(urlparse(url).path or "data/pg", cleanup_mode=None)
+            return cls(server.get_uri(), server=server)
+        return cls(url)
+
+    def connect(self):
+        # unpooled connection for callers that close() it themselves (storage.db())
+        with perf.span("db.connect"):
+            return psycopg2.connect(self.dsn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.pool.getconn()
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            if conn.status != psycopg2.extensions.STATUS_READY:
+                conn.rollback()
+            self.pool.putconn(conn)
+
+    def fetch_df(self, q, params=()):
+        with self.connection() as conn:
+            with conn.cursor(name=f"cn_{id(conn)}") as cur:
+                cur.itersize = FETCH_CHUNK
+                cur.execute(self.sql(q), params)
+                rows = []
+                while True:
+                    chunk = cur.fetchmany(FETCH_CHUNK)
+                    if not chunk:
+                        break
+                    rows.extend(chunk)
+                columns = [d[0] for d in cur.description]
+            conn.commit()
+        import pandas as pd
+
+        return pd.DataFrame(rows, columns=columns)
+
+    def fetch_all(self, q, params=()):
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(self.sql(q), params)
+                rows = cur.fetchall()
+            conn.commit()
+        return rows
+
+    def init_schema(self):
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT to_regclass('meta')")
+            if c.fetchone()[0] and self.get_version(c, "schema_version") >= SCHEMA_VERSION:
+                return self.get_version(c, "profiles_version")
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS profiles (
+                id SERIAL PRIMARY KEY,
+                account_type TEXT NOT NULL,
+                display_name TEXT NOT NULL,
+                created TEXT NOT NULL,
+
+                niche TEXT,
+                location_current TEXT,
+                location_hometown TEXT,
+                bio TEXT,
+                verified INTEGER DEFAULT 0,
+                selfie_uploaded INTEGER DEFAULT 0,
+
+                creator_personality TEXT,
+                creator_platform_handle TEXT,
+                creator_platform_url TEXT,
+                creator_autofill INTEGER DEFAULT 0,
+                creator_earnings_band TEXT,
+                creator_content_types TEXT,
+                creator_photos TEXT,
+
+                agency_name TEXT,
+                agency_website TEXT,
+                agency_success_story TEXT,
+                agency_services TEXT,
+                agency_content_specialties TEXT,
+
+                agency_payment_model TEXT,
+                agency_fee_band TEXT,
+                agency_commission_band TEXT,
+                agency_payment_other TEXT
+            )
+            """)
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id SERIAL PRIMARY KEY,
+                sender_id INTEGER NOT NULL,
+                receiver_id INTEGER NOT NULL,
+                body TEXT NOT NULL,
+                created TEXT NOT NULL
+            )
+            """)
+            c.execute("ALTER TABLE profiles ADD COLUMN IF NOT EXISTS updated_at TEXT")
+            c.execute("UPDATE profiles SET updated_at = created WHERE updated_at IS NULL")
+            c.execute("ALTER TABLE profiles ADD COLUMN IF NOT EXISTS selfie_photo TEXT")
+            for k, typ in LOCATION_COLUMNS.items():
+                typ = "DOUBLE PRECISION" if typ == "REAL" else typ
+                c.execute(f"ALTER TABLE profiles ADD COLUMN IF NOT EXISTS {k} {typ}")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_profiles_loc_city ON profiles(loc_city_id, account_type)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_profiles_loc_country ON profiles(loc_country, account_type)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_profiles_home_city ON profiles(home_city_id, account_type)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_profiles_home_country ON profiles(home_country, account_type)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_profiles_review ON profiles(selfie_uploaded, verified, created, id)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_profiles_geo ON profiles(loc_lat, loc_lon)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_profiles_identity ON profiles(display_name, account_type)")
+            # (x, id): inbox pages are id-ordered range scans per side
+            c.execute("DROP INDEX IF EXISTS idx_messages_sender")
+            c.execute("DROP INDEX IF EXISTS idx_messages_receiver")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_messages_sender_id ON messages(sender_id, id)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_messages_receiver_id ON messages(receiver_id, id)")
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS messages_archive (
+                id INTEGER PRIMARY KEY,
+                sender_id INTEGER NOT NULL,
+                receiver_id INTEGER NOT NULL,
+                body TEXT NOT NULL,
+                created TEXT NOT NULL,
+                month TEXT NOT NULL
+            )
+            """)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_messages_archive_sender_id ON messages_archive(sender_id, id)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_messages_archive_receiver_id ON messages_archive(receiver_id, id)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_messages_archive_month ON messages_archive(month)")
+            # message search: GIN over the tsvector expression search_messages() matches on
+            for table in ("messages", "messages_archive"):
+                c.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_fts ON {table} USING GIN (to_tsvector('simple', body))")
+
+            c.execute("SELECT to_regclass('profile_tags')")
+            has_tags = c.fetchone()[0] is not None
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS profile_tags (
+                profile_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                tag TEXT NOT NULL,
+                PRIMARY KEY (kind, tag, profile_id)
+            )
+            """)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_profile_tags_profile ON profile_tags(profile_id)")
+            if not has_tags:
+                fields = ", ".join(TAG_FIELDS.values())
+                c.execute(f"SELECT id, {fields} FROM profiles")
+                for row in c.fetchall():
+                    self.index_profile(c, row[0], dict(zip(TAG_FIELDS.values(), row[1:])))
+
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS changes (
+                seq BIGSERIAL PRIMARY KEY,
+                entity TEXT NOT NULL,
+                entity_id INTEGER NOT NULL,
+                op TEXT NOT NULL,
+                columns TEXT,
+                created TEXT NOT NULL
+            )
+            """)
+            c.execute("CREATE TABLE IF NOT EXISTS change_cursors (consumer TEXT PRIMARY KEY, seq BIGINT NOT NULL, updated TEXT)")
+
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS pii_flags (
+                entity TEXT NOT NULL,
+                entity_id INTEGER NOT NULL,
+                field TEXT NOT NULL,
+                kinds TEXT NOT NULL,
+                created TEXT NOT NULL,
+                PRIMARY KEY (entity, entity_id, field)
+            )
+            """)
+
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS verification_reviews (
+                id SERIAL PRIMARY KEY,
+                profile_id INTEGER NOT NULL,
+                decision INTEGER NOT NULL,
+                reviewer TEXT NOT NULL,
+                waited_seconds DOUBLE PRECISION,
+                created TEXT NOT NULL
+            )
+            """)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_verification_reviews_created ON verification_reviews(created)")
+
+            c.execute("SELECT to_regclass('rollup_totals')")
+            has_rollups = c.fetchone()[0] is not None
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS rollup_daily (
+                day TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value INTEGER NOT NULL,
+                PRIMARY KEY (day, metric, key)
+            )
+            """)
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS rollup_totals (
+                metric TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value INTEGER NOT NULL,
+                PRIMARY KEY (metric, key)
+            )
+            """)
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS conversations (
+                a_id INTEGER NOT NULL,
+                b_id INTEGER NOT NULL,
+                starter_id INTEGER NOT NULL,
+                started_day TEXT NOT NULL,
+                replied INTEGER NOT NULL,
+                PRIMARY KEY (a_id, b_id)
+            )
+            """)
+            if not has_rollups:
+                self.rebuild_rollups(conn)
+
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS saved_searches (
+                id SERIAL PRIMARY KEY,
+                owner_id INTEGER NOT NULL,
+                label TEXT NOT NULL,
+                target_type TEXT NOT NULL,
+                spec TEXT NOT NULL,
+                since_seq BIGINT NOT NULL,
+                created TEXT NOT NULL
+            )
+            """)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_saved_searches_owner ON saved_searches(owner_id)")
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS saved_search_keys (
+                key TEXT NOT NULL,
+                search_id INTEGER NOT NULL,
+                PRIMARY KEY (key, search_id)
+            )
+            """)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_saved_search_keys_search ON saved_search_keys(search_id)")
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS notifications (
+                id SERIAL PRIMARY KEY,
+                profile_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                ref_id INTEGER NOT NULL,
+                subject_id INTEGER NOT NULL,
+                body TEXT NOT NULL,
+                created TEXT NOT NULL,
+                seen INTEGER DEFAULT 0,
+                UNIQUE (profile_id, kind, ref_id, subject_id)
+            )
+            """)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_notifications_profile ON notifications(profile_id, seen)")
+
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                token_hash TEXT PRIMARY KEY,
+                profile_id INTEGER NOT NULL,
+                summary TEXT NOT NULL,
+                created TEXT NOT NULL,
+                expires TEXT NOT NULL
+            )
+            """)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires)")
+
+            c.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            c.execute("INSERT INTO meta (key, value) VALUES ('profiles_version', 0) ON CONFLICT (key) DO NOTHING")
+            version = self.get_version(c, "profiles_version")
+            c.execute("""
+                INSERT INTO meta (key, value) VALUES ('schema_version', %s)
+                ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value
+            """, (SCHEMA_VERSION,))
+            conn.commit()
+        return version
+
+    def bump_version(self, cur, key):
+        cur.execute("UPDATE meta SET value = value + 1 WHERE key = %s RETURNING value", (key,))
+        return cur.fetchone()[0]
+
+    def insert_row(self, cur, table, cols, vals):
+        placeholders = ",".join(["%s"] * len(cols))
+        cur.execute(f"INSERT INTO {table} ({','.join(cols)}) VALUES ({placeholders}) RETURNING id", vals)
+        return cur.fetchone()[0]
+
+    def log_change(self, cur, entity, entity_id, op, columns=()):
+        # serialize log writers until commit so seq order == commit order and a
+        # consumer never skips a lower seq that commits late
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('cn_changes'))")
+        super().log_change(cur, entity, entity_id, op, columns)
+
+    def search_messages(self, profile_id, terms, limit, offset):
+        # the GIN index finds the term hits, the participant filter narrows
+        # them; ts_headline only runs on the returned page
+        query = " & ".join(terms[:-1] + [terms[-1] + ":*"])
+        hits = " UNION ALL ".join(f"""
+            SELECT id, sender_id, receiver_id, body, created, ts_rank(to_tsvector('simple', body), q) AS score
+            FROM {table}, to_tsquery('simple', %s) q
+            WHERE to_tsvector('simple', body) @@ q AND (sender_id = %s OR receiver_id = %s)
+        """ for table in ("messages", "messages_archive"))
+        return self.fetch_df(f"""
+            SELECT id, sender_id, receiver_id, created,
+                   ts_headline('simple', body, to_tsquery('simple', %s),
+                               'StartSel=**, StopSel=**, MaxWords=16, MinWords=6') AS snippet
+            FROM ({hits}) h
+            ORDER BY score DESC, id DESC
+            LIMIT {int(limit)} OFFSET {int(offset)}
+        """, (query, *[query, profile_id, profile_id] * 2))
+
+    def geo_candidates(self, box, account_type):
+        min_lat, max_lat, min_lon, max_lon = box
+        return self.fetch_all("""
+            SELECT id, loc_lat, loc_lon FROM profiles
+            WHERE loc_lat BETWEEN ? AND ?
+              AND loc_lon BETWEEN ? AND ?
+              AND account_type = ?
+        """, (min_lat, max_lat, min_lon, max_lon, account_type))
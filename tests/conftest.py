@@ -0,0 +1,38 @@
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+# storage reads its config at import: point it at a throwaway SQLite data dir first
+DATA_DIR = tempfile.mkdtemp(prefix="cn-tests-")
+os.environ["CN_DATA_DIR"] = DATA_DIR
+for name in ("CN_DATABASE_URL", "CN_WRITER_ADDRESS", "CN_SQL_TRACE"):
+    os.environ.pop(name, None)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest  # noqa: E402
+
+import storage  # noqa: E402
+
+storage.init_db()
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+_names = itertools.count(1)
+
+@pytest.fixture
+def make_profile():
+    # -> id of a new profile; tests share one database, so names are unique
+    def make(account_type="Creator", **fields):
+        payload = {
+            "account_type": account_type,
+            "display_name": f"test-{account_type.lower()}-{next(_names)}",
+            "created": datetime.now().isoformat(timespec="seconds"),
+            **fields,
+        }
+        return storage.upsert_profile(payload)
+    return make
@@ -0,0 +1,48 @@
+from datetime import datetime, timezone
+
+import backup
+
+class _FrozenClock(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return datetime(2026, 3, 1, 12, 0, 0, tzinfo=timezone.utc)
+
+def test_same_second_runs_each_get_a_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(backup, "datetime", _FrozenClock)
+    stamps = [backup.run_backup(tmp_path, keep=0)["snapshot"] for _ in range(3)]
+
+    assert len(set(stamps)) == 3
+    assert [s for s, _ in backup.snapshots(tmp_path)] == stamps
+    assert not list(tmp_path.glob(".*.partial"))
+
+def test_back_to_back_runs_on_the_real_clock(tmp_path):
+    for _ in range(3):
+        backup.run_backup(tmp_path, keep=0)
+    assert len(backup.snapshots(tmp_path)) == 3
+    assert not list(tmp_path.glob(".*.partial"))
+
+def test_whole_second_stamps_still_list_and_restore_in_order(tmp_path):
+    old = backup.run_backup(tmp_path, keep=0)["snapshot"]
+    (tmp_path / old).rename(tmp_path / "20200101T000000Z")  # as written before sub-second stamps
+    new = backup.run_backup(tmp_path, keep=0)["snapshot"]
+
+    assert [s for s, _ in backup.snapshots(tmp_path)] == ["20200101T000000Z", new]
+    assert backup.restore(tmp_path / "r1", tmp_path, at="2020-01-01T00:00:00")["snapshot"] == "20200101T000000Z"
+    assert backup.restore(tmp_path / "r2", tmp_path)["snapshot"] == new
+    assert backup.verify(tmp_path)["snapshot"] == new
+
+def test_restore_at_converts_an_offset_to_utc(tmp_path):
+    for stamp in ["20260301T100000.000000Z", "20260301T120000.000000Z"]:
+        made = backup.run_backup(tmp_path, keep=0)["snapshot"]
+        (tmp_path / made).rename(tmp_path / stamp)
+
+    # 13:30+02:00 is 11:30 UTC, before the 12:00 snapshot
+    assert backup.restore(tmp_path / "r1", tmp_path, at="2026-03-01T13:30:00+02:00")["snapshot"] == "20260301T100000.000000Z"
+    # 08:30-04:00 is 12:30 UTC
+    assert backup.restore(tmp_path / "r2", tmp_path, at="2026-03-01T08:30:00-04:00")["snapshot"] == "20260301T120000.000000Z"
+    assert backup.restore(tmp_path / "r3", tmp_path, at="2026-03-01T11:00:00")["snapshot"] == "20260301T100000.000000Z"
+
+def test_prune_keeps_the_newest(tmp_path):
+    stamps = [backup.run_backup(tmp_path, keep=0)["snapshot"] for _ in range(3)]
+    assert backup.prune(tmp_path, keep=1)["snapshots"] == stamps[:2]
+    assert [s for s, _ in backup.snapshots(tmp_path)] == stamps[2:]
@@ -0,0 +1,78 @@
+import itertools
+
+import storage
+
+_consumers = itertools.count(1)
+
+def _consumer():
+    # a fresh consumer starting at the head of the log
+    name = f"test-consumer-{next(_consumers)}"
+    storage.ack_changes(name, storage.latest_change_seq())
+    return name
+
+def test_filtered_consumer_gets_only_its_entities(make_profile):
+    a, b = make_profile(), make_profile("Agency")
+    consumer = _consumer()
+    storage.insert_message(a, b, "hi")
+    storage.update_profile(a, {"bio": "first"})
+    storage.insert_message(b, a, "hello")
+    storage.update_profile(b, {"bio": "second"})
+
+    got = []
+    storage.consume_changes(consumer, got.extend, batch=1, entities=["profile"])
+    assert [(c["entity"], c["entity_id"]) for c in got] == [("profile", a), ("profile", b)]
+    assert storage.change_cursor(consumer) >= got[-1]["seq"]
+
+def test_filtered_consumer_skips_over_changes_it_does_not_want(make_profile):
+    a, b = make_profile(), make_profile()
+    consumer = _consumer()
+    storage.insert_message(a, b, "only messages here")
+
+    got = []
+    storage.consume_changes(consumer, got.extend, entities=["profile"])
+    assert got == []
+    assert storage.change_cursor(consumer) == storage.latest_change_seq()
+
+def test_change_committed_between_reads_is_not_skipped(make_profile, monkeypatch):
+    # A matching change that lands after the filtered query came back empty
+    # must stay ahead of the cursor, not be acknowledged unseen.
+    a, b = make_profile(), make_profile()
+    consumer = _consumer()
+    storage.insert_message(a, b, "not a profile change")
+
+    real = storage.changes_since
+    def racing(*args, **kwargs):
+        rows = real(*args, **kwargs)
+        monkeypatch.setattr(storage, "changes_since", real)
+        storage.update_profile(a, {"bio": "written mid-poll"})
+        return rows
+    monkeypatch.setattr(storage, "changes_since", racing)
+
+    got = []
+    storage.consume_changes(consumer, got.extend, entities=["profile"])
+    assert got == []
+    storage.consume_changes(consumer, got.extend, entities=["profile"])
+    assert [(c["entity_id"], c["columns"]) for c in got] == [(a, ["bio"])]
+
+def test_unfiltered_consumer_sees_every_change_in_order(make_profile):
+    a, b = make_profile(), make_profile()
+    consumer = _consumer()
+    storage.insert_message(a, b, "x")
+    storage.update_profile(b, {"bio": "y"})
+
+    got = []
+    storage.consume_changes(consumer, got.extend, batch=1)
+    assert [c["entity"] for c in got] == ["message", "profile"]
+    assert [c["seq"] for c in got] == sorted(c["seq"] for c in got)
+
+def test_max_batches_leaves_the_rest_for_the_next_call(make_profile):
+    pid = make_profile()
+    consumer = _consumer()
+    for i in range(5):
+        storage.update_profile(pid, {"bio": f"v{i}"})
+
+    got = []
+    storage.consume_changes(consumer, got.extend, batch=2, entities=["profile"], max_batches=1)
+    assert len(got) == 2
+    storage.consume_changes(consumer, got.extend, batch=2, entities=["profile"])
+    assert len(got) == 5 and len({c["seq"] for c in got}) == 5
@@ -0,0 +1,23 @@
+import export
+import storage
+
+def _age(message_id):
+    with storage.store().connection() as conn:
+        conn.cursor().execute(storage.store().sql("UPDATE messages SET created = ? WHERE id = ?"), ("2001-01-01T00:00:00", message_id))
+        conn.commit()
+
+def test_append_exports_a_message_archived_since_the_last_export(make_profile, tmp_path):
+    a, b = make_profile(), make_profile()
+    export.export_full(tmp_path, fmt="arrow")
+
+    moved = storage.insert_message(a, b, "archived before the append")
+    kept = storage.insert_message(a, b, "still live")
+    _age(moved)
+    while storage.archive_messages(hot_days=30):
+        pass
+
+    report = export.export_append(tmp_path)
+    assert report["messages"] == 2
+    rows = {r["id"]: r["body"] for r in export.load(tmp_path, "messages", ["id", "body"]).to_pylist()}
+    assert rows[moved] == "archived before the append"
+    assert rows[kept] == "still live"
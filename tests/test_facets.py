@@ -0,0 +1,49 @@
+import storage
+from browse import facet_counts
+from vocab import PERSONALITY_TYPES
+
+DIRECT, FRIENDLY = PERSONALITY_TYPES[0], PERSONALITY_TYPES[1]
+
+def _facets(q, **filters):
+    version, cards = storage.read_profile_cards_versioned()
+    return facet_counts(cards, version, "Creator", q=q, **filters)
+
+def test_each_facet_is_counted_against_the_other_filters(make_profile):
+    q = "zqfacets"
+    make_profile(niche=q, creator_content_types="Fitness,Beauty", creator_personality=DIRECT)
+    make_profile(niche=q, creator_content_types="Fitness", creator_personality=FRIENDLY)
+    make_profile(niche=q, creator_content_types="Gaming", creator_personality=DIRECT)
+    make_profile("Agency", niche=q, agency_payment_model="Hybrid")  # other side of the market
+
+    out = _facets(q, content_types=["Fitness"], personalities=[])
+    # content types ignore their own selection (options are OR-ed), so picking more never dead-ends
+    assert {k: v for k, v in out["content_types"].items() if v} == {"Fitness": 2, "Beauty": 1, "Gaming": 1}
+    # personalities are counted within the Fitness results
+    assert {k: v for k, v in out["personalities"].items() if v} == {DIRECT: 1, FRIENDLY: 1}
+
+    out = _facets(q, content_types=[], personalities=[DIRECT])
+    assert {k: v for k, v in out["content_types"].items() if v} == {"Fitness": 1, "Beauty": 1, "Gaming": 1}
+    assert out["personalities"][DIRECT] == 2
+
+def test_counts_follow_profile_edits(make_profile):
+    q = "zqfacetedit"
+    pid = make_profile(niche=q, creator_content_types="Travel")
+    assert _facets(q, content_types=[])["content_types"]["Travel"] == 1
+
+    storage.update_profile(pid, {"creator_content_types": "Comedy"})
+    counts = _facets(q, content_types=[])["content_types"]
+    assert counts["Travel"] == 0 and counts["Comedy"] == 1
+
+def test_no_matches_counts_zero_for_every_option():
+    out = _facets("zqnothing", content_types=[], personalities=[])
+    assert set(out["content_types"].values()) == {0}
+    assert set(out["personalities"].values()) == {0}
+
+def test_results_are_keyed_on_the_version_the_frame_was_built_for(make_profile):
+    q = "zqfacetrace"
+    version, cards = storage.read_profile_cards_versioned()
+    make_profile(niche=q, creator_content_types="Cosplay")  # a write lands mid-run
+    assert storage.profiles_version() > version
+    # the run still holds the old frame; its results must stay under the old version
+    assert facet_counts(cards, version, "Creator", q=q, content_types=[])["content_types"]["Cosplay"] == 0
+    assert _facets(q, content_types=[])["content_types"]["Cosplay"] == 1
@@ -0,0 +1,61 @@
+import random
+import time
+
+import pytest
+
+import loadtest
+import pii
+
+# well under the ~30-50 MB/s the scanner does here, so a slow CI box passes
+# but an accidental per-character or backtracking-heavy pattern does not
+MIN_MBPS = 5.0
+
+@pytest.mark.parametrize("text, kinds", [
+    ("mail me at jane.doe@example.com", ["email"]),
+    ("all my links: https://linktr.ee/jane", ["url"]),
+    ("find me at www.janefit.co", ["url"]),
+    ("insta: jane_fit", ["handle"]),
+    ("dm @janefit", ["handle"]),
+    ("call +44 7700 900123", ["phone"]),
+    ("whatsapp 0044 7700 900123", ["phone"]),
+    ("text 555-123-4567 after 6", ["phone"]),
+    ("office (555) 123-4567", ["phone"]),
+    ("mobile 07700900123", ["phone"]),
+    ("london line 020 7946 0958", ["phone"]),
+])
+def test_contact_details_are_found(text, kinds):
+    assert pii.kinds(text) == kinds
+    assert pii.contains(text)
+
+@pytest.mark.parametrize("text", [
+    "From 2019 - 2023 we grew 300%",
+    "Grew 10x in 2023-2024",
+    "Revenue 1.250.000 per year",
+    "Reached 1,250,000 views",
+    "Order #12345678",
+    "Campaign ran 2026-03-01 to 2026-04-01",
+    "Took a creator from 1k to 10k",
+    "Ratio 4:3 works best",
+    "Version 2.0 is out. Next week",
+])
+def test_ordinary_text_is_not_flagged(text):
+    assert pii.findings(text) == []
+    assert not pii.contains(text)
+
+def test_phone_span_stops_at_the_phone():
+    text = "ring 555 123 4567 10am"
+    assert pii.redact(text) == "ring [hidden] 10am"
+
+def test_scan_throughput_floor():
+    rnd = random.Random(3)
+    texts = [loadtest.fake_message(rnd, 0.05) for _ in range(5000)]
+    size = sum(len(t.encode("utf-8")) for t in texts)
+    best = None
+    for _ in range(3):
+        t0 = time.perf_counter()
+        for t in texts:
+            pii.findings(t)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    mbps = size / 1e6 / best
+    assert mbps >= MIN_MBPS, f"{mbps:.1f} MB/s"
@@ -0,0 +1,32 @@
+import maintenance
+import storage
+
+def _flags(entity, entity_id):
+    flags = storage.read_pii_flags(limit=100000)
+    return flags[(flags["entity"] == entity) & (flags["entity_id"] == entity_id)]["kinds"].tolist()
+
+def test_back_scan_keeps_flags_on_archived_messages(make_profile):
+    a, b = make_profile(), make_profile()
+    old = storage.insert_message(a, b, "mail me at jane@example.com")
+    hot = storage.insert_message(a, b, "see you in the app")
+    with storage.store().connection() as conn:
+        conn.cursor().execute(storage.store().sql("UPDATE messages SET created = ? WHERE id = ?"), ("2001-01-01T00:00:00", old))
+        conn.commit()
+    while storage.archive_messages(hot_days=30):
+        pass
+    assert storage.store().fetch_all("SELECT COUNT(*) FROM messages_archive WHERE id = ?", (old,))[0][0] == 1
+    assert _flags("message", old) == ["email"]
+
+    maintenance.scan_pii(entities=("message",), batch=3)
+    assert _flags("message", old) == ["email"]
+    assert _flags("message", hot) == []
+
+def test_back_scan_replaces_stale_flags(make_profile):
+    pid = make_profile(bio="call +44 7700 900123")
+    assert _flags("profile", pid) == ["phone"]
+    with storage.store().connection() as conn:
+        conn.cursor().execute(storage.store().sql("UPDATE profiles SET bio = ? WHERE id = ?"), ("no contacts here", pid))
+        conn.commit()
+
+    maintenance.scan_pii(entities=("profile",))
+    assert _flags("profile", pid) == []
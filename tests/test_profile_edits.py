@@ -0,0 +1,51 @@
+import pytest
+
+import geo
+import storage
+
+def _location(pid):
+    return geo.Location(*storage.profile_locations([pid])[0][1:])
+
+def _changes_for(pid, after):
+    return [c for c in storage.changes_since(after, 1000, ["profile"]) if c["entity_id"] == pid]
+
+def test_only_differing_fields_are_written(make_profile):
+    pid = make_profile(niche="yoga", bio="hello", creator_platform_url="")
+    seq = storage.latest_change_seq()
+
+    assert storage.update_profile(pid, {"niche": "yoga", "bio": "hello again", "creator_platform_url": None}) == ["bio"]
+    # "" and NULL both mean "not set", so the URL above was not rewritten
+    [change] = _changes_for(pid, seq)
+    assert change["op"] == "update" and change["columns"] == ["bio"]
+
+def test_no_difference_writes_nothing(make_profile):
+    pid = make_profile(niche="yoga")
+    before = storage.profiles_version()
+    seq = storage.latest_change_seq()
+
+    assert storage.update_profile(pid, {"niche": "yoga"}) == []
+    assert _changes_for(pid, seq) == []
+    assert storage.profiles_version() == before
+
+def test_location_columns_are_rederived_from_the_new_text(make_profile):
+    pid = make_profile(location_current="London, UK")
+    london = _location(pid)
+    assert london.country_code == "GB" and london.city_id
+
+    changed = storage.update_profile(pid, {"location_current": "Paris, France"})
+    paris = _location(pid)
+    assert "location_current" in changed and "loc_city_id" in changed
+    assert paris.country_code == "FR" and paris.city_id != london.city_id
+    assert geo.haversine_km(london.lat, london.lon, paris.lat, paris.lon) > 300
+    # the index moved with the row: Paris is found by a same-city lookup
+    assert pid in storage.profile_ids_in_city(paris.city_id, "Creator")
+    assert pid not in storage.profile_ids_in_city(london.city_id, "Creator")
+
+def test_unrecognised_location_clears_the_derived_columns(make_profile):
+    pid = make_profile(location_current="London, UK")
+    storage.update_profile(pid, {"location_current": "Somewhere Unmapped"})
+    assert _location(pid).city_id is None and _location(pid).lat is None
+
+def test_unknown_profile_raises():
+    with pytest.raises(KeyError):
+        storage.update_profile(10 ** 9, {"bio": "x"})
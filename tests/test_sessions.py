@@ -0,0 +1,94 @@
+import time
+
+import pytest
+
+import sessions
+import storage
+
+TTL = sessions.SESSION_TTL_HOURS * 3600
+
+@pytest.fixture
+def clock(monkeypatch):
+    # one wall clock for sessions.py and storage.py; start well clear of real time
+    now = [float(int(time.time())) + 86400]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    sessions._cache.clear()
+    yield now
+    sessions._cache.clear()
+
+def _stored_expiry(token):
+    return storage.get_session(sessions._hash(token))[1]
+
+def test_resolves_until_expiry_then_forgets(make_profile, clock):
+    pid = make_profile()
+    token = sessions.create(pid, "me", "Creator")
+    assert sessions.resolve(token) == {"profile_id": pid, "display_name": "me", "role": "Creator"}
+
+    clock[0] += TTL + 1
+    # the process cache never trusts an entry past the session's expiry
+    assert sessions.resolve(token) is None
+    sessions._cache.clear()
+    assert sessions.resolve(token) is None
+
+def test_use_in_the_second_half_slides_expiry(make_profile, clock):
+    token = sessions.create(make_profile(), "me", "Creator")
+    created = clock[0]
+
+    clock[0] = created + TTL * 0.3
+    sessions._cache.clear()
+    sessions.resolve(token)
+    assert _stored_expiry(token) == pytest.approx(created + TTL, abs=1)  # first half: no write
+
+    clock[0] = created + TTL * 0.6
+    sessions._cache.clear()
+    sessions.resolve(token)
+    assert _stored_expiry(token) == pytest.approx(clock[0] + TTL, abs=1)
+
+    clock[0] = created + TTL * 1.2  # past the original expiry, inside the renewed one
+    sessions._cache.clear()
+    assert sessions.resolve(token) is not None
+
+def test_cached_resolve_reads_nothing(make_profile, clock, monkeypatch):
+    token = sessions.create(make_profile(), "me", "Creator")
+    monkeypatch.setattr(sessions, "get_session", lambda key: pytest.fail("read the database"))
+    clock[0] += sessions.CACHE_SECONDS / 2
+    assert sessions.resolve(token) is not None
+
+def test_revoke_and_unknown_tokens(make_profile, clock):
+    token = sessions.create(make_profile(), "me", "Creator")
+    sessions.revoke(token)
+    assert sessions.resolve(token) is None
+    assert sessions.resolve("not-a-token") is None
+    assert sessions.resolve(None) is None
+
+def test_rotate_swaps_the_token(make_profile, clock):
+    pid = make_profile()
+    old = sessions.create(pid, "me", "Creator")
+    summary, new = sessions.rotate(old)
+
+    assert summary["profile_id"] == pid and new != old
+    assert sessions.resolve(old) is None
+    assert sessions.resolve(new)["profile_id"] == pid
+    assert sessions.rotate(old) == (None, None)
+
+def test_evict_drops_only_expired_sessions(make_profile, clock):
+    pid = make_profile()
+    stale = sessions.create(pid, "me", "Creator")
+    clock[0] += TTL * 0.9
+    live = sessions.create(pid, "me", "Creator")
+    clock[0] += TTL * 0.2
+
+    assert storage.evict_sessions() >= 1
+    sessions._cache.clear()
+    assert sessions.resolve(stale) is None
+    assert sessions.resolve(live) is not None
+
+def test_admin_grant_lives_on_the_session_not_the_name(make_profile, clock):
+    pid = make_profile()
+    plain = sessions.create(pid, "admin", "Creator")
+    assert "admin" not in sessions.resolve(plain)
+
+    granted = sessions.create(pid, "me", "Creator", admin=True)
+    assert sessions.resolve(granted)["admin"] is True
+    summary, rotated = sessions.rotate(granted)
+    assert summary["admin"] is True and sessions.resolve(rotated)["admin"] is True
@@ -0,0 +1,23 @@
+import threading
+import time
+
+from cache import SnapshotCache
+
+def test_concurrent_readers_rebuild_a_new_version_once(tmp_path):
+    snap = SnapshotCache(tmp_path, "cards")
+    snap.publish_version(3)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)  # long enough for every reader to miss the file
+        return {"rows": 10}
+
+    out = []
+    readers = [threading.Thread(target=lambda: out.append(snap.get_versioned(loader))) for _ in range(8)]
+    for t in readers:
+        t.start()
+    for t in readers:
+        t.join()
+    assert len(calls) == 1
+    assert out == [(3, {"rows": 10})] * 8
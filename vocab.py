@@ -0,0 +1,31 @@
+# =========================
+# VOCABULARIES (fixed option lists shared by the UI and the compact frame)
+# =========================
+# Order matters: compact profile frames store positions in these lists as
+# category codes / bit numbers. Append new options, never reorder.
+ACCOUNT_TYPES = ["Creator", "Agency"]
+
+PERSONALITY_TYPES = [
+    "Direct (short messages, clear asks)",
+    "Friendly (warm tone, supportive)",
+    "Professional (formal, structured)",
+    "Low-contact (minimal check-ins)",
+    "High-touch (frequent updates)",
+    "Prefer to discuss later"
+]
+
+CONTENT_TYPES = [
+    "Lifestyle", "Fitness", "Beauty", "Fashion", "Education", "Cosplay",
+    "Gaming", "ASMR", "Couples", "Comedy", "Travel", "Other"
+]
+
+AGENCY_SERVICES = [
+    "Account strategy", "Content planning", "Editing/post-production",
+    "Chatting/DM management", "Promotion/marketing", "Brand deals",
+    "Analytics/reporting", "Photoshoot support", "Operations/admin", "Other"
+]
+
+PAYMENT_MODELS = ["Commission-based", "Monthly fee", "Yearly fee", "Hybrid", "Other"]
+FEE_BANDS = ["Prefer not to say", "$0–$500", "$500–$2k", "$2k–$5k", "$5k+"]
+COMMISSION_BANDS = ["10–15%", "15–20%", "20–25%", "25%+", "Other / depends"]
+EARNINGS_BANDS = ["Prefer not to say", "$0–$5k", "$5k–$20k", "$20k–$50k", "$50k+"]
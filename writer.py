@@ -0,0 +1,117 @@
+import argparse
+import logging
+import os
+import secrets
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+log = logging.getLogger("creator_network.writer")
+
+# Connections unpickle what they receive, so the key is what stands between
+# the port and code execution: there is no default, and the old public one
+# is refused. cluster.py generates a fresh key per run and hands it to its
+# children through the environment.
+AUTHKEY_ENV = "CN_WRITER_AUTHKEY"
+AUTHKEY = os.environ.get(AUTHKEY_ENV, "").encode("utf-8")
+PUBLIC_KEYS = {b"", b"creator-network"}
+DEFAULT_ADDRESS = "127.0.0.1:8599"
+
+_local = threading.local()
+
+def new_authkey():
+    return secrets.token_bytes(32).hex()
+
+def require_authkey():
+    if AUTHKEY in PUBLIC_KEYS:
+        raise RuntimeError(f"writer: set {AUTHKEY_ENV} to a private random key (e.g. python -c 'import secrets; print(secrets.token_hex(32))')")
+    return AUTHKEY
+
+def parse_address(address):
+    host, _, port = str(address).rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+# =========================
+# CLIENT (used by storage.py in every Streamlit worker)
+# =========================
+def call(address, op, *args):
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = Client(parse_address(address), authkey=require_authkey())
+    try:
+        conn.send((op, args))
+        status, result = conn.recv()
+    except (EOFError, OSError):
+        # Don't retry: the write may already have been applied
+        _local.conn = None
+        raise
+    if status != "ok":
+        raise RuntimeError(f"writer: {result}")
+    return result
+
+# =========================
+# COORDINATOR (single process that owns all writes)
+# =========================
+def serve(address=DEFAULT_ADDRESS):
+    authkey = require_authkey()
+    import storage
+
+    storage.WRITER_ADDRESS = ""  # this process writes to SQLite directly
+    storage.init_db()
+
+    ops = {
+        "upsert_profile": storage.upsert_profile,
+        "update_profile": storage.update_profile,
+        "insert_message": storage.insert_message,
+        "ack_changes": storage.ack_changes,
+        "compact_changes": storage.compact_changes,
+        "archive_messages": storage.archive_messages,
+        "save_search": storage.save_search,
+        "delete_search": storage.delete_search,
+        "add_notifications": storage.add_notifications,
+        "mark_notifications_seen": storage.mark_notifications_seen,
+        "review_profiles": storage.review_profiles,
+        "create_session": storage.create_session,
+        "extend_session": storage.extend_session,
+        "delete_session": storage.delete_session,
+        "evict_sessions": storage.evict_sessions,
+    }
+    lock = threading.Lock()
+
+    def handle(conn):
+        with conn:
+            while True:
+                try:
+                    op, args = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    # the profile ops only publish a new snapshot version under the
+                    # lock; the first reader to see it rebuilds the frame (once, under
+                    # the snapshot's build lock), so a write stays O(1) in profiles
+                    with lock:
+                        result = ops[op](*args)
+                    conn.send(("ok", result))
+                except Exception as e:
+                    log.exception("write %s failed", op)
+                    conn.send(("error", f"{type(e).__name__}: {e}"))
+
+    listener = Listener(parse_address(address), authkey=authkey)
+    log.warning("write coordinator listening on %s (data: %s)", address, storage.DB_PATH)
+    with listener:
+        while True:
+            try:
+                conn = listener.accept()
+            except (OSError, AuthenticationError):
+                continue
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Creator Network single-writer coordinator")
+    ap.add_argument("--address", default=os.environ.get("CN_WRITER_ADDRESS") or DEFAULT_ADDRESS)
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    try:
+        serve(args.address)
+    except RuntimeError as e:
+        raise SystemExit(str(e))